@@ -3,17 +3,19 @@ Sistema de Precificação Estratégica
 Aplicação Principal
 """
 import streamlit as st
-import pandas as pd
-import numpy as np
 from datetime import datetime
 import json
 import os
+from typing import TYPE_CHECKING
 
 # Importar módulos personalizados
-from modules.sheets import SheetsManager
+# Só o necessário para a tela de login; pandas, backends, cálculos, gráficos e
+# importação são importados no primeiro uso (ver benchmarks/importtime.py)
 from modules.auth import GerenciadorAutenticacao
-from modules.calculos import CalculadoraMarkup
-from modules.graficos import GeradorGraficos
+from modules.metricas import Metricas
+
+if TYPE_CHECKING:
+    from modules.storage import StorageBackend
 
 # Configuração da página
 st.set_page_config(
@@ -60,13 +62,67 @@ if 'initialized' not in st.session_state:
     st.session_state['initialized'] = True
     st.session_state['authenticated'] = False
 
+@st.cache_resource(show_spinner="Conectando ao Google Sheets...")
+def obter_sheets_manager(
+    spreadsheet_id: str,
+    credentials_json: str,
+    cache_ttl: float,
+    cache_max_abas: int,
+    write_behind: bool = True
+) -> 'StorageBackend':
+    """
+    Retorna a conexão única do processo, compartilhada entre todas as sessões
+    
+    O Streamlit guarda o SheetsManager entre reruns e sessões, evitando repetir
+    a autenticação e o open_by_key a cada interação. Falhas não são cacheadas,
+    então o próximo rerun tenta conectar de novo. Com write_behind, as escritas
+    passam pela fila assíncrona que respeita a cota da API.
+    """
+    from modules.sheets import SheetsManager
+    from modules.write_behind import WriteBehindStorage
+    
+    sheets_manager = SheetsManager(
+        spreadsheet_id, json.loads(credentials_json),
+        cache_ttl=cache_ttl, cache_max_abas=cache_max_abas
+    )
+    return WriteBehindStorage(sheets_manager) if write_behind else sheets_manager
+
+@st.cache_resource(show_spinner="Abrindo banco local...")
+def obter_sqlite_manager(db_path: str) -> 'StorageBackend':
+    """Retorna o banco SQLite único do processo, compartilhado entre todas as sessões"""
+    from modules.sqlite_storage import SQLiteManager
+    return SQLiteManager(db_path)
+
+def ler_segredo(chave: str, padrao=None):
+    """Valor de st.secrets, ou o padrão se a chave ou o secrets.toml não existirem"""
+    try:
+        return st.secrets.get(chave, padrao)
+    except FileNotFoundError:
+        # StreamlitSecretNotFoundError: nenhum secrets.toml encontrado
+        return padrao
+
 def inicializar_conexao():
-    """Inicializa conexão com Google Sheets"""
+    """
+    Inicializa o backend de armazenamento
+    
+    STORAGE_BACKEND escolhe entre 'sheets' (padrão, Google Sheets) e 'sqlite'
+    (banco local em SQLITE_PATH), via st.secrets ou variável de ambiente.
+    """
+    backend = os.getenv('STORAGE_BACKEND') or ler_segredo('STORAGE_BACKEND', 'sheets')
+    if backend == 'sqlite':
+        db_path = os.getenv('SQLITE_PATH') or ler_segredo('SQLITE_PATH', 'data/precificacao.db')
+        try:
+            return obter_sqlite_manager(db_path)
+        except Exception as e:
+            st.error(f"Erro ao abrir banco SQLite '{db_path}': {e}")
+            st.stop()
+    
     try:
         # Tentar carregar credenciais do st.secrets (Streamlit Cloud)
-        if 'gcp_service_account' in st.secrets:
-            credentials_info = dict(st.secrets['gcp_service_account'])
-            spreadsheet_id = st.secrets.get('SPREADSHEET_ID', '')
+        conta_servico = ler_segredo('gcp_service_account')
+        if conta_servico:
+            credentials_info = dict(conta_servico)
+            spreadsheet_id = ler_segredo('SPREADSHEET_ID', '')
         # Senão, tentar carregar de arquivo local
         elif os.path.exists('service_account.json'):
             with open('service_account.json', 'r') as f:
@@ -86,7 +142,16 @@ def inicializar_conexao():
             st.error("SPREADSHEET_ID não configurado!")
             st.stop()
         
-        sheets_manager = SheetsManager(spreadsheet_id, credentials_info)
+        # Cache de leitura das abas, ajustável por variável de ambiente
+        from modules.sheets import SheetsManager
+        cache_ttl = float(os.getenv('SHEETS_CACHE_TTL', SheetsManager.CACHE_TTL))
+        cache_max_abas = int(os.getenv('SHEETS_CACHE_MAX_ABAS', SheetsManager.CACHE_MAX_ABAS))
+        write_behind = os.getenv('SHEETS_WRITE_BEHIND', '1').lower() not in ('0', 'false', 'nao')
+        
+        sheets_manager = obter_sheets_manager(
+            spreadsheet_id, json.dumps(credentials_info, sort_keys=True),
+            cache_ttl, cache_max_abas, write_behind
+        )
         return sheets_manager
         
     except Exception as e:
@@ -120,16 +185,81 @@ def exibir_info_usuario():
         if st.button("🚪 Sair", use_container_width=True):
             GerenciadorAutenticacao.fazer_logout()
 
+def exibir_status_gravacao(sheets_manager):
+    """Exibe na sidebar se os dados do usuário já foram gravados na planilha"""
+    from modules.write_behind import WriteBehindStorage
+    
+    if not isinstance(sheets_manager, WriteBehindStorage):
+        return
+    
+    status = sheets_manager.status_gravacao(st.session_state.get('prefix', ''))
+    
+    if status['falha']:
+        st.error(f"❌ Uma alteração não pôde ser gravada e foi descartada:\n\n{status['falha']}")
+    if status['erro']:
+        st.warning(
+            f"⚠️ {status['pendentes']} gravação(ões) pendente(s). "
+            f"Nova tentativa em {status['proxima_tentativa_em']:.0f}s.\n\n{status['erro']}"
+        )
+    elif status['pendentes']:
+        st.info(f"⏳ Gravando {status['pendentes']} alteração(ões) na planilha...")
+    elif not status['falha']:
+        st.caption("✅ Todos os dados gravados")
+        if status['ultima_gravacao']:
+            st.caption(f"Última gravação: {status['ultima_gravacao'].strftime('%H:%M:%S')}")
+    
+    if status['pendentes'] and st.button("💾 Gravar agora", use_container_width=True):
+        sheets_manager.flush()
+        st.rerun()
+
+def exibir_painel_metricas():
+    """Exibe para o admin os tempos medidos nesta execução, por camada e por chamada"""
+    registros = Metricas.registros_atuais()
+    
+    with st.expander("⏱️ Tempos desta execução"):
+        if not registros:
+            st.caption("Nenhuma chamada medida nesta execução")
+            return
+        
+        camadas = Metricas.por_camada(registros)
+        for coluna, (camada, ms) in zip(st.columns(len(camadas)), camadas.items()):
+            coluna.metric(camada, f"{ms:,.1f} ms")
+        
+        st.dataframe(
+            Metricas.resumir(registros),
+            column_config={
+                'nome': 'Chamada', 'chamadas': 'Chamadas', 'total_ms': 'Total (ms)',
+                'proprio_ms': 'Próprio (ms)', 'max_ms': 'Maior (ms)'
+            },
+            use_container_width=True, hide_index=True
+        )
+        st.caption(
+            "Tempo próprio exclui as chamadas internas medidas; o de 'pagina' e 'fragmento' "
+            f"é o desenho dos componentes. Registros em {Metricas.ARQUIVO} ({Metricas.FORMATO})."
+        )
+
 ###########################################
 # MÓDULO 1: CONFIGURAÇÃO DE CUSTOS
 ###########################################
 
+@Metricas.medir('pagina.custos')
 def modulo_custos_despesas(sheets_manager):
     """Módulo de configuração de custos e despesas"""
     st.header("⚙️ Configuração de Custos e Despesas")
     
     prefix = st.session_state.get('prefix', '')
-    config = sheets_manager.read_user_config(prefix)
+    formulario_custos(sheets_manager, prefix, sheets_manager.read_user_config(prefix))
+
+@st.fragment
+@Metricas.medir('fragmento.custos')
+def formulario_custos(sheets_manager, prefix, config):
+    """
+    Campos de custo, resumo e gravação da configuração
+    
+    Fragmento: alterar um campo reexecuta só este trecho (campos e resumo),
+    sem o restante da página e a sidebar.
+    """
+    from modules.calculos import CalculadoraMarkup
     
     col1, col2, col3 = st.columns(3)
     
@@ -266,6 +396,9 @@ def modulo_custos_despesas(sheets_manager):
         else:
             try:
                 sheets_manager.write_user_config(prefix, nova_config)
+                # O catálogo inteiro é regravado: partir do backend, não da
+                # cópia da sessão, para não desfazer alterações de outras abas
+                sheets_manager.recarregar(prefix)
                 produtos_df = sheets_manager.read_user_products(prefix)
                 if not produtos_df.empty:
                     produtos_atualizados = calc.recalcular_produtos(
@@ -283,37 +416,60 @@ def modulo_custos_despesas(sheets_manager):
 # MÓDULO 2: CADASTRO DE PRODUTOS
 ###########################################
 
+# Linhas por página na listagem de produtos sem filtro
+PRODUTOS_POR_PAGINA = 500
+
+@Metricas.medir('pagina.produtos')
 def modulo_cadastro_produtos(sheets_manager):
     """Módulo de cadastro e gerenciamento de produtos"""
+    import pandas as pd
+    from modules.calculos import CalculadoraMarkup
+    from modules.importacao import ImportadorProdutos
+    from modules.upsert import MotorUpsert
+    
     st.header("📦 Cadastro de Produtos")
     
     prefix = st.session_state.get('prefix', '')
+    # Config e catálogo numa única leitura; as consultas abaixo reaproveitam o cache
+    config, produtos_df = sheets_manager.read_user_data(prefix)
     
     tabs = st.tabs(["📋 Listar Produtos", "➕ Adicionar Produto", "📥 Import/Export"])
     
     # TAB 1: LISTAR PRODUTOS
     with tabs[0]:
-        produtos_df = sheets_manager.read_user_products(prefix)
+        total_produtos = sheets_manager.count_user_products(prefix)
         
-        if produtos_df.empty:
+        if total_produtos == 0:
             st.info("📭 Nenhum produto cadastrado ainda. Use a aba 'Adicionar Produto' ou importe um CSV.")
         else:
-            st.markdown(f"**Total de produtos:** {len(produtos_df)}")
+            st.markdown(f"**Total de produtos:** {total_produtos}")
+            
+            # Células numéricas que não puderam ser lidas (linha 1 da planilha é o cabeçalho)
+            for coluna, posicoes in produtos_df.attrs.get('invalidos', {}).items():
+                linhas = ', '.join(str(p + 2) for p in posicoes[:20]) + (' ...' if len(posicoes) > 20 else '')
+                st.warning(f"⚠️ {len(posicoes)} valor(es) não numérico(s) em '{coluna}' (linhas {linhas}), tratados como vazios")
             
             # Filtros
             col_f1, col_f2 = st.columns(2)
             with col_f1:
                 filtro_nome = st.text_input("🔍 Filtrar por nome:", "")
             with col_f2:
-                categorias = ['Todas'] + sorted(produtos_df['categoria'].unique().tolist())
+                categorias = ['Todas'] + sheets_manager.list_user_categories(prefix)
                 filtro_cat = st.selectbox("Filtrar por categoria:", categorias)
             
-            # Aplicar filtros
-            df_filtrado = produtos_df.copy()
+            # Aplicar filtros (categoria e paginação são consultas indexadas no backend)
+            if filtro_cat != 'Todas':
+                df_filtrado = sheets_manager.read_user_products_by_category(prefix, filtro_cat)
+            elif filtro_nome or total_produtos <= PRODUTOS_POR_PAGINA:
+                df_filtrado = sheets_manager.read_user_products(prefix)
+            else:
+                total_paginas = -(-total_produtos // PRODUTOS_POR_PAGINA)
+                pagina = st.number_input("Página", min_value=1, max_value=total_paginas, value=1, step=1)
+                df_filtrado = sheets_manager.read_user_products_page(
+                    prefix, (pagina - 1) * PRODUTOS_POR_PAGINA, PRODUTOS_POR_PAGINA
+                )
             if filtro_nome:
                 df_filtrado = df_filtrado[df_filtrado['nome'].str.contains(filtro_nome, case=False, na=False)]
-            if filtro_cat != 'Todas':
-                df_filtrado = df_filtrado[df_filtrado['categoria'] == filtro_cat]
             
             # Exibir tabela
             if not df_filtrado.empty:
@@ -326,12 +482,87 @@ def modulo_cadastro_produtos(sheets_manager):
                     height=400
                 )
                 
+                # Edição em massa: só as linhas alteradas são gravadas
+                with st.expander("✏️ Edição em massa de preços"):
+                    colunas_editaveis = ['compra', 'desp_add', 'margem_desejada_pct', 'preco_final', 'categoria']
+                    colunas_editor = ['codigo', 'nome'] + [c for c in colunas_editaveis if c in df_filtrado.columns]
+                    # Categoria como texto livre (o tipo category limitaria às já existentes)
+                    tipos_editor = {'categoria': object} if 'categoria' in colunas_editor else {}
+                    editado = st.data_editor(
+                        df_filtrado[colunas_editor].astype(tipos_editor),
+                        disabled=['codigo', 'nome'],
+                        num_rows="fixed",
+                        use_container_width=True,
+                        hide_index=True,
+                        # Chave muda com as linhas exibidas, para edições não migrarem de linha
+                        key=f"editor_massa_{hash(tuple(df_filtrado['codigo'].astype(str)))}"
+                    )
+                    if st.button("💾 Salvar alterações", type="primary"):
+                        calc = CalculadoraMarkup()
+                        resultado = calc.calcular_markup_usuario(config)
+                        classificados = MotorUpsert(df_filtrado).classificar(editado, colunas=colunas_editor[2:])
+                        
+                        if resultado['erro_markup']:
+                            st.error(resultado['erro_markup'])
+                        elif classificados['atualizar'].empty:
+                            st.info("Nenhuma alteração para salvar")
+                        else:
+                            atualizados = calc.recalcular_produtos(
+                                classificados['atualizar'],
+                                resultado['markup_mult'],
+                                resultado['markup_divisor']
+                            )
+                            sheets_manager.upsert_user_products(prefix, atualizados, pd.DataFrame())
+                            st.success(f"✅ {len(atualizados)} produto(s) atualizado(s) e recalculado(s)!")
+                            st.rerun()
+                
+                # Preço de cada produto pela sua margem desejada (catálogo inteiro)
+                with st.expander("🎯 Preços pela margem desejada"):
+                    calc = CalculadoraMarkup()
+                    resultado = calc.calcular_markup_usuario(config)
+                    st.caption(
+                        f"Preço final = custo total ÷ (1 − (despesas {resultado['total_despesas_pct']:.2f}% "
+                        "+ margem desejada do produto)). Produtos sem margem desejada usam o markup do usuário."
+                    )
+                    if resultado['erro_markup']:
+                        st.error(resultado['erro_markup'])
+                    elif st.toggle("Calcular prévia", key="previa_margem"):
+                        precificado = calc.precificar_por_margem(produtos_df, resultado)
+                        alterados = precificado[
+                            precificado['preco_final'].ne(produtos_df['preco_final'].reset_index(drop=True))
+                            & precificado['preco_final'].notna()
+                        ]
+                        inviaveis = precificado.iloc[precificado.attrs.get('margem_inviavel', [])]
+                        
+                        st.markdown(f"**{len(alterados)}** produto(s) com preço final diferente do atual")
+                        if not inviaveis.empty:
+                            st.warning(
+                                f"⚠️ {len(inviaveis)} produto(s) com margem desejada + despesas >= 100%: "
+                                "preço impossível, o preço final atual foi mantido"
+                            )
+                            st.dataframe(
+                                inviaveis[['codigo', 'nome', 'margem_desejada_pct', 'preco_final']],
+                                use_container_width=True, hide_index=True
+                            )
+                        if not alterados.empty:
+                            st.dataframe(
+                                alterados[['codigo', 'nome', 'custo_total', 'margem_desejada_pct', 'preco_sugerido', 'preco_final']].head(PRODUTOS_POR_PAGINA),
+                                use_container_width=True, hide_index=True
+                            )
+                        if st.button("🎯 Aplicar preços pela margem", disabled=alterados.empty):
+                            sheets_manager.upsert_user_products(prefix, alterados, pd.DataFrame())
+                            st.success(f"✅ {len(alterados)} preço(s) final(is) atualizado(s)!")
+                            st.rerun()
+                
                 # Opção de deletar
                 st.markdown("---")
                 st.subheader("🗑️ Excluir Produto")
                 codigo_deletar = st.text_input("Digite o código do produto para excluir:")
                 if st.button("Deletar Produto", type="secondary"):
                     if codigo_deletar:
+                        # Regrava o catálogo inteiro: ler do backend antes de filtrar
+                        sheets_manager.recarregar(prefix)
+                        produtos_df = sheets_manager.read_user_products(prefix)
                         produtos_df = produtos_df[produtos_df['codigo'] != codigo_deletar]
                         sheets_manager.write_user_products(prefix, produtos_df)
                         st.success(f"Produto {codigo_deletar} excluído!")
@@ -366,13 +597,11 @@ def modulo_cadastro_produtos(sheets_manager):
                 if not codigo or not nome:
                     st.error("❌ Código e Nome são obrigatórios!")
                 else:
-                    # Verificar se código já existe
-                    produtos_df = sheets_manager.read_user_products(prefix)
-                    if not produtos_df.empty and codigo in produtos_df['codigo'].values:
+                    # Verificar se código já existe (índice de códigos em cache)
+                    if sheets_manager.product_code_exists(prefix, codigo):
                         st.error(f"❌ Código '{codigo}' já existe!")
                     else:
                         # Calcular preços
-                        config = sheets_manager.read_user_config(prefix)
                         calc = CalculadoraMarkup()
                         resultado = calc.calcular_markup_usuario(config)
                         
@@ -396,17 +625,13 @@ def modulo_cadastro_produtos(sheets_manager):
                                 resultado['markup_divisor']
                             )
                             
-                            # Adicionar ao DataFrame
-                            novo_df = pd.DataFrame([produto_calc])
-                            if produtos_df.empty:
-                                produtos_final = novo_df
+                            # Adicionar apenas a nova linha ao final da aba
+                            if not sheets_manager.append_user_product(prefix, produto_calc):
+                                st.error(f"❌ Código '{codigo}' já existe!")
                             else:
-                                produtos_final = pd.concat([produtos_df, novo_df], ignore_index=True)
-                            
-                            sheets_manager.write_user_products(prefix, produtos_final)
-                            st.success(f"✅ Produto '{nome}' adicionado com sucesso!")
-                            st.info(f"💰 Preço sugerido: R$ {produto_calc['preco_sugerido']:.2f}")
-                            st.balloons()
+                                st.success(f"✅ Produto '{nome}' adicionado com sucesso!")
+                                st.info(f"💰 Preço sugerido: R$ {produto_calc['preco_sugerido']:.2f}")
+                                st.balloons()
     
     # TAB 3: IMPORT/EXPORT
     with tabs[2]:
@@ -430,51 +655,57 @@ def modulo_cadastro_produtos(sheets_manager):
             
             if uploaded:
                 try:
-                    if uploaded.name.endswith('.csv'):
-                        df_import = pd.read_csv(uploaded)
-                    else:
-                        df_import = pd.read_excel(uploaded)
-                    
+                    # Preview lê só o início; o arquivo é processado em blocos na importação
                     st.write("**Preview:**")
-                    st.dataframe(df_import.head(), use_container_width=True)
+                    st.dataframe(ImportadorProdutos.preview(uploaded, uploaded.name), use_container_width=True)
+                    
+                    atualizar_existentes = st.checkbox(
+                        "Atualizar produtos já cadastrados (mesmo código)",
+                        help="Sem esta opção, linhas com códigos existentes são rejeitadas"
+                    )
                     
                     if st.button("✅ Confirmar Importação", type="primary"):
-                        # Preencher campos opcionais
-                        if 'margem_desejada_pct' not in df_import.columns:
-                            df_import['margem_desejada_pct'] = 40.0
-                        if 'preco_final' not in df_import.columns:
-                            df_import['preco_final'] = 0.0
-                        if 'categoria' not in df_import.columns:
-                            df_import['categoria'] = 'Geral'
-                        if 'obs' not in df_import.columns:
-                            df_import['obs'] = ''
-                        if 'desp_add' not in df_import.columns:
-                            df_import['desp_add'] = 0.0
-                        
                         # Recalcular preços
-                        config = sheets_manager.read_user_config(prefix)
                         calc = CalculadoraMarkup()
                         resultado = calc.calcular_markup_usuario(config)
                         
                         if resultado['erro_markup']:
                             st.error(resultado['erro_markup'])
                         else:
-                            df_recalc = calc.recalcular_produtos(
-                                df_import,
+                            importador = ImportadorProdutos(
+                                sheets_manager, prefix,
                                 resultado['markup_mult'],
-                                resultado['markup_divisor']
+                                resultado['markup_divisor'],
+                                atualizar_existentes=atualizar_existentes
                             )
+                            barra = st.progress(0.0, text="Importando...")
                             
-                            # Concatenar com existentes
-                            produtos_df = sheets_manager.read_user_products(prefix)
-                            if produtos_df.empty:
-                                produtos_final = df_recalc
-                            else:
-                                produtos_final = pd.concat([produtos_df, df_recalc], ignore_index=True)
+                            def ao_progredir(linhas, fracao):
+                                barra.progress(fracao or 0.0, text=f"{linhas:,} linhas processadas".replace(',', '.'))
                             
-                            sheets_manager.write_user_products(prefix, produtos_final)
-                            st.success(f"✅ {len(df_import)} produtos importados com sucesso!")
-                            st.balloons()
+                            relatorio = importador.importar(uploaded, uploaded.name, ao_progredir=ao_progredir)
+                            barra.empty()
+                            
+                            if relatorio['importados'] or relatorio['atualizados']:
+                                st.success(
+                                    f"✅ {relatorio['importados']} produtos importados e "
+                                    f"{relatorio['atualizados']} atualizados com sucesso!"
+                                )
+                                st.balloons()
+                            if relatorio['inalterados']:
+                                st.info(f"ℹ️ {relatorio['inalterados']} produto(s) sem alteração")
+                            if relatorio['rejeitados']:
+                                st.warning(f"⚠️ {relatorio['rejeitados']} linha(s) rejeitada(s)")
+                                erros_df = pd.DataFrame(relatorio['erros'])
+                                if relatorio['rejeitados'] > len(erros_df):
+                                    st.caption(f"Exibindo as primeiras {len(erros_df)} linhas rejeitadas")
+                                st.dataframe(erros_df, use_container_width=True, hide_index=True)
+                                st.download_button(
+                                    label="📥 Baixar relatório de erros",
+                                    data=erros_df.to_csv(index=False),
+                                    file_name=f"erros_importacao_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                                    mime="text/csv"
+                                )
                 
                 except Exception as e:
                     st.error(f"Erro ao importar: {e}")
@@ -483,8 +714,6 @@ def modulo_cadastro_produtos(sheets_manager):
             st.subheader("📤 Exportar CSV")
             st.markdown("Baixe todos os produtos cadastrados em formato CSV.")
             
-            produtos_df = sheets_manager.read_user_products(prefix)
-            
             if produtos_df.empty:
                 st.info("Nenhum produto para exportar")
             else:
@@ -505,13 +734,16 @@ def modulo_cadastro_produtos(sheets_manager):
 # MÓDULO 3: RELATÓRIOS
 ###########################################
 
+@Metricas.medir('pagina.relatorios')
 def modulo_relatorios(sheets_manager):
     """Módulo de relatórios e análise visual"""
+    from modules.calculos import CalculadoraMarkup
+    from modules.graficos import GeradorGraficos
+    
     st.header("📊 Relatório de Precificação e Análise Visual")
     
     prefix = st.session_state.get('prefix', '')
-    produtos_df = sheets_manager.read_user_products(prefix)
-    config = sheets_manager.read_user_config(prefix)
+    config, produtos_df = sheets_manager.read_user_data(prefix)
     
     if produtos_df.empty:
         st.warning("📭 Nenhum produto cadastrado. Cadastre produtos para visualizar relatórios.")
@@ -580,31 +812,47 @@ def modulo_relatorios(sheets_manager):
             """)
     
     with col_g2:
-        st.markdown("### Custo Total vs. Preço de Venda Final")
-        
-        # Controle de produtos exibidos
-        num_produtos = st.slider(
-            "Número de produtos a exibir:",
-            min_value=5,
-            max_value=min(50, len(produtos_df)),
-            value=min(10, len(produtos_df)),
-            key="slider_produtos_relatorio"
-        )
-        
-        fig_barras = gerador.grafico_barras_comparativo(produtos_df, limite=num_produtos)
-        st.plotly_chart(fig_barras, use_container_width=True)
+        grafico_custo_vs_preco(produtos_df)
+
+@st.fragment
+@Metricas.medir('fragmento.relatorios')
+def grafico_custo_vs_preco(produtos_df):
+    """
+    Gráfico de barras do relatório com seu controle de quantidade
+    
+    Fragmento: mover o slider redesenha só este gráfico, sem refazer a
+    tabela e a composição do markup.
+    """
+    from modules.graficos import GeradorGraficos
+    
+    st.markdown("### Custo Total vs. Preço de Venda Final")
+    
+    # Controle de produtos exibidos
+    num_produtos = st.slider(
+        "Número de produtos a exibir:",
+        min_value=5,
+        max_value=min(50, len(produtos_df)),
+        value=min(10, len(produtos_df)),
+        key="slider_produtos_relatorio"
+    )
+    
+    fig_barras = GeradorGraficos.grafico_barras_comparativo(produtos_df, limite=num_produtos)
+    st.plotly_chart(fig_barras, use_container_width=True)
 
 ###########################################
 # MÓDULO 4: DASHBOARD
 ###########################################
 
+@Metricas.medir('pagina.dashboard')
 def modulo_dashboard(sheets_manager):
     """Módulo de dashboard gerencial e KPIs"""
+    from modules.calculos import CalculadoraMarkup
+    from modules.graficos import GeradorGraficos
+    
     st.header("📈 Dashboard Gerencial e KPIs de Rentabilidade")
     
     prefix = st.session_state.get('prefix', '')
-    produtos_df = sheets_manager.read_user_products(prefix)
-    config = sheets_manager.read_user_config(prefix)
+    config, produtos_df = sheets_manager.read_user_data(prefix)
     
     if produtos_df.empty:
         st.warning("📭 Nenhum produto cadastrado. Cadastre produtos para visualizar KPIs.")
@@ -702,7 +950,7 @@ def modulo_dashboard(sheets_manager):
         st.markdown("### 📋 Resumo por Categoria")
         
         if 'categoria' in produtos_df.columns:
-            resumo_cat = produtos_df.groupby('categoria').agg({
+            resumo_cat = produtos_df.groupby('categoria', observed=True).agg({
                 'codigo': 'count',
                 'margem_liquida_estimada_pct': 'mean',
                 'lucro_unitario': 'sum'
@@ -733,21 +981,184 @@ def modulo_dashboard(sheets_manager):
         Revise se os preços finais estão alinhados com a estratégia.
         """)
 
+###########################################
+# MÓDULO 5: SIMULADOR DE CENÁRIOS
+###########################################
+
+@Metricas.medir('pagina.cenarios')
+def modulo_cenarios(sheets_manager):
+    """Módulo de simulação de cenários de custo sobre o catálogo (nada é gravado)"""
+    from modules.cenarios import SimuladorCenarios
+    from modules.graficos import GeradorGraficos
+    
+    st.header("🧪 Simulador de Cenários")
+    
+    prefix = st.session_state.get('prefix', '')
+    config, produtos_df = sheets_manager.read_user_data(prefix)
+    
+    if produtos_df.empty:
+        st.warning("📭 Nenhum produto cadastrado. Cadastre produtos para simular cenários.")
+        return
+    
+    st.markdown("""
+    Teste faixas de valores para até dois parâmetros de custo e veja o efeito
+    em todo o catálogo. A configuração e os produtos **não são alterados**.
+    """)
+    
+    campos = st.multiselect(
+        "Parâmetros a variar:", SimuladorCenarios.CAMPOS,
+        default=['cust_var_taxa_cartao_pct', 'cust_fix_aluguel'],
+        max_selections=2, key="cenarios_campos"
+    )
+    
+    with st.form("form_cenarios"):
+        faixas = {}
+        for campo in campos:
+            atual = float(config.get(campo, 0) or 0)
+            passo = 0.1 if campo.endswith('_pct') else 100.0
+            folga = 2.0 if campo.endswith('_pct') else max(1000.0, round(atual * 0.5, -2))
+            col_de, col_ate, col_passos = st.columns(3)
+            with col_de:
+                inicio = st.number_input(f"{campo}: de", min_value=0.0, value=atual, step=passo, key=f"cen_de_{campo}")
+            with col_ate:
+                fim = st.number_input(f"{campo}: até", min_value=0.0, value=atual + folga, step=passo, key=f"cen_ate_{campo}")
+            with col_passos:
+                passos = st.number_input(f"{campo}: passos", min_value=1, max_value=100, value=21, step=1, key=f"cen_passos_{campo}")
+            faixas[campo] = SimuladorCenarios.faixa(inicio, fim, passos)
+        
+        simular = st.form_submit_button("▶️ Simular", type="primary", disabled=not campos)
+    
+    if simular:
+        with st.spinner(f"Calculando {len(produtos_df):,} produtos × cenários...".replace(',', '.')):
+            st.session_state['cenarios_resultado'] = (
+                SimuladorCenarios.avaliar(produtos_df, config, faixas), list(faixas)
+            )
+    
+    if 'cenarios_resultado' not in st.session_state:
+        return
+    grade, eixos = st.session_state['cenarios_resultado']
+    
+    kpi = st.selectbox(
+        "Indicador:", list(SimuladorCenarios.KPIS),
+        format_func=SimuladorCenarios.KPIS.get, key="cenarios_kpi"
+    )
+    if not grade['viavel'].all():
+        st.warning(f"⚠️ {(~grade['viavel']).sum()} cenário(s) com despesas >= 100% do faturamento ficaram em branco")
+    
+    eixo_x, eixo_y = (eixos + [None])[:2]
+    atual = None
+    if eixo_y is None:
+        # Um parâmetro só: uma linha de cenários
+        grade = grade.assign(cenario='')
+        eixo_y = 'cenario'
+    else:
+        atual = (float(config.get(eixo_x, 0) or 0), float(config.get(eixo_y, 0) or 0))
+    fig = GeradorGraficos.grafico_heatmap_cenarios(
+        SimuladorCenarios.matriz(grade, kpi, eixo_x, eixo_y),
+        SimuladorCenarios.KPIS[kpi], eixo_x, eixo_y if atual else '', atual
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    
+    with st.expander(f"📋 Tabela dos {len(grade)} cenários"):
+        tabela = grade.drop(columns=['cenario'], errors='ignore').rename(columns=SimuladorCenarios.KPIS)
+        st.dataframe(tabela, use_container_width=True, hide_index=True)
+        st.download_button(
+            label="⬇️ Baixar CSV",
+            data=tabela.to_csv(index=False),
+            file_name=f"cenarios_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv"
+        )
+
+###########################################
+# MÓDULO 6: RECÁLCULO EM LOTE (ADMIN)
+###########################################
+
+@Metricas.medir('pagina.recalculo_lote')
+def modulo_recalculo_lote(sheets_manager):
+    """Módulo administrativo: aplica alteração de custos a todos os usuários"""
+    import pandas as pd
+    from modules.recalculo import RecalculoEmLote
+    from modules.sessao import DadosSessao
+    
+    st.header("🔄 Recálculo em Lote")
+    
+    if not GerenciadorAutenticacao.e_admin():
+        st.error("❌ Acesso restrito a administradores")
+        return
+    
+    st.markdown("""
+    Altera campos de custo na configuração de **todos os usuários** da aba `users`
+    e recalcula os catálogos. Os demais campos de cada usuário são mantidos.
+    """)
+    
+    job = RecalculoEmLote(sheets_manager)
+    tenants = job.listar_tenants()
+    
+    if not tenants:
+        st.info("📭 Nenhum usuário com sheet_tab_prefix cadastrado.")
+        return
+    
+    campos = st.multiselect("Campos a alterar:", list(sheets_manager._get_default_config().keys()))
+    alteracao = {}
+    col1, col2 = st.columns(2)
+    for i, campo in enumerate(campos):
+        with (col1 if i % 2 == 0 else col2):
+            alteracao[campo] = st.number_input(campo, min_value=0.0, step=0.1, key=f"recalculo_{campo}")
+    
+    selecionados = st.multiselect("Usuários:", tenants, default=tenants)
+    workers = st.slider("Usuários em paralelo:", 1, 16, RecalculoEmLote.MAX_WORKERS)
+    
+    if st.button("🚀 Aplicar e recalcular", type="primary", disabled=not (alteracao and selecionados)):
+        job.max_workers = workers
+        barra = st.progress(0.0, text="Iniciando...")
+        
+        def ao_progredir(resultado, concluidos, total):
+            icone = "✅" if resultado['status'] == 'ok' else "❌"
+            barra.progress(concluidos / total, text=f"{icone} {resultado['prefix']} ({concluidos}/{total})")
+        
+        relatorio = job.executar(alteracao, selecionados, ao_progredir=ao_progredir)
+        # As sessões abertas desses usuários devem ler os novos preços
+        DadosSessao.notificar_escrita(sheets_manager, selecionados)
+        
+        if relatorio['falhas']:
+            st.warning(f"⚠️ {relatorio['falhas']} de {relatorio['total']} usuário(s) com falha")
+        else:
+            st.success(
+                f"✅ {relatorio['sucesso']} usuário(s) e {relatorio['produtos']} produtos "
+                f"recalculados em {relatorio['duracao_s']:.1f}s"
+            )
+        
+        st.dataframe(
+            pd.DataFrame(relatorio['resultados']).rename(columns={
+                'prefix': 'Usuário', 'status': 'Status', 'produtos': 'Produtos',
+                'erro': 'Erro', 'duracao_s': 'Duração (s)'
+            }),
+            use_container_width=True, hide_index=True
+        )
+
 ###########################################
 # FUNÇÃO PRINCIPAL
 ###########################################
 
+@Metricas.medir('app.main')
 def main():
     """Função principal da aplicação"""
     
-    # Inicializar conexão
-    sheets_manager = inicializar_conexao()
-    
-    # Verificar autenticação
+    # Verificar autenticação (o formulário de login só conecta ao backend no envio)
     if not GerenciadorAutenticacao.verificar_autenticacao():
-        GerenciadorAutenticacao.fazer_login(sheets_manager)
+        GerenciadorAutenticacao.fazer_login(inicializar_conexao)
         return
     
+    # Inicializar conexão
+    from modules.sessao import DadosSessao
+    armazenamento = inicializar_conexao()
+    # Os módulos leem da memória da sessão; o armazenamento só é lido de novo
+    # após SESSION_DATA_TTL segundos ou pelo botão de recarregar
+    sheets_manager = DadosSessao(
+        armazenamento, st.session_state,
+        float(os.getenv('SESSION_DATA_TTL', DadosSessao.MAX_IDADE))
+    )
+    
     # Usuário autenticado - exibir interface principal
     exibir_header()
     exibir_info_usuario()
@@ -770,14 +1181,18 @@ def main():
         st.markdown("---")
         
         # Menu de navegação
+        opcoes = [
+            "⚙️ Custos e Despesas",
+            "📦 Cadastro de Produtos",
+            "📊 Relatórios",
+            "📈 Dashboard",
+            "🧪 Simulador de Cenários"
+        ]
+        if GerenciadorAutenticacao.e_admin():
+            opcoes.append("🔄 Recálculo em Lote")
         opcao = st.radio(
             "Navegação:",
-            [
-                "⚙️ Custos e Despesas",
-                "📦 Cadastro de Produtos",
-                "📊 Relatórios",
-                "📈 Dashboard"
-            ],
+            opcoes,
             key="menu_principal"
         )
         
@@ -787,6 +1202,24 @@ def main():
         st.caption(f"👤 {st.session_state.get('display_name')}")
         st.caption(f"🔑 {st.session_state.get('role').upper()}")
         
+        # Status da fila de gravação
+        st.markdown("---")
+        exibir_status_gravacao(armazenamento)
+        
+        # Dados da sessão: descartar a cópia em memória e ler de novo
+        idade = sheets_manager.idade(st.session_state.get('prefix', ''))
+        if idade is not None:
+            st.caption(f"Dados lidos há {idade / 60:.0f} min" if idade >= 60 else "Dados lidos agora")
+        if st.button("🔄 Recarregar dados", use_container_width=True):
+            sheets_manager.recarregar()
+            st.rerun()
+        
+        # Admin: aplicar alterações feitas na aba de usuários sem esperar o TTL
+        if GerenciadorAutenticacao.e_admin():
+            if st.button("🔄 Recarregar usuários", use_container_width=True):
+                GerenciadorAutenticacao.invalidar_usuarios(armazenamento)
+                st.success("Cadastro de usuários recarregado")
+        
         # Versão
         st.markdown("---")
         st.caption("v1.0.0 | © 2025 NMP")
@@ -803,6 +1236,16 @@ def main():
     
     elif opcao == "📈 Dashboard":
         modulo_dashboard(sheets_manager)
+    
+    elif opcao == "🧪 Simulador de Cenários":
+        modulo_cenarios(sheets_manager)
+    
+    elif opcao == "🔄 Recálculo em Lote":
+        modulo_recalculo_lote(armazenamento)
+    
+    # Admin: detalhamento de tempo por camada (METRICAS_ATIVAS=1)
+    if Metricas.ATIVO and GerenciadorAutenticacao.e_admin():
+        exibir_painel_metricas()
 
 # Executar aplicação
 if __name__ == "__main__":
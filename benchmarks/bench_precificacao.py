@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Benchmark de CalculadoraMarkup e do pipeline de relatórios
+Gera catálogos sintéticos (no formato de sample_data/sample_products.csv),
+mede cada etapa e grava os tempos em JSON
+
+Uso:
+    python benchmarks/bench_precificacao.py --sizes 1000 10000 100000 1000000 --output resultados.json
+    python benchmarks/bench_precificacao.py --compare benchmarks/baseline.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.calculos import CalculadoraMarkup
+from modules.cenarios import SimuladorCenarios
+from modules.graficos import GeradorGraficos
+
+TAMANHOS_PADRAO = [1_000, 10_000, 100_000, 1_000_000]
+
+# Grade do simulador de cenários: 21 × 11 combinações de despesas
+FAIXAS_CENARIOS = {
+    'cust_var_impostos_pct': SimuladorCenarios.faixa(0.0, 40.0, 21),
+    'cust_var_taxa_cartao_pct': SimuladorCenarios.faixa(0.0, 10.0, 11)
+}
+
+CATEGORIAS = [
+    'Bebidas', 'Alimentos', 'Higiene', 'Limpeza', 'Snacks', 'Congelados',
+    'Laticínios', 'Padaria', 'Hortifruti', 'Mercearia', 'Pet', 'Utilidades'
+]
+
+CONFIG_BENCH = {
+    'cust_var_impostos_pct': 8.0,
+    'cust_var_royalties_pct': 5.0,
+    'cust_var_gestao_pct': 2.0,
+    'cust_var_taxa_cartao_pct': 3.0,
+    'cust_var_repasse_condominio_pct': 4.0,
+    'cust_var_investidor_pct': 1.0,
+    'cust_fix_monitoramento': 150.0,
+    'cust_fix_combustivel': 300.0,
+    'cust_fix_totem': 200.0,
+    'cust_fix_contabilidade': 400.0,
+    'cust_fix_internet': 120.0,
+    'cust_fix_telefone': 80.0,
+    'cust_fix_seguro': 150.0,
+    'cust_fix_folha': 3000.0,
+    'cust_fix_aluguel': 2500.0,
+    'cust_fix_outros': 300.0,
+    'faturamento_base': 60000.0
+}
+
+def gerar_catalogo(n, seed=42):
+    """Gera catálogo sintético com as colunas de sample_products.csv"""
+    rng = np.random.default_rng(seed)
+    compra = np.round(rng.lognormal(mean=2.0, sigma=0.9, size=n), 2)
+    desp_add = np.round(compra * rng.uniform(0, 0.05, size=n), 2)
+    preco_manual = np.round((compra + desp_add) * rng.uniform(1.2, 2.5, size=n), 2)
+    return pd.DataFrame({
+        'codigo': np.char.add('SKU', np.arange(n).astype(str)),
+        'nome': np.char.add('Produto ', np.arange(n).astype(str)),
+        'compra': compra,
+        'desp_add': desp_add,
+        'margem_desejada_pct': rng.choice([30.0, 35.0, 40.0, 45.0, 50.0], size=n),
+        'preco_final': np.where(rng.random(n) < 0.7, 0.0, preco_manual),
+        'categoria': rng.choice(CATEGORIAS, size=n),
+        'obs': ''
+    })
+
+def dashboard_groupbys(produtos_df):
+    """Reproduz as agregações de app.modulo_dashboard"""
+    df = produtos_df.copy()
+    df['lucro_unitario'] = df['preco_final'] - df['custo_total']
+    df.nlargest(10, 'margem_liquida_estimada_pct')
+    df.nsmallest(10, 'margem_liquida_estimada_pct')
+    df.groupby('categoria', observed=True).agg({
+        'codigo': 'count',
+        'margem_liquida_estimada_pct': 'mean',
+        'lucro_unitario': 'sum'
+    }).round(2)
+    df[df['margem_liquida_estimada_pct'] < 20]
+    df['dif_abs'] = abs(df['diferenca_final_vs_sugerido'])
+    df[df['dif_abs'] > df['preco_sugerido'] * 0.2]
+
+def verificar_cenarios(catalogo):
+    """Catálogo precificado só pelo markup não pode ter produto com prejuízo em nenhum cenário"""
+    so_markup = catalogo.assign(preco_final=0.0)
+    grade = SimuladorCenarios.avaliar(so_markup, CONFIG_BENCH, FAIXAS_CENARIOS)
+    prejuizo = grade['produtos_prejuizo'].max()
+    if prejuizo > 0:
+        raise RuntimeError(f"Simulador de cenários: {prejuizo:.0f} produto(s) com prejuízo só pelo markup")
+
+def medir(funcao, repeticoes):
+    """Executa a função 'repeticoes' vezes e retorna os tempos em segundos"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+def executar(tamanhos, repeticoes):
+    """Roda todos os benchmarks e retorna o documento de resultados"""
+    calc = CalculadoraMarkup()
+    gerador = GeradorGraficos()
+    markup = calc.calcular_markup_usuario(CONFIG_BENCH)
+    resultados = []
+    
+    for n in tamanhos:
+        catalogo = gerar_catalogo(n)
+        precificado = calc.recalcular_produtos(catalogo, markup['markup_mult'], markup['markup_divisor'])
+        verificar_cenarios(catalogo)
+        casos = {
+            'calcular_markup_usuario': lambda: calc.calcular_markup_usuario(CONFIG_BENCH),
+            'recalcular_produtos': lambda: calc.recalcular_produtos(
+                catalogo, markup['markup_mult'], markup['markup_divisor']
+            ),
+            'calcular_kpis': lambda: calc.calcular_kpis(precificado, CONFIG_BENCH),
+            'dashboard_groupbys': lambda: dashboard_groupbys(precificado),
+            'simular_cenarios': lambda: SimuladorCenarios.avaliar(catalogo, CONFIG_BENCH, FAIXAS_CENARIOS),
+            'grafico_doughnut_composicao': lambda: gerador.grafico_doughnut_composicao(markup),
+            'grafico_barras_comparativo': lambda: gerador.grafico_barras_comparativo(precificado, limite=10),
+            'grafico_margem_categoria': lambda: gerador.grafico_margem_categoria(precificado)
+        }
+        for nome, funcao in casos.items():
+            tempos = medir(funcao, repeticoes)
+            resultados.append({
+                'name': nome,
+                'size': n,
+                'repeat': repeticoes,
+                'min_s': min(tempos),
+                'median_s': statistics.median(tempos)
+            })
+            print(f"{nome:<30} n={n:<9} min={min(tempos) * 1000:10.3f} ms  mediana={statistics.median(tempos) * 1000:10.3f} ms")
+    
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform()
+        },
+        'results': resultados
+    }
+
+def comparar(atual, baseline, limite):
+    """
+    Compara resultados com uma baseline pelo tempo mínimo
+    
+    Returns:
+        Lista de regressões (casos mais lentos que baseline * (1 + limite))
+    """
+    base = {(r['name'], r['size']): r for r in baseline['results']}
+    regressoes = []
+    for r in atual['results']:
+        ref = base.get((r['name'], r['size']))
+        if ref is None or ref['min_s'] <= 0:
+            continue
+        razao = r['min_s'] / ref['min_s']
+        marca = 'REGRESSÃO' if razao > 1 + limite else 'ok'
+        print(f"{marca:<10} {r['name']:<30} n={r['size']:<9} {ref['min_s'] * 1000:10.3f} ms -> {r['min_s'] * 1000:10.3f} ms ({razao:.2f}x)")
+        if razao > 1 + limite:
+            regressoes.append({**r, 'baseline_min_s': ref['min_s'], 'ratio': razao})
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do sistema de precificação")
+    parser.add_argument('--sizes', type=int, nargs='+', default=TAMANHOS_PADRAO,
+                        help="Tamanhos de catálogo (padrão: 1k a 1M)")
+    parser.add_argument('--repeat', type=int, default=3, help="Repetições por caso")
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    parser.add_argument('--compare', help="JSON de baseline para detectar regressões")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Tolerância de regressão (0.2 = 20%% mais lento)")
+    args = parser.parse_args()
+    
+    resultado = executar(args.sizes, args.repeat)
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados gravados em {args.output}")
+    
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\nComparação com {args.compare} (tolerância {args.threshold:.0%}):")
+        regressoes = comparar(resultado, baseline, args.threshold)
+        if regressoes:
+            print(f"\n❌ {len(regressoes)} regressão(ões) detectada(s)")
+            sys.exit(1)
+        print("\n✅ Nenhuma regressão")
+
+if __name__ == "__main__":
+    main()
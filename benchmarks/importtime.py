@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Relatório de tempo de importação da tela de login (cold start)
+Executa 'python -X importtime -c "import app"' em processos novos, agrega o
+resultado e verifica que bibliotecas pesadas não voltaram ao caminho do login
+
+Uso:
+    python benchmarks/importtime.py --output benchmarks/importtime_baseline.json
+    python benchmarks/importtime.py --compare benchmarks/importtime_baseline.json --threshold 0.5
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que a tela de login não deve importar (carregados no primeiro uso)
+PROIBIDOS = [
+    'pandas', 'numpy', 'gspread', 'openpyxl', 'google.oauth2',
+    'modules.calculos', 'modules.graficos', 'modules.importacao',
+    'modules.recalculo', 'modules.sheets', 'modules.sqlite_storage'
+]
+
+LINHA = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+def medir_importacao(modulo='app'):
+    """
+    Importa o módulo num processo novo com -X importtime
+    
+    Returns:
+        Lista de (módulo, self_us, cumulativo_us, profundidade)
+    """
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        cwd=RAIZ, capture_output=True, text=True
+    )
+    if processo.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {modulo}:\n{processo.stderr[-2000:]}")
+    linhas = []
+    for linha in processo.stderr.splitlines():
+        m = LINHA.match(linha)
+        if m:
+            linhas.append((m[4], int(m[1]), int(m[2]), len(m[3]) // 2))
+    return linhas
+
+def executar(repeticoes, top):
+    """Mede 'repeticoes' vezes e monta o relatório a partir da execução mais rápida"""
+    # A primeira execução compila os .pyc; não entra na medição
+    medir_importacao()
+    execucoes = [medir_importacao() for _ in range(repeticoes)]
+    melhor = min(execucoes, key=lambda linhas: next(c for n, _, c, _ in linhas if n == 'app'))
+    carregados = {nome for nome, _, _, _ in melhor}
+    diretos = sorted(
+        [(nome, c) for nome, _, c, profundidade in melhor if profundidade == 1],
+        key=lambda item: item[1], reverse=True
+    )
+    total = next(c for n, _, c, _ in melhor if n == 'app')
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': repeticoes
+        },
+        'total_ms': total / 1000,
+        'modules': len(carregados),
+        'top_imports': [{'name': nome, 'cumulative_ms': c / 1000} for nome, c in diretos[:top]],
+        'forbidden_loaded': sorted(p for p in PROIBIDOS if p in carregados)
+    }
+
+def comparar(atual, baseline, limite):
+    """
+    Compara com a baseline
+    
+    Returns:
+        Lista de problemas encontrados (vazia se ok)
+    """
+    problemas = []
+    if atual['forbidden_loaded']:
+        problemas.append(f"módulos pesados no caminho do login: {', '.join(atual['forbidden_loaded'])}")
+    razao = atual['total_ms'] / baseline['total_ms'] if baseline['total_ms'] > 0 else 1.0
+    print(f"tempo total: {baseline['total_ms']:8.1f} ms -> {atual['total_ms']:8.1f} ms ({razao:.2f}x)")
+    print(f"módulos:     {baseline['modules']:8d}    -> {atual['modules']:8d}")
+    if razao > 1 + limite:
+        problemas.append(f"importação {razao:.2f}x mais lenta que a baseline")
+    return problemas
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de importação da tela de login")
+    parser.add_argument('--repeat', type=int, default=5, help="Execuções medidas (vale a mais rápida)")
+    parser.add_argument('--top', type=int, default=15, help="Importações diretas listadas no relatório")
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    parser.add_argument('--compare', help="JSON de baseline para detectar regressões")
+    parser.add_argument('--threshold', type=float, default=0.5,
+                        help="Tolerância de regressão do tempo total (0.5 = 50%% mais lento)")
+    args = parser.parse_args()
+    
+    resultado = executar(args.repeat, args.top)
+    
+    print(f"import app: {resultado['total_ms']:.1f} ms, {resultado['modules']} módulos")
+    for item in resultado['top_imports']:
+        print(f"  {item['cumulative_ms']:8.1f} ms  {item['name']}")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados gravados em {args.output}")
+    
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\nComparação com {args.compare} (tolerância {args.threshold:.0%}):")
+        problemas = comparar(resultado, baseline, args.threshold)
+        if problemas:
+            for problema in problemas:
+                print(f"❌ {problema}")
+            sys.exit(1)
+        print("\n✅ Nenhuma regressão")
+    elif resultado['forbidden_loaded']:
+        print(f"\n❌ Módulos pesados no caminho do login: {', '.join(resultado['forbidden_loaded'])}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
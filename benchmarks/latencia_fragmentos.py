@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Latência por interação nas páginas de custos e de relatórios
+Simula a página com o AppTest do Streamlit e compara, para a mesma
+interação, o rerun da página inteira (comportamento sem fragmentos) com o
+rerun só do fragmento que contém o widget
+
+Uso:
+    python benchmarks/latencia_fragmentos.py --linhas 10000 --repeticoes 20
+    python benchmarks/latencia_fragmentos.py --output latencia.json
+
+Os dados vêm de um SQLite temporário pela camada da sessão, então a leitura
+do armazenamento fica fora da medição (ela só ocorre no primeiro rerun).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streamlit.testing.v1 import AppTest
+
+from bench_precificacao import CONFIG_BENCH, gerar_catalogo
+from modules.calculos import CalculadoraMarkup
+from modules.sqlite_storage import SQLiteManager
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREFIX = 'bench_'
+
+def pagina_custos(backend, raiz, prefix, so_fragmento):
+    import sys
+    sys.path.insert(0, raiz)
+    import streamlit as st
+    import app
+    from modules.sessao import DadosSessao
+    
+    st.session_state['prefix'] = prefix
+    dados = DadosSessao(backend, st.session_state)
+    if so_fragmento:
+        app.formulario_custos(dados, prefix, dados.read_user_config(prefix))
+    else:
+        app.exibir_header()
+        app.modulo_custos_despesas(dados)
+
+def pagina_relatorios(backend, raiz, prefix, so_fragmento):
+    import sys
+    sys.path.insert(0, raiz)
+    import streamlit as st
+    import app
+    from modules.sessao import DadosSessao
+    
+    st.session_state['prefix'] = prefix
+    dados = DadosSessao(backend, st.session_state)
+    if so_fragmento:
+        app.grafico_custo_vs_preco(dados.read_user_products(prefix))
+    else:
+        app.exibir_header()
+        app.modulo_relatorios(dados)
+
+def interagir_custos(at, i):
+    at.number_input[0].set_value(5.0 + (i % 10) * 0.1)
+
+def interagir_relatorios(at, i):
+    at.slider(key='slider_produtos_relatorio').set_value(5 + i % 20)
+
+INTERACOES = {
+    'custos: alterar campo': (pagina_custos, interagir_custos),
+    'relatorios: mover slider': (pagina_relatorios, interagir_relatorios)
+}
+
+def medir(pagina, interagir, backend, so_fragmento, repeticoes):
+    """Tempos (ms) dos reruns disparados pela interação, após o primeiro carregamento"""
+    at = AppTest.from_function(
+        pagina, args=(backend, RAIZ, PREFIX, so_fragmento), default_timeout=120
+    )
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    tempos = []
+    for i in range(repeticoes):
+        interagir(at, i)
+        inicio = time.perf_counter()
+        at.run()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+def main():
+    parser = argparse.ArgumentParser(description="Latência por interação com e sem fragmentos")
+    parser.add_argument('--linhas', type=int, default=10_000, help="Tamanho do catálogo sintético")
+    parser.add_argument('--repeticoes', type=int, default=20, help="Interações medidas por cenário")
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        backend = SQLiteManager(os.path.join(pasta, 'bench.db'))
+        backend.initialize_user_sheets(PREFIX)
+        backend.write_user_config(PREFIX, CONFIG_BENCH)
+        markup = CalculadoraMarkup.calcular_markup_usuario(CONFIG_BENCH)
+        backend.write_user_products(PREFIX, CalculadoraMarkup.recalcular_produtos(
+            gerar_catalogo(args.linhas), markup['markup_mult'], markup['markup_divisor']
+        ))
+        
+        resultados = {}
+        for nome, (pagina, interagir) in INTERACOES.items():
+            resultados[nome] = {}
+            for rotulo, so_fragmento in [('pagina_inteira', False), ('fragmento', True)]:
+                tempos = medir(pagina, interagir, backend, so_fragmento, args.repeticoes)
+                resultados[nome][rotulo] = {
+                    'mediana_ms': round(statistics.median(tempos), 2),
+                    'p95_ms': round(sorted(tempos)[int(len(tempos) * 0.95) - 1], 2)
+                }
+            antes = resultados[nome]['pagina_inteira']['mediana_ms']
+            depois = resultados[nome]['fragmento']['mediana_ms']
+            print(f"{nome:<28} página inteira {antes:8.1f} ms -> fragmento {depois:8.1f} ms "
+                  f"({antes / max(depois, 1e-9):.1f}x)")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'linhas': args.linhas, 'repeticoes': args.repeticoes, 'resultados': resultados},
+                      f, indent=2, ensure_ascii=False)
+        print(f"\nResultados gravados em {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Relatório de memória do catálogo antes e depois do esquema de produtos
+Compara o DataFrame como os backends o montam (colunas object) com o
+tipado por EsquemaProdutos, e o tempo do groupby por categoria do dashboard
+
+Uso:
+    python benchmarks/memoria_esquema.py --linhas 1000000
+    python benchmarks/memoria_esquema.py --csv catalogo.csv --output memoria.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_precificacao import CONFIG_BENCH, gerar_catalogo
+from modules.calculos import CalculadoraMarkup
+from modules.esquema import EsquemaProdutos
+
+def catalogo_como_planilha(n):
+    """
+    Catálogo precificado no formato de get_all_records: células vazias como
+    '' e códigos numéricos como int, o que deixa as colunas como object
+    """
+    calc = CalculadoraMarkup()
+    markup = calc.calcular_markup_usuario(CONFIG_BENCH)
+    df = calc.recalcular_produtos(gerar_catalogo(n), markup['markup_mult'], markup['markup_divisor'])
+    bruto = df.astype(object)
+    bruto['obs'] = ''
+    metade = np.arange(n) % 2 == 0
+    bruto.loc[metade, 'codigo'] = np.arange(n)[metade]
+    bruto.loc[np.arange(n) % 10 == 0, 'desp_add'] = ''
+    return bruto
+
+def medir_groupby(df, repeticoes=5):
+    """Menor tempo (ms) da agregação por categoria do dashboard"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        df.groupby('categoria', observed=True).agg({
+            'codigo': 'count',
+            'margem_liquida_estimada_pct': 'mean',
+            'preco_final': 'sum'
+        })
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return min(tempos)
+
+def main():
+    parser = argparse.ArgumentParser(description="Memória do catálogo com e sem esquema")
+    parser.add_argument('--linhas', type=int, default=1_000_000, help="Tamanho do catálogo sintético")
+    parser.add_argument('--csv', help="Usar um catálogo real (lido como texto, sem inferência)")
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    args = parser.parse_args()
+    
+    if args.csv:
+        bruto = pd.read_csv(args.csv, dtype=object, keep_default_na=False)
+    else:
+        bruto = catalogo_como_planilha(args.linhas)
+    
+    inicio = time.perf_counter()
+    relatorio = EsquemaProdutos.relatorio_memoria(bruto)
+    tipado = EsquemaProdutos.aplicar(bruto)
+    relatorio['aplicar_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+    relatorio['groupby_ms'] = {
+        'antes': round(medir_groupby(bruto.assign(
+            margem_liquida_estimada_pct=pd.to_numeric(bruto['margem_liquida_estimada_pct'], errors='coerce'),
+            preco_final=pd.to_numeric(bruto['preco_final'], errors='coerce')
+        )), 2),
+        'depois': round(medir_groupby(tipado), 2)
+    }
+    
+    mb = 1024 * 1024
+    print(f"{relatorio['linhas']:,} linhas: {relatorio['antes_bytes'] / mb:,.1f} MB -> "
+          f"{relatorio['depois_bytes'] / mb:,.1f} MB ({relatorio['reducao_pct']}% menos)")
+    for coluna, dados in relatorio['colunas'].items():
+        print(f"  {coluna:<30} {dados['antes'] / mb:8.1f} MB -> {dados['depois'] / mb:8.1f} MB  {dados['dtype']}")
+    print(f"aplicar esquema: {relatorio['aplicar_ms']:.1f} ms")
+    print(f"groupby por categoria: {relatorio['groupby_ms']['antes']:.1f} ms -> {relatorio['groupby_ms']['depois']:.1f} ms")
+    if relatorio['invalidos']:
+        print(f"valores inválidos convertidos em NaN: {relatorio['invalidos']}")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados gravados em {args.output}")
+
+if __name__ == "__main__":
+    main()
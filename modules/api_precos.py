@@ -0,0 +1,309 @@
+"""
+Módulo da API de Preços
+Serviço HTTP assíncrono (Starlette) que expõe CalculadoraMarkup e o
+armazenamento para integração com PDV e ERP
+"""
+import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from modules.cache import CacheTTL
+from modules.calculos import CalculadoraMarkup
+from modules.storage import StorageBackend
+
+class ServicoPrecos:
+    """
+    Consultas de preço com catálogo em memória por usuário (tenant)
+    
+    Cada catálogo é carregado uma vez por TTL, repreçado com a config atual
+    e indexado por código. Requisições simultâneas ao mesmo tenant durante a
+    carga aguardam a mesma leitura, em vez de cada uma ir ao armazenamento.
+    """
+    
+    CACHE_TTL = 30.0
+    CACHE_MAX_TENANTS = 256
+    # Limite de itens por requisição em lote
+    MAX_ITENS = 10_000
+    
+    CAMPOS_PRECO = [
+        'codigo', 'nome', 'categoria', 'custo_total', 'preco_sugerido',
+        'preco_final', 'margem_liquida_estimada_pct'
+    ]
+    CAMPOS_COTACAO = [
+        'compra', 'desp_add', 'custo_total', 'preco_sugerido', 'preco_final',
+        'diferenca_final_vs_sugerido', 'margem_liquida_estimada_pct'
+    ]
+    # Valores em reais saem em centavos; multiplicadores e percentuais com 6 casas
+    CAMPOS_MOEDA = {
+        'compra', 'desp_add', 'custo_total', 'preco_sugerido', 'preco_final',
+        'diferenca_final_vs_sugerido', 'lucro_total_estimado'
+    }
+    
+    def __init__(
+        self,
+        storage: StorageBackend,
+        cache_ttl: float = CACHE_TTL,
+        cache_max_tenants: int = CACHE_MAX_TENANTS,
+        threads_leitura: int = 8
+    ):
+        """
+        Inicializa o serviço
+        
+        Args:
+            storage: Backend de armazenamento (chamado fora do event loop)
+            cache_ttl: Validade do catálogo em memória, em segundos
+            cache_max_tenants: Número máximo de catálogos em memória
+            threads_leitura: Threads para leitura e preparação dos catálogos
+        """
+        self.storage = storage
+        self.calc = CalculadoraMarkup()
+        self._cache = CacheTTL(ttl=cache_ttl, max_itens=cache_max_tenants)
+        self._carregando: Dict[str, asyncio.Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=threads_leitura, thread_name_prefix='api-precos')
+    
+    @staticmethod
+    def _json(valor: Any, casas: Optional[int] = 6) -> Any:
+        """Converte valores NumPy/NaN em tipos JSON, arredondando floats a 'casas' (None mantém)"""
+        if isinstance(valor, np.generic):
+            valor = valor.item()
+        if isinstance(valor, float):
+            if math.isnan(valor):
+                return None
+            return valor if casas is None else round(valor, casas)
+        return valor
+    
+    @classmethod
+    def _casas(cls, campo: str) -> int:
+        return 2 if campo in cls.CAMPOS_MOEDA else 6
+    
+    def _montar_catalogo(self, prefix: str) -> Dict[str, Any]:
+        """Lê config e produtos, reprecifica e indexa (executa numa thread)"""
+        config, produtos_df = self.storage.read_user_data(prefix)
+        markup = self.calc.calcular_markup_usuario(config)
+        catalogo = {
+            'erro_markup': markup['erro_markup'], 'markup': markup, 'registros': [], 'kpis': None,
+            'existe': not produtos_df.empty or prefix in self._prefixos_cadastrados()
+        }
+        if markup['erro_markup']:
+            catalogo['indice'] = pd.Index([])
+            return catalogo
+        
+        if not produtos_df.empty and 'codigo' in produtos_df.columns:
+            produtos_df = self.calc.recalcular_produtos(
+                produtos_df, markup['markup_mult'], markup['markup_divisor']
+            ).drop_duplicates('codigo')
+        else:
+            produtos_df = pd.DataFrame(columns=self.CAMPOS_PRECO)
+        
+        catalogo['indice'] = pd.Index(produtos_df['codigo'].astype(str))
+        resposta = produtos_df.reindex(columns=self.CAMPOS_PRECO)
+        catalogo['registros'] = [
+            {campo: self._json(v, self._casas(campo)) for campo, v in zip(self.CAMPOS_PRECO, linha)}
+            for linha in resposta.itertuples(index=False)
+        ]
+        catalogo['kpis'] = {
+            k: self._json(v, self._casas(k)) for k, v in self.calc.calcular_kpis(produtos_df, config).items()
+        }
+        return catalogo
+    
+    def _prefixos_cadastrados(self) -> set:
+        """Prefixos da aba de usuários"""
+        users_df = self.storage.read_users()
+        if users_df.empty or 'sheet_tab_prefix' not in users_df.columns:
+            return set()
+        return set(users_df['sheet_tab_prefix'].dropna().astype(str).str.strip())
+    
+    async def obter_catalogo(self, prefix: str) -> Dict[str, Any]:
+        """Retorna o catálogo em memória, carregando uma única vez por TTL"""
+        catalogo = self._cache.get(prefix)
+        if catalogo is not None:
+            return catalogo
+        
+        carga = self._carregando.get(prefix)
+        if carga is None:
+            loop = asyncio.get_running_loop()
+            carga = loop.run_in_executor(self._executor, self._montar_catalogo, prefix)
+            self._carregando[prefix] = carga
+            
+            def concluir(futuro):
+                self._carregando.pop(prefix, None)
+                if not futuro.cancelled() and futuro.exception() is None:
+                    self._cache.set(prefix, futuro.result())
+            carga.add_done_callback(concluir)
+        return await asyncio.shield(carga)
+    
+    def invalidar(self, prefix: Optional[str] = None):
+        """Descarta o catálogo em memória de um tenant (ou de todos)"""
+        self._cache.invalidate(prefix)
+    
+    def cache_stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+    
+    async def _catalogo_precificavel(self, prefix: str) -> Dict[str, Any]:
+        """Catálogo do tenant; 404 se o usuário não existe, 409 se a config não permite preço"""
+        catalogo = await self.obter_catalogo(prefix)
+        if not catalogo['existe']:
+            raise HTTPException(404, f"Usuário '{prefix}' não encontrado")
+        if catalogo['erro_markup']:
+            raise HTTPException(409, catalogo['erro_markup'])
+        return catalogo
+    
+    async def precos(self, prefix: str, codigos: List[Any]) -> Dict[str, Any]:
+        """
+        Consulta preços por código em lote
+        
+        Args:
+            prefix: Prefixo do tenant
+            codigos: Códigos a consultar
+        
+        Returns:
+            Dicionário com 'precos' (na ordem pedida) e 'nao_encontrados'
+        """
+        catalogo = await self._catalogo_precificavel(prefix)
+        codigos = [str(c) for c in codigos]
+        posicoes = catalogo['indice'].get_indexer(codigos)
+        registros = catalogo['registros']
+        return {
+            'precos': [registros[p] for p in posicoes if p >= 0],
+            'nao_encontrados': [c for c, p in zip(codigos, posicoes) if p < 0]
+        }
+    
+    async def cotar(self, prefix: str, itens: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Precifica uma lista de custos avulsa com o markup do tenant
+        
+        Args:
+            prefix: Prefixo do tenant
+            itens: Dicionários com compra e, opcionalmente, desp_add e preco_final
+                (demais campos voltam como enviados)
+        
+        Returns:
+            Dicionário com 'markup_mult', 'markup_divisor' e 'itens' precificados
+        """
+        catalogo = await self._catalogo_precificavel(prefix)
+        markup = catalogo['markup']
+        return {
+            'markup_mult': self._json(markup['markup_mult']),
+            'markup_divisor': self._json(float(markup['markup_divisor'])),
+            # Repreçar é CPU: fora do event loop
+            'itens': await run_in_threadpool(self._precificar_itens, itens, markup)
+        }
+    
+    def _precificar_itens(self, itens: List[Dict[str, Any]], markup: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Valida e precifica os itens de uma cotação (executa numa thread)"""
+        df = pd.DataFrame(itens)
+        if df.empty:
+            return []
+        if 'compra' not in df.columns:
+            raise HTTPException(400, "Todos os itens precisam de 'compra'")
+        for coluna in ['compra', 'desp_add', 'preco_final']:
+            if coluna not in df.columns:
+                df[coluna] = 0.0
+                continue
+            valores = pd.to_numeric(df[coluna], errors='coerce')
+            # Só 'compra' é obrigatória; nas demais, item sem o campo vale 0
+            ausentes = df[coluna].isna() if coluna != 'compra' else pd.Series(False, index=df.index)
+            invalidos = np.flatnonzero((valores.isna() & ~ausentes) | (valores < 0))
+            if len(invalidos):
+                raise HTTPException(400, f"Valor inválido em '{coluna}' no item {int(invalidos[0])}")
+            df[coluna] = valores.fillna(0.0)
+        
+        precificado = self.calc.recalcular_produtos(df, markup['markup_mult'], markup['markup_divisor'])
+        extras = [c for c in df.columns if c not in self.CAMPOS_COTACAO]
+        campos = extras + self.CAMPOS_COTACAO
+        # Campos extras voltam como enviados
+        casas = [None] * len(extras) + [self._casas(campo) for campo in self.CAMPOS_COTACAO]
+        return [
+            {campo: self._json(v, c) for campo, v, c in zip(campos, linha, casas)}
+            for linha in precificado[campos].itertuples(index=False)
+        ]
+    
+    async def kpis(self, prefix: str) -> Dict[str, Any]:
+        """KPIs do catálogo do tenant, como no dashboard"""
+        catalogo = await self._catalogo_precificavel(prefix)
+        return {**catalogo['kpis'], 'markup_mult': self._json(catalogo['markup']['markup_mult'])}
+
+def criar_app(servico: ServicoPrecos, tokens: Optional[Dict[str, str]]) -> Starlette:
+    """
+    Monta a aplicação HTTP
+    
+    Args:
+        servico: Serviço de preços
+        tokens: Token -> prefixo autorizado ('*' libera todos); None desativa a autenticação
+    
+    Returns:
+        Aplicação ASGI
+    """
+    def autorizar(request: Request) -> str:
+        prefix = request.path_params['prefix']
+        if tokens is None:
+            return prefix
+        token = request.headers.get('authorization', '').removeprefix('Bearer ').strip()
+        permitido = tokens.get(token)
+        if permitido is None:
+            raise HTTPException(401, "Token inválido")
+        if permitido not in ('*', prefix):
+            raise HTTPException(403, "Token sem acesso a este usuário")
+        return prefix
+    
+    async def ler_lista(request: Request, campo: str) -> List[Any]:
+        try:
+            corpo = await request.json()
+        except ValueError:
+            raise HTTPException(400, "Corpo JSON inválido")
+        lista = corpo.get(campo) if isinstance(corpo, dict) else None
+        if not isinstance(lista, list):
+            raise HTTPException(400, f"Informe a lista '{campo}'")
+        if len(lista) > ServicoPrecos.MAX_ITENS:
+            raise HTTPException(413, f"Máximo de {ServicoPrecos.MAX_ITENS} itens por requisição")
+        return lista
+    
+    async def saude(request: Request):
+        return JSONResponse({'status': 'ok', 'cache': servico.cache_stats()})
+    
+    async def precos(request: Request):
+        prefix = autorizar(request)
+        if request.method == 'GET':
+            codigos = request.query_params.getlist('codigo')
+        else:
+            codigos = await ler_lista(request, 'codigos')
+        return JSONResponse(await servico.precos(prefix, codigos))
+    
+    async def cotacoes(request: Request):
+        prefix = autorizar(request)
+        itens = await ler_lista(request, 'itens')
+        if not all(isinstance(item, dict) for item in itens):
+            raise HTTPException(400, "Cada item deve ser um objeto")
+        return JSONResponse(await servico.cotar(prefix, itens))
+    
+    async def kpis(request: Request):
+        return JSONResponse(await servico.kpis(autorizar(request)))
+    
+    async def invalidar(request: Request):
+        prefix = autorizar(request)
+        servico.invalidar(prefix)
+        return JSONResponse({'status': 'ok'})
+    
+    async def erro_http(request: Request, exc: HTTPException):
+        return JSONResponse({'erro': exc.detail}, status_code=exc.status_code)
+    
+    return Starlette(
+        routes=[
+            Route('/health', saude),
+            Route('/v1/tenants/{prefix}/precos', precos, methods=['GET', 'POST']),
+            Route('/v1/tenants/{prefix}/cotacoes', cotacoes, methods=['POST']),
+            Route('/v1/tenants/{prefix}/kpis', kpis),
+            Route('/v1/tenants/{prefix}/cache', invalidar, methods=['DELETE'])
+        ],
+        exception_handlers={HTTPException: erro_http}
+    )
@@ -2,15 +2,113 @@
 Módulo de Autenticação
 Gerencia login e controle de acesso
 """
+import threading
+import time
+import weakref
 import bcrypt
 import streamlit as st
-import pandas as pd
-from typing import Optional, Dict, Tuple
+from modules.metricas import Metricas
+from typing import TYPE_CHECKING, Callable, Optional, Dict, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+class DiretorioUsuarios:
+    """Índice em memória dos usuários por user_id, recarregado após o TTL"""
+    
+    # Validade do índice e intervalo mínimo entre recargas forçadas por usuário desconhecido
+    TTL = 300.0
+    RECARGA_MINIMA = 30.0
+    
+    def __init__(self, sheets_manager, ttl: float = TTL):
+        """
+        Inicializa o diretório (a carga acontece na primeira consulta)
+        
+        Args:
+            sheets_manager: Backend de armazenamento com read_users()
+            ttl: Validade do índice em segundos
+        """
+        self.sheets_manager = sheets_manager
+        self.ttl = ttl
+        self._usuarios: Optional[Dict[str, Dict]] = None
+        self._carregado_em = 0.0
+        self._lock = threading.Lock()
+    
+    def _carregar(self) -> Dict[str, Dict]:
+        users_df = self.sheets_manager.read_users()
+        if users_df.empty or 'user_id' not in users_df.columns:
+            usuarios = {}
+        else:
+            usuarios = {str(u['user_id']): u for u in users_df.to_dict('records')}
+        self._usuarios = usuarios
+        self._carregado_em = time.monotonic()
+        return usuarios
+    
+    def _garantir_carregado(self) -> Dict[str, Dict]:
+        """Índice válido, lido sob o lock (invalidar() pode zerar self._usuarios logo depois)"""
+        with self._lock:
+            if self._usuarios is None or time.monotonic() - self._carregado_em >= self.ttl:
+                return self._carregar()
+            return self._usuarios
+    
+    def obter(self, user_id: str) -> Optional[Dict]:
+        """
+        Busca usuário pelo user_id em O(1)
+        
+        Se o usuário não estiver no índice e a última carga tiver mais de
+        RECARGA_MINIMA segundos, recarrega uma vez (usuário recém-cadastrado).
+        
+        Args:
+            user_id: ID do usuário
+            
+        Returns:
+            Dados do usuário ou None se não existir
+        """
+        usuarios = self._garantir_carregado()
+        user_data = usuarios.get(str(user_id))
+        if user_data is None:
+            with self._lock:
+                usuarios = self._usuarios
+                if usuarios is None or time.monotonic() - self._carregado_em >= self.RECARGA_MINIMA:
+                    usuarios = self._carregar()
+                user_data = usuarios.get(str(user_id))
+        return dict(user_data) if user_data is not None else None
+    
+    def vazio(self) -> bool:
+        """Indica se não há nenhum usuário cadastrado"""
+        return not self._garantir_carregado()
+    
+    def invalidar(self):
+        """Descarta o índice; a próxima consulta relê a aba de usuários"""
+        with self._lock:
+            self._usuarios = None
+        if hasattr(self.sheets_manager, 'invalidate_cache'):
+            self.sheets_manager.invalidate_cache('users')
 
 class GerenciadorAutenticacao:
     """Gerenciador de autenticação de usuários"""
     
+    # Um diretório de usuários por backend, compartilhado entre as sessões
+    _diretorios = weakref.WeakKeyDictionary()
+    _lock_diretorios = threading.Lock()
+    
     @staticmethod
+    def obter_diretorio(sheets_manager) -> DiretorioUsuarios:
+        """Retorna o diretório de usuários em cache do backend"""
+        with GerenciadorAutenticacao._lock_diretorios:
+            diretorio = GerenciadorAutenticacao._diretorios.get(sheets_manager)
+            if diretorio is None:
+                diretorio = DiretorioUsuarios(sheets_manager)
+                GerenciadorAutenticacao._diretorios[sheets_manager] = diretorio
+            return diretorio
+    
+    @staticmethod
+    def invalidar_usuarios(sheets_manager):
+        """Hook para quando um admin altera a aba de usuários: força recarga no próximo login"""
+        GerenciadorAutenticacao.obter_diretorio(sheets_manager).invalidar()
+    
+    @staticmethod
+    @Metricas.medir('auth.verificar_senha')
     def verificar_senha(senha: str, hash_armazenado: str) -> bool:
         """Verifica se senha corresponde ao hash bcrypt"""
         try:
@@ -25,16 +123,31 @@ class GerenciadorAutenticacao:
     def autenticar_usuario(
         username: str,
         senha: str,
-        users_df: pd.DataFrame
+        users_df: 'pd.DataFrame'
     ) -> Tuple[bool, Optional[Dict], Optional[str]]:
         """Autentica usuário"""
         user_row = users_df[users_df['user_id'] == username]
-        
-        if user_row.empty:
+        user_data = user_row.iloc[0].to_dict() if not user_row.empty else None
+        return GerenciadorAutenticacao._validar_credenciais(user_data, senha)
+    
+    @staticmethod
+    def autenticar_no_diretorio(
+        username: str,
+        senha: str,
+        diretorio: DiretorioUsuarios
+    ) -> Tuple[bool, Optional[Dict], Optional[str]]:
+        """Autentica usuário com busca O(1) no diretório em cache"""
+        return GerenciadorAutenticacao._validar_credenciais(diretorio.obter(username), senha)
+    
+    @staticmethod
+    def _validar_credenciais(
+        user_data: Optional[Dict],
+        senha: str
+    ) -> Tuple[bool, Optional[Dict], Optional[str]]:
+        """Valida existência e status antes de executar o bcrypt, que é caro"""
+        if user_data is None:
             return False, None, "Usuário não encontrado"
         
-        user_data = user_row.iloc[0].to_dict()
-        
         if not user_data.get('active', False):
             return False, None, "Usuário desativado"
         
@@ -45,8 +158,15 @@ class GerenciadorAutenticacao:
         return True, user_data, None
     
     @staticmethod
-    def fazer_login(sheets_manager):
-        """Exibe formulário de login e gerencia sessão"""
+    def fazer_login(conectar: Callable):
+        """
+        Exibe formulário de login e gerencia sessão
+        
+        Args:
+            conectar: Função que retorna o backend de armazenamento; só é
+                chamada no envio do formulário, para a tela abrir sem
+                carregar pandas nem o cliente do Google Sheets
+        """
         st.title("🔐 Sistema de Precificação Estratégica")
         st.markdown("### Login")
         
@@ -60,14 +180,15 @@ class GerenciadorAutenticacao:
                     st.error("Por favor, preencha usuário e senha")
                     return
                 
-                users_df = sheets_manager.read_users()
+                sheets_manager = conectar()
+                diretorio = GerenciadorAutenticacao.obter_diretorio(sheets_manager)
                 
-                if users_df.empty:
+                if diretorio.vazio():
                     st.error("Nenhum usuário cadastrado no sistema")
                     return
                 
-                autenticado, user_data, erro = GerenciadorAutenticacao.autenticar_usuario(
-                    username, password, users_df
+                autenticado, user_data, erro = GerenciadorAutenticacao.autenticar_no_diretorio(
+                    username, password, diretorio
                 )
                 
                 if autenticado:
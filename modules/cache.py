@@ -0,0 +1,66 @@
+"""
+Módulo de Cache em Memória
+Cache com expiração por tempo (TTL) e limite de tamanho com despejo LRU
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+class CacheTTL:
+    """Cache chave/valor seguro para threads, com TTL e despejo do item menos usado"""
+    
+    def __init__(self, ttl: float, max_itens: int):
+        """
+        Inicializa o cache
+        
+        Args:
+            ttl: Tempo de vida de cada entrada, em segundos (0 desativa o cache)
+            max_itens: Número máximo de entradas antes de despejar a menos usada
+        """
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+    
+    def get(self, chave: Hashable) -> Optional[Any]:
+        """Retorna o valor em cache ou None se ausente/expirado"""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self._stats['misses'] += 1
+                return None
+            expira_em, valor = item
+            if time.monotonic() >= expira_em:
+                del self._itens[chave]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._itens.move_to_end(chave)
+            self._stats['hits'] += 1
+            return valor
+    
+    def set(self, chave: Hashable, valor: Any):
+        """Armazena valor, despejando as entradas menos usadas acima do limite"""
+        if self.ttl <= 0 or self.max_itens <= 0:
+            return
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self._stats['evictions'] += 1
+    
+    def invalidate(self, chave: Optional[Hashable] = None):
+        """Remove uma entrada, ou todas se chave for None"""
+        with self._lock:
+            if chave is None:
+                self._itens.clear()
+            else:
+                self._itens.pop(chave, None)
+    
+    def stats(self) -> Dict[str, int]:
+        """Retorna contadores de hits, misses, despejos e expirações"""
+        with self._lock:
+            return {**self._stats, 'size': len(self._itens)}
@@ -2,12 +2,56 @@
 Módulo de Cálculos de Markup e Precificação
 Implementa todas as fórmulas e validações
 """
+import numpy as np
 import pandas as pd
+from modules.esquema import EsquemaProdutos
+from modules.metricas import Metricas
 from typing import Dict, Tuple
 
+# Folga para o erro de representação binária: 1.005 * 100 vale
+# 100.49999999999999 em float, mas é um empate no valor decimal digitado
+_FOLGA_EMPATE = 1e-6
+
+def arredondar_meio_para_cima(valores, escala: float = 1.0) -> np.ndarray:
+    """
+    Multiplica pela escala e arredonda ao inteiro mais próximo, com empates
+    para longe do zero (ROUND_HALF_UP do módulo decimal)
+    
+    Args:
+        valores: Valores a arredondar (NaN vira 0)
+        escala: Fator aplicado antes do arredondamento (100 para centavos);
+            pode ser um array que se combina com os valores por broadcasting
+    
+    Returns:
+        Array int64 com o formato de valores × escala
+    """
+    escalados = np.asarray(valores, dtype=float) * escala
+    forma = np.shape(escalados)
+    escalados = np.atleast_1d(escalados)
+    inteiros = np.abs(escalados)
+    inteiros += 0.5 + _FOLGA_EMPATE
+    np.floor(inteiros, out=inteiros)
+    np.copysign(inteiros, escalados, out=inteiros)
+    inteiros[np.isnan(inteiros)] = 0
+    return inteiros.astype(np.int64).reshape(forma)
+
+def para_centavos(reais) -> np.ndarray:
+    """Converte valores em reais para centavos int64 (meio para cima; NaN vira 0)"""
+    return arredondar_meio_para_cima(reais, 100)
+
+def para_reais(centavos) -> np.ndarray:
+    """Converte centavos int64 para reais (float com no máximo 2 casas)"""
+    return np.asarray(centavos, dtype=np.int64) / 100
+
+@Metricas.instrumentar('calculos')
 class CalculadoraMarkup:
     """Calculadora de Markup e Precificação"""
     
+    COLUNAS_CALCULADAS = [
+        'custo_total', 'markup_divisor_pct', 'markup_mult', 'preco_sugerido',
+        'preco_final', 'diferenca_final_vs_sugerido', 'margem_liquida_estimada_pct'
+    ]
+    
     @staticmethod
     def calcular_markup_usuario(config: Dict[str, float]) -> Dict[str, float]:
         # Cálculos de markup conforme regras do projeto
@@ -57,44 +101,180 @@ class CalculadoraMarkup:
     
     @staticmethod
     def calcular_produto(produto: Dict, markup_mult: float, markup_divisor: float) -> Dict:
-        compra = float(produto.get('compra', 0))
-        desp_add = float(produto.get('desp_add', 0))
-        custo_total = compra + desp_add
-        markup_divisor_pct = round(markup_divisor * 100, 4)
-        preco_sugerido = round(custo_total * markup_mult, 2)
-        preco_final = float(produto.get('preco_final', 0))
-        if preco_final <= 0:
-            preco_final = preco_sugerido
-        diferenca_final_vs_sugerido = round(preco_final - preco_sugerido, 2)
-        if preco_final > 0:
-            margem_liquida_estimada_pct = round(
-                ((preco_final - custo_total) / preco_final) * 100, 2
-            )
-        else:
-            margem_liquida_estimada_pct = 0
+        """Calcula um único produto usando o motor vetorizado de recalcular_produtos"""
+        produto_df = pd.DataFrame([produto])
+        produto_calc = CalculadoraMarkup.recalcular_produtos(produto_df, markup_mult, markup_divisor)
         produto_atualizado = produto.copy()
         produto_atualizado.update({
+            coluna: produto_calc.at[0, coluna].item()
+            for coluna in CalculadoraMarkup.COLUNAS_CALCULADAS
+        })
+        return produto_atualizado
+    
+    @staticmethod
+    def precificar_centavos(
+        compra: np.ndarray,
+        desp_add: np.ndarray,
+        preco_final: np.ndarray,
+        markup_mult: float
+    ) -> Dict[str, np.ndarray]:
+        """
+        Núcleo da precificação, todo em centavos int64
+        
+        Regras de arredondamento (sempre por item, meio para cima):
+        - custo_total = compra + desp_add (soma exata de centavos)
+        - preco_sugerido = custo_total × markup_mult, arredondado ao centavo
+        - preco_final <= 0 usa o preço sugerido
+        - diferenca = preco_final - preco_sugerido (exata)
+        - margem em pontos-base (0,01%) = (preco_final - custo_total) / preco_final,
+          arredondada ao ponto-base; 0 se não há preço
+        
+        Args:
+            compra: Custo de compra em centavos
+            desp_add: Despesas adicionais em centavos
+            preco_final: Preço final praticado em centavos (<= 0 = usar o sugerido)
+            markup_mult: Multiplicador de markup do usuário
+        
+        Returns:
+            Dicionário de arrays int64: custo_total, preco_sugerido, preco_final,
+            diferenca_final_vs_sugerido (centavos) e margem_liquida_bp
+        """
+        custo_total = compra + desp_add
+        preco_sugerido = arredondar_meio_para_cima(custo_total, markup_mult)
+        preco_final = np.where(preco_final <= 0, preco_sugerido, preco_final)
+        tem_preco = preco_final > 0
+        margem = np.divide(
+            (preco_final - custo_total) * 10_000, preco_final,
+            out=np.zeros(len(preco_final)), where=tem_preco
+        )
+        return {
             'custo_total': custo_total,
-            'markup_divisor_pct': markup_divisor_pct,
-            'markup_mult': markup_mult,
             'preco_sugerido': preco_sugerido,
             'preco_final': preco_final,
-            'diferenca_final_vs_sugerido': diferenca_final_vs_sugerido,
-            'margem_liquida_estimada_pct': margem_liquida_estimada_pct
-        })
-        return produto_atualizado
+            'diferenca_final_vs_sugerido': preco_final - preco_sugerido,
+            'margem_liquida_bp': arredondar_meio_para_cima(margem)
+        }
     
     @staticmethod
     def recalcular_produtos(produtos_df: pd.DataFrame, markup_mult: float, markup_divisor: float) -> pd.DataFrame:
+        """
+        Recalcula o catálogo inteiro em uma única passada vetorizada
+        
+        Os valores em reais são convertidos para centavos na entrada e de
+        volta na saída; o cálculo é feito por precificar_centavos. Linhas sem
+        'compra' numérica ficam com as colunas calculadas vazias (NaN).
+        
+        Args:
+            produtos_df: DataFrame com colunas compra, desp_add e preco_final
+            markup_mult: Multiplicador de markup do usuário
+            markup_divisor: Divisor de markup do usuário
+        
+        Returns:
+            Novo DataFrame com as colunas calculadas
+        """
         if produtos_df.empty:
             return produtos_df
-        calc = CalculadoraMarkup()
-        produtos_recalculados = []
-        for _, row in produtos_df.iterrows():
-            produto_dict = row.to_dict()
-            produto_atualizado = calc.calcular_produto(produto_dict, markup_mult, markup_divisor)
-            produtos_recalculados.append(produto_atualizado)
-        return pd.DataFrame(produtos_recalculados)
+        n = len(produtos_df)
+        
+        def coluna_float(nome: str) -> np.ndarray:
+            if nome not in produtos_df.columns:
+                return np.zeros(n)
+            # Textos como '15,50' ou 'R$ 1.200,00' são aceitos; inválidos viram NaN
+            return EsquemaProdutos.converter_numeros(produtos_df[nome])[0].to_numpy()
+        
+        compra = coluna_float('compra')
+        centavos = CalculadoraMarkup.precificar_centavos(
+            para_centavos(compra),
+            para_centavos(coluna_float('desp_add')),
+            para_centavos(coluna_float('preco_final')),
+            markup_mult
+        )
+        sem_compra = np.isnan(compra)
+        
+        def saida(valores: np.ndarray, divisor: int) -> np.ndarray:
+            reais = valores / divisor
+            reais[sem_compra] = np.nan
+            return reais
+        
+        produtos_atualizados = produtos_df.reset_index(drop=True)
+        produtos_atualizados = produtos_atualizados.assign(
+            custo_total=saida(centavos['custo_total'], 100),
+            markup_divisor_pct=round(markup_divisor * 100, 4),
+            markup_mult=markup_mult,
+            preco_sugerido=saida(centavos['preco_sugerido'], 100),
+            preco_final=saida(centavos['preco_final'], 100),
+            diferenca_final_vs_sugerido=saida(centavos['diferenca_final_vs_sugerido'], 100),
+            margem_liquida_estimada_pct=saida(centavos['margem_liquida_bp'], 100)
+        )
+        return produtos_atualizados
+    
+    @staticmethod
+    def preco_por_margem_centavos(
+        custo_total: np.ndarray,
+        margem_desejada_pct: np.ndarray,
+        total_despesas_pct: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Preço de cada produto que atinge a sua margem desejada
+        
+        preco = custo_total / (1 - (despesas + margem_desejada) / 100),
+        arredondado ao centavo (meio para cima). Margem vazia vale 0, o que
+        equivale ao markup do usuário.
+        
+        Args:
+            custo_total: Custo total em centavos
+            margem_desejada_pct: Margem desejada de cada produto (%)
+            total_despesas_pct: Custos variáveis + fixos sobre o faturamento (%)
+        
+        Returns:
+            Tupla (preço em centavos int64, máscara das linhas inviáveis, em
+            que despesas + margem >= 100% e o preço fica 0)
+        """
+        margem = np.nan_to_num(np.asarray(margem_desejada_pct, dtype=float), nan=0.0)
+        divisor = 1 - (total_despesas_pct + margem) / 100
+        inviavel = divisor <= 0
+        preco = np.divide(custo_total, divisor, out=np.zeros(len(divisor)), where=~inviavel)
+        return arredondar_meio_para_cima(preco), inviavel
+    
+    @staticmethod
+    def precificar_por_margem(produtos_df: pd.DataFrame, resultado_markup: Dict[str, float]) -> pd.DataFrame:
+        """
+        Define o preço final de todo o catálogo pela margem desejada de cada produto
+        
+        O preço final passa a ser o que cobre as despesas do usuário e ainda
+        deixa 'margem_desejada_pct'; o preço sugerido continua sendo o do
+        markup do usuário, para comparação. Linhas inviáveis (despesas +
+        margem >= 100%) mantêm o preço final atual e suas posições ficam em
+        df.attrs['margem_inviavel'].
+        
+        Args:
+            produtos_df: Catálogo com compra, desp_add e margem_desejada_pct
+            resultado_markup: Retorno de calcular_markup_usuario
+        
+        Returns:
+            Novo DataFrame recalculado
+        """
+        if produtos_df.empty:
+            return produtos_df
+        n = len(produtos_df)
+        
+        def coluna_float(nome: str) -> np.ndarray:
+            if nome not in produtos_df.columns:
+                return np.zeros(n)
+            return EsquemaProdutos.converter_numeros(produtos_df[nome])[0].to_numpy()
+        
+        custo_total = para_centavos(coluna_float('compra')) + para_centavos(coluna_float('desp_add'))
+        preco, inviavel = CalculadoraMarkup.preco_por_margem_centavos(
+            custo_total, coluna_float('margem_desejada_pct'), resultado_markup['total_despesas_pct']
+        )
+        preco_final = np.where(inviavel, coluna_float('preco_final'), para_reais(preco))
+        precificado = CalculadoraMarkup.recalcular_produtos(
+            produtos_df.assign(preco_final=preco_final),
+            resultado_markup['markup_mult'],
+            resultado_markup['markup_divisor']
+        )
+        precificado.attrs['margem_inviavel'] = np.flatnonzero(inviavel).tolist()
+        return precificado
     
     @staticmethod
     def validar_config(config: Dict[str, float]) -> Tuple[bool, str]:
@@ -116,15 +296,27 @@ class CalculadoraMarkup:
                 'produtos_cadastrados': 0
             }
         margem_media_desejada = produtos_df['margem_desejada_pct'].mean() if 'margem_desejada_pct' in produtos_df.columns else 0
-        margem_liquida_estimada = produtos_df['margem_liquida_estimada_pct'].mean() if 'margem_liquida_estimada_pct' in produtos_df.columns else 0
+        margem_liquida_estimada = 0
+        if 'margem_liquida_estimada_pct' in produtos_df.columns:
+            # Média exata em pontos-base, arredondada uma única vez no fim
+            margens = produtos_df['margem_liquida_estimada_pct'].to_numpy(dtype=float)
+            validas = ~np.isnan(margens)
+            if validas.any():
+                soma_bp = int(arredondar_meio_para_cima(margens[validas], 100).sum())
+                margem_liquida_estimada = int(arredondar_meio_para_cima(soma_bp / validas.sum())) / 100
         if 'preco_final' in produtos_df.columns and 'custo_total' in produtos_df.columns:
-            lucro_total_estimado = (produtos_df['preco_final'] - produtos_df['custo_total']).sum()
+            # Soma em centavos int64: exata para qualquer número de produtos
+            preco_final = produtos_df['preco_final'].to_numpy(dtype=float)
+            custo_total = produtos_df['custo_total'].to_numpy(dtype=float)
+            validos = ~np.isnan(preco_final) & ~np.isnan(custo_total)
+            lucro_centavos = int((para_centavos(preco_final[validos]) - para_centavos(custo_total[validos])).sum())
+            lucro_total_estimado = lucro_centavos / 100
         else:
             lucro_total_estimado = 0
         produtos_cadastrados = len(produtos_df)
         return {
-            'margem_media_desejada': round(margem_media_desejada, 2),
-            'margem_liquida_estimada': round(margem_liquida_estimada, 2),
-            'lucro_total_estimado': round(lucro_total_estimado, 2),
+            'margem_media_desejada': float(round(margem_media_desejada, 2)),
+            'margem_liquida_estimada': margem_liquida_estimada,
+            'lucro_total_estimado': lucro_total_estimado,
             'produtos_cadastrados': produtos_cadastrados
         }
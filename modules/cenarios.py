@@ -0,0 +1,191 @@
+"""
+Módulo de Simulação de Cenários
+Avalia grades de "e se" sobre os parâmetros de custo (taxas, custos fixos,
+faturamento) contra o catálogo inteiro, sem gravar nada
+"""
+import itertools
+from typing import Any, Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+from modules.calculos import CalculadoraMarkup, arredondar_meio_para_cima, para_centavos
+from modules.esquema import EsquemaProdutos
+
+class SimuladorCenarios:
+    """Produtos × cenários por broadcasting, com KPIs agregados por cenário"""
+    
+    # Campos de configuração que podem variar
+    CAMPOS = [
+        'cust_var_impostos_pct', 'cust_var_royalties_pct', 'cust_var_gestao_pct',
+        'cust_var_taxa_cartao_pct', 'cust_var_repasse_condominio_pct', 'cust_var_investidor_pct',
+        'cust_fix_monitoramento', 'cust_fix_combustivel', 'cust_fix_totem',
+        'cust_fix_contabilidade', 'cust_fix_internet', 'cust_fix_telefone',
+        'cust_fix_seguro', 'cust_fix_folha', 'cust_fix_aluguel', 'cust_fix_outros',
+        'faturamento_base'
+    ]
+    # Células da matriz produtos × cenários calculadas por vez (limita a memória)
+    MAX_CELULAS = 4_000_000
+    
+    KPIS = {
+        'margem_media_pct': 'Margem média (%)',
+        'resultado_liquido': 'Resultado líquido (R$)',
+        'lucro_total': 'Lucro bruto total (R$)',
+        'preco_medio': 'Preço médio (R$)',
+        'produtos_prejuizo': 'Produtos com prejuízo',
+        'markup_mult': 'Markup'
+    }
+    
+    @staticmethod
+    def faixa(inicio: float, fim: float, passos: int) -> np.ndarray:
+        """Valores igualmente espaçados de inicio a fim (inclusive)"""
+        return np.round(np.linspace(inicio, fim, max(1, int(passos))), 4)
+    
+    @classmethod
+    def montar_grade(cls, config: Dict[str, Any], faixas: Dict[str, Sequence[float]]) -> pd.DataFrame:
+        """
+        Monta o produto cartesiano das faixas sobre a configuração atual
+        
+        Args:
+            config: Configuração do usuário (campos sem faixa ficam como estão)
+            faixas: Campo -> valores a testar
+        
+        Returns:
+            DataFrame com uma linha por cenário: os campos variados,
+            total_despesas_pct, markup_mult e viavel
+        """
+        desconhecidos = set(faixas) - set(cls.CAMPOS)
+        if desconhecidos:
+            raise ValueError(f"Campos que não podem variar: {', '.join(sorted(desconhecidos))}")
+        campos = list(faixas)
+        linhas = []
+        for valores in itertools.product(*(faixas[campo] for campo in campos)):
+            cenario = dict(zip(campos, (float(v) for v in valores)))
+            markup = CalculadoraMarkup.calcular_markup_usuario({**config, **cenario})
+            linhas.append({
+                **cenario,
+                'total_despesas_pct': markup['total_despesas_pct'],
+                'markup_mult': markup['markup_mult'],
+                'viavel': markup['erro_markup'] is None
+            })
+        return pd.DataFrame(linhas)
+    
+    @classmethod
+    def avaliar(cls, produtos_df: pd.DataFrame, config: Dict[str, Any],
+                faixas: Dict[str, Sequence[float]]) -> pd.DataFrame:
+        """
+        Calcula os KPIs do catálogo em cada cenário da grade
+        
+        Cada produto é precificado como em recalcular_produtos (preço final
+        manual mantido, senão custo × markup do cenário, em centavos). Como o
+        resultado de um produto só depende do total de despesas do cenário,
+        cenários com o mesmo total são calculados uma vez.
+        
+        Args:
+            produtos_df: Catálogo do usuário
+            config: Configuração atual
+            faixas: Campo -> valores a testar
+        
+        Returns:
+            Grade de montar_grade com as colunas de KPIS (NaN nos cenários
+            inviáveis, em que as despesas chegam a 100%)
+        """
+        grade = cls.montar_grade(config, faixas)
+        
+        def coluna_float(nome: str) -> np.ndarray:
+            if nome not in produtos_df.columns:
+                return np.zeros(len(produtos_df))
+            return EsquemaProdutos.converter_numeros(produtos_df[nome])[0].to_numpy()
+        
+        compra = coluna_float('compra')
+        validos = ~np.isnan(compra)
+        custo = para_centavos(compra[validos]) + para_centavos(coluna_float('desp_add')[validos])
+        preco_manual = para_centavos(coluna_float('preco_final')[validos])
+        manual = preco_manual > 0
+        
+        viaveis = grade['viavel'].to_numpy()
+        despesas_unicas, posicao = np.unique(grade.loc[viaveis, 'total_despesas_pct'].to_numpy(), return_inverse=True)
+        kpis = cls._kpis_por_despesa(custo, preco_manual, manual, despesas_unicas)
+        
+        for kpi, valores in kpis.items():
+            coluna = np.full(len(grade), np.nan)
+            coluna[viaveis] = valores[posicao]
+            grade[kpi] = coluna
+        return grade
+    
+    @classmethod
+    def _kpis_por_despesa(cls, custo: np.ndarray, preco_manual: np.ndarray, manual: np.ndarray,
+                          despesas_pct: np.ndarray) -> Dict[str, np.ndarray]:
+        """KPIs do catálogo para cada total de despesas (%)"""
+        n = len(custo)
+        k = len(despesas_pct)
+        sobra = 1 - despesas_pct / 100
+        markup_mult = 1 / sobra
+        
+        # Preço manual: não muda com o cenário, só o prejuízo depende das despesas
+        custo_manual = custo[manual]
+        preco_fixo = preco_manual[manual]
+        soma_preco = np.full(k, float(preco_fixo.sum()))
+        soma_margem_bp = np.full(k, float(arredondar_meio_para_cima(
+            (preco_fixo - custo_manual) * 10_000 / preco_fixo
+        ).sum()))
+        prejuizo = np.zeros(k, dtype=np.int64)
+        pares, quantidade_manual = np.unique(np.column_stack([custo_manual, preco_fixo]), axis=0, return_counts=True)
+        bloco = max(1, cls.MAX_CELULAS // max(1, len(pares)))
+        for inicio in range(0, k, bloco):
+            fatia = slice(inicio, inicio + bloco)
+            prejuizo[fatia] += quantidade_manual @ cls._em_prejuizo(
+                pares[:, 1:2].astype(float), pares[:, 0:1], sobra[None, fatia]
+            )
+        
+        # Preço pelo markup: matriz custos × cenários, em blocos de cenários.
+        # Produtos de mesmo custo têm o mesmo resultado, então cada custo
+        # distinto é uma linha, pesada pela quantidade de produtos
+        custo_auto, quantidade = np.unique(custo[~manual], return_counts=True)
+        custo_auto = custo_auto.astype(float)[:, None]
+        quantidade = quantidade.astype(float)
+        bloco = max(1, cls.MAX_CELULAS // max(1, len(custo_auto)))
+        for inicio in range(0, k, bloco):
+            fatia = slice(inicio, inicio + bloco)
+            precos = arredondar_meio_para_cima(custo_auto, markup_mult[None, fatia]).astype(float)
+            margem = np.divide(
+                (precos - custo_auto) * 10_000, precos,
+                out=np.zeros(precos.shape), where=precos > 0
+            )
+            soma_preco[fatia] += quantidade @ precos
+            soma_margem_bp[fatia] += quantidade @ arredondar_meio_para_cima(margem)
+            prejuizo[fatia] += (quantidade @ cls._em_prejuizo(precos, custo_auto, sobra[None, fatia])).astype(np.int64)
+        
+        soma_custo = float(custo.sum())
+        return {
+            'markup_mult': markup_mult,
+            'preco_medio': soma_preco / max(n, 1) / 100,
+            'margem_media_pct': arredondar_meio_para_cima(soma_margem_bp / max(n, 1)) / 100,
+            'lucro_total': (soma_preco - soma_custo) / 100,
+            'resultado_liquido': arredondar_meio_para_cima(soma_preco * sobra - soma_custo) / 100,
+            'produtos_prejuizo': prejuizo.astype(float)
+        }
+    
+    @staticmethod
+    def _em_prejuizo(precos: np.ndarray, custos: np.ndarray, sobra: np.ndarray) -> np.ndarray:
+        """
+        Produtos cuja receita após as despesas fica abaixo do custo
+        
+        A receita líquida é arredondada a centavos como os preços, então um
+        preço calculado pelo markup nunca aparece como prejuízo.
+        
+        Args:
+            precos: Preços em centavos
+            custos: Custos em centavos
+            sobra: Fração do preço que resta após as despesas
+        
+        Returns:
+            Matriz 0/1 (int64) no formato do broadcasting dos argumentos
+        """
+        return (arredondar_meio_para_cima(precos * sobra) < custos).astype(np.int64)
+    
+    @staticmethod
+    def matriz(grade: pd.DataFrame, kpi: str, eixo_x: str, eixo_y: str) -> pd.DataFrame:
+        """Tabela eixo_y × eixo_x de um KPI, para o mapa de calor"""
+        return grade.pivot_table(index=eixo_y, columns=eixo_x, values=kpi, aggfunc='first', dropna=False)
+
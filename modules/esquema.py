@@ -0,0 +1,171 @@
+"""
+Módulo de Esquema de Produtos
+Tipos declarados das colunas do catálogo, aplicados na leitura para que os
+DataFrames não dependam do que cada backend infere
+"""
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Símbolos ignorados na leitura de números digitados: moeda, espaços e percentual
+_SIMBOLOS_NUMERO = 'R\\$|[\\s\u00a0%]'
+
+class EsquemaProdutos:
+    """Aplica o esquema do catálogo e mede o ganho de memória"""
+    
+    # Texto: códigos sempre como string ('00123' e 123 não se misturam)
+    COLUNAS_TEXTO = ['codigo', 'nome', 'obs']
+    # Poucos valores distintos repetidos em muitas linhas
+    COLUNAS_CATEGORIA = ['categoria']
+    # Valores em reais e percentuais; o cálculo converte para centavos internamente
+    COLUNAS_NUMERICAS = [
+        'compra', 'desp_add', 'custo_total', 'margem_desejada_pct',
+        'markup_divisor_pct', 'markup_mult', 'preco_sugerido', 'preco_final',
+        'diferenca_final_vs_sugerido', 'margem_liquida_estimada_pct'
+    ]
+    
+    @staticmethod
+    def _texto(serie: pd.Series) -> pd.Series:
+        if pd.api.types.is_string_dtype(serie.dtype) and not pd.api.types.is_object_dtype(serie.dtype):
+            return serie
+        if pd.api.types.is_float_dtype(serie.dtype):
+            # 123.0 (inteiro com vazios na coluna) volta a ser '123'
+            inteiros = serie.notna() & (serie % 1 == 0)
+            texto = serie.astype(str)
+            texto[inteiros] = serie[inteiros].astype(np.int64).astype(str)
+        else:
+            texto = serie.astype(str)
+        return texto.where(serie.notna())
+    
+    @staticmethod
+    def _categoria(serie: pd.Series) -> pd.Series:
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            return serie
+        return serie.astype(str).where(serie.notna()).astype('category')
+    
+    @staticmethod
+    def converter_numeros(serie: pd.Series) -> Tuple[pd.Series, pd.Series]:
+        """
+        Converte uma coluna em float64, aceitando números digitados em pt-BR
+        
+        Células que já são números são convertidas direto; as de texto passam
+        pelo tratamento vetorizado: 'R$', espaços e '%' são removidos,
+        '(1,50)' vira negativo e, havendo vírgula, ela é o separador decimal
+        e os pontos são de milhar ('R$ 1.200,50' -> 1200.5), a menos que um
+        ponto venha depois dela ('1,200.50'). Sem vírgula, pontos separando
+        grupos de 3 dígitos são de milhar ('1.200' e '1.200.000'); nos demais
+        casos um único ponto é decimal ('12.5'). Textos como 'nan' e 'inf' e
+        valores infinitos são inválidos.
+        
+        Args:
+            serie: Coluna como lida da planilha
+        
+        Returns:
+            Tupla (valores float64 com NaN nos vazios e inválidos,
+            máscara das células preenchidas que não são número)
+        """
+        if pd.api.types.is_numeric_dtype(serie.dtype) and not pd.api.types.is_bool_dtype(serie.dtype):
+            valores = serie.astype(np.float64)
+            infinitos = np.isinf(valores)
+            return valores.mask(infinitos), infinitos
+        
+        preenchidos = serie.notna()
+        if pd.api.types.is_object_dtype(serie.dtype):
+            e_texto = serie.map(lambda v: isinstance(v, str)).astype(bool)
+        else:
+            e_texto = preenchidos
+        # Células numéricas (leitura sem formatação) não passam pelo texto:
+        # 1.234 já é um número, não '1.234' com ponto de milhar
+        valores = pd.to_numeric(serie.where(~e_texto & preenchidos), errors='coerce').astype(np.float64)
+        vazios = ~preenchidos
+        
+        if e_texto.any():
+            texto = serie[e_texto].astype(str).str.replace(_SIMBOLOS_NUMERO, '', regex=True)
+            texto = texto.str.replace(r'^\((.*)\)$', r'-\1', regex=True)
+            # '1,234.50' (ponto depois da vírgula) é formato americano
+            americano = texto.str.contains(r',[^,]*\.', regex=True)
+            texto = texto.where(~americano, texto.str.replace(',', '', regex=False))
+            com_virgula = texto.str.contains(',', regex=False)
+            milhar = com_virgula | texto.str.match(r'^-?[1-9]\d{0,2}(\.\d{3})+$') | (texto.str.count(r'\.') > 1)
+            texto = texto.where(~milhar, texto.str.replace('.', '', regex=False))
+            texto = texto.where(~com_virgula, texto.str.replace(',', '.', regex=False))
+            em_branco = texto == ''
+            # Só dígitos, sinal, ponto e expoente: 'nan' e 'inf' não são números
+            texto = texto.where(texto.str.match(r'^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$'), 'x')
+            valores[e_texto] = pd.to_numeric(texto.mask(em_branco), errors='coerce').astype(np.float64)
+            vazios[texto.index[em_branco]] = True
+        
+        valores = valores.mask(np.isinf(valores))
+        return valores, valores.isna() & ~vazios
+    
+    @classmethod
+    def _numerica(cls, serie: pd.Series) -> Tuple[pd.Series, pd.Series]:
+        if serie.dtype == np.float64 and not np.isinf(serie.to_numpy()).any():
+            return serie, None
+        return cls.converter_numeros(serie)
+    
+    @classmethod
+    def aplicar(cls, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Converte as colunas conhecidas para os tipos do esquema
+        
+        Valores numéricos inválidos viram NaN e suas posições ficam em
+        df.attrs['invalidos'] ({coluna: [posições]}), para a interface apontar
+        as linhas. Colunas fora do esquema são mantidas como estão; colunas já
+        no tipo certo não são copiadas.
+        
+        Args:
+            df: Catálogo como lido do armazenamento
+        
+        Returns:
+            Novo DataFrame tipado
+        """
+        if df.empty and len(df.columns) == 0:
+            return df
+        convertidas = {}
+        invalidos = {}
+        for coluna in df.columns:
+            if coluna in cls.COLUNAS_TEXTO:
+                convertidas[coluna] = cls._texto(df[coluna])
+            elif coluna in cls.COLUNAS_CATEGORIA:
+                convertidas[coluna] = cls._categoria(df[coluna])
+            elif coluna in cls.COLUNAS_NUMERICAS:
+                convertidas[coluna], mascara = cls._numerica(df[coluna])
+                if mascara is not None and mascara.any():
+                    invalidos[coluna] = np.flatnonzero(mascara.to_numpy()).tolist()
+        if not convertidas:
+            return df
+        tipado = df.assign(**convertidas)
+        if invalidos:
+            tipado.attrs['invalidos'] = invalidos
+        return tipado
+    
+    @classmethod
+    def relatorio_memoria(cls, df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Aplica o esquema e compara o uso de memória
+        
+        Args:
+            df: Catálogo como lido do armazenamento
+        
+        Returns:
+            Dicionário com bytes antes/depois (total e por coluna), redução
+            percentual e valores numéricos inválidos convertidos em NaN
+        """
+        tipado = cls.aplicar(df)
+        antes = df.memory_usage(deep=True, index=False)
+        depois = tipado.memory_usage(deep=True, index=False)
+        invalidos = {coluna: len(posicoes) for coluna, posicoes in tipado.attrs.get('invalidos', {}).items()}
+        total_antes, total_depois = int(antes.sum()), int(depois.sum())
+        return {
+            'linhas': len(df),
+            'antes_bytes': total_antes,
+            'depois_bytes': total_depois,
+            'reducao_pct': round((1 - total_depois / total_antes) * 100, 1) if total_antes else 0.0,
+            'colunas': {
+                coluna: {'antes': int(antes[coluna]), 'depois': int(depois[coluna]), 'dtype': str(tipado[coluna].dtype)}
+                for coluna in df.columns
+            },
+            'invalidos': invalidos
+        }
@@ -4,8 +4,10 @@ Cria visualizações com Plotly
 """
 import plotly.graph_objects as go
 import pandas as pd
+from modules.metricas import Metricas
 from typing import Dict
 
+@Metricas.instrumentar('graficos')
 class GeradorGraficos:
     @staticmethod
     def grafico_doughnut_composicao(resultado_markup: Dict):
@@ -82,7 +84,7 @@ class GeradorGraficos:
             fig = go.Figure()
             fig.update_layout(title="Dados insuficientes para análise por categoria", height=300)
             return fig
-        margem_por_cat = produtos_df.groupby('categoria')['margem_liquida_estimada_pct'].mean().reset_index()
+        margem_por_cat = produtos_df.groupby('categoria', observed=True)['margem_liquida_estimada_pct'].mean().reset_index()
         margem_por_cat = margem_por_cat.sort_values('margem_liquida_estimada_pct', ascending=False)
         fig = go.Figure(data=[
             go.Bar(
@@ -100,3 +102,32 @@ class GeradorGraficos:
             height=300, margin=dict(t=60, b=80, l=50, r=50)
         )
         return fig
+
+    @staticmethod
+    def grafico_heatmap_cenarios(matriz: pd.DataFrame, titulo: str, eixo_x: str, eixo_y: str, valor_atual=None):
+        if matriz.empty:
+            fig = go.Figure()
+            fig.update_layout(title="Nenhum cenário calculado", height=400)
+            return fig
+        fig = go.Figure(data=go.Heatmap(
+            z=matriz.to_numpy(),
+            x=matriz.columns,
+            y=matriz.index,
+            colorscale='RdYlGn',
+            colorbar=dict(title=titulo),
+            hovertemplate=f'{eixo_x}: %{{x}}<br>{eixo_y}: %{{y}}<br>{titulo}: %{{z:,.2f}}<extra></extra>'
+        ))
+        if valor_atual is not None:
+            # Configuração atual, para referência
+            fig.add_trace(go.Scatter(
+                x=[valor_atual[0]], y=[valor_atual[1]], mode='markers',
+                marker=dict(symbol='x', size=12, color='black'),
+                name='Atual', hoverinfo='skip'
+            ))
+        fig.update_layout(
+            title={'text': titulo, 'x': 0.5, 'xanchor': 'center', 'font': {'size': 16, 'family': 'Arial'}},
+            xaxis_title=eixo_x, yaxis_title=eixo_y,
+            height=500, showlegend=False,
+            margin=dict(t=60, b=60, l=80, r=40)
+        )
+        return fig
@@ -0,0 +1,285 @@
+"""
+Módulo de Importação de Produtos
+Lê planilhas CSV/XLSX em blocos, valida e precifica cada bloco de forma
+vetorizada e grava no armazenamento em lotes de tamanho limitado
+"""
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modules.calculos import CalculadoraMarkup
+from modules.esquema import EsquemaProdutos
+from modules.storage import StorageBackend
+from modules.upsert import MotorUpsert
+
+class ImportadorProdutos:
+    """Importação em streaming de listas de produtos grandes"""
+    
+    # Linhas lidas e validadas por vez
+    TAMANHO_BLOCO = 5_000
+    # Linhas acumuladas antes de cada gravação no armazenamento
+    LOTE_GRAVACAO = 20_000
+    # Erros guardados no relatório (os demais são só contados)
+    MAX_ERROS = 1_000
+    
+    COLUNAS_OBRIGATORIAS = ['codigo', 'nome', 'compra']
+    
+    # Valores usados quando a coluna não existe ou a célula está vazia (no
+    # modo de atualização, só nos produtos novos)
+    PADROES = {
+        'desp_add': 0.0,
+        'margem_desejada_pct': 40.0,
+        'preco_final': 0.0,
+        'categoria': 'Geral',
+        'obs': ''
+    }
+    
+    def __init__(
+        self,
+        storage: StorageBackend,
+        prefix: str,
+        markup_mult: float,
+        markup_divisor: float,
+        tamanho_bloco: int = TAMANHO_BLOCO,
+        lote_gravacao: int = LOTE_GRAVACAO,
+        atualizar_existentes: bool = False
+    ):
+        """
+        Inicializa o importador
+        
+        Args:
+            storage: Backend onde os produtos serão gravados
+            prefix: Prefixo do usuário
+            markup_mult: Multiplicador de markup do usuário
+            markup_divisor: Divisor de markup do usuário
+            tamanho_bloco: Linhas por bloco de leitura
+            lote_gravacao: Linhas por gravação no armazenamento
+            atualizar_existentes: Se True, códigos já cadastrados atualizam o
+                produto (upsert) em vez de serem rejeitados
+        """
+        self.storage = storage
+        self.prefix = prefix
+        self.markup_mult = markup_mult
+        self.markup_divisor = markup_divisor
+        self.tamanho_bloco = tamanho_bloco
+        self.lote_gravacao = lote_gravacao
+        self.atualizar_existentes = atualizar_existentes
+        self.calc = CalculadoraMarkup()
+    
+    @staticmethod
+    def ler_blocos(arquivo, nome_arquivo: str, tamanho_bloco: int = TAMANHO_BLOCO) -> Iterator[Tuple[pd.DataFrame, Optional[float]]]:
+        """
+        Lê o arquivo em blocos de linhas
+        
+        Args:
+            arquivo: Arquivo aberto (ou UploadedFile do Streamlit)
+            nome_arquivo: Nome do arquivo, para escolher o formato pela extensão
+            tamanho_bloco: Linhas por bloco
+        
+        Returns:
+            Iterador de (bloco, fração do arquivo já lida ou None se desconhecida)
+        """
+        if nome_arquivo.lower().endswith('.csv'):
+            yield from ImportadorProdutos._blocos_csv(arquivo, tamanho_bloco)
+        else:
+            yield from ImportadorProdutos._blocos_xlsx(arquivo, tamanho_bloco)
+    
+    @staticmethod
+    def _blocos_csv(arquivo, tamanho_bloco: int):
+        arquivo.seek(0, 2)
+        tamanho = arquivo.tell()
+        arquivo.seek(0)
+        # Códigos como texto: '00123' não pode virar 123
+        leitor = pd.read_csv(arquivo, chunksize=tamanho_bloco, dtype={'codigo': str})
+        with leitor:
+            for bloco in leitor:
+                yield bloco, (min(1.0, arquivo.tell() / tamanho) if tamanho else None)
+    
+    @staticmethod
+    def _blocos_xlsx(arquivo, tamanho_bloco: int):
+        # Importado aqui: openpyxl é pesado e só serve para XLSX
+        from openpyxl import load_workbook
+        
+        arquivo.seek(0)
+        # read_only percorre as linhas sem carregar a planilha inteira na memória
+        workbook = load_workbook(arquivo, read_only=True, data_only=True)
+        try:
+            worksheet = workbook.active
+            total = worksheet.max_row
+            linhas = worksheet.iter_rows(values_only=True)
+            cabecalho = next(linhas, None)
+            if cabecalho is None:
+                return
+            cabecalho = [str(c).strip() if c is not None else f"coluna_{i + 1}" for i, c in enumerate(cabecalho)]
+            lidas = 1
+            buffer = []
+            for linha in linhas:
+                lidas += 1
+                buffer.append(linha[:len(cabecalho)])
+                if len(buffer) >= tamanho_bloco:
+                    yield pd.DataFrame(buffer, columns=cabecalho), (lidas / total if total else None)
+                    buffer = []
+            if buffer:
+                yield pd.DataFrame(buffer, columns=cabecalho), (lidas / total if total else None)
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def preview(arquivo, nome_arquivo: str, linhas: int = 5) -> pd.DataFrame:
+        """Lê só as primeiras linhas do arquivo"""
+        blocos = ImportadorProdutos.ler_blocos(arquivo, nome_arquivo, linhas)
+        try:
+            bloco, _ = next(blocos, (pd.DataFrame(), None))
+        finally:
+            blocos.close()
+            arquivo.seek(0)
+        return bloco.head(linhas)
+    
+    def validar_bloco(
+        self,
+        bloco: pd.DataFrame,
+        primeira_linha: int,
+        codigos_vistos: Set[str]
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Valida e normaliza um bloco, separando as linhas rejeitadas
+        
+        Args:
+            bloco: Linhas lidas do arquivo
+            primeira_linha: Número da linha do arquivo correspondente à primeira do bloco
+            codigos_vistos: Códigos já cadastrados ou importados (atualizado com os válidos)
+        
+        Returns:
+            Tupla (produtos válidos, erros com colunas linha, codigo e erro)
+        """
+        faltantes = [c for c in self.COLUNAS_OBRIGATORIAS if c not in bloco.columns]
+        if faltantes:
+            raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(faltantes)}")
+        
+        df = bloco.dropna(how='all')
+        linhas = primeira_linha + np.flatnonzero(bloco.index.isin(df.index))
+        df = df.reset_index(drop=True)
+        
+        for coluna, padrao in self.PADROES.items():
+            if coluna not in df.columns:
+                # Coluna ausente do arquivo não altera produtos já cadastrados (ver importar)
+                df[coluna] = padrao
+            elif not self.atualizar_existentes:
+                df[coluna] = df[coluna].fillna(padrao)
+        
+        codigo = df['codigo'].astype('string').str.strip()
+        nome = df['nome'].astype('string').str.strip()
+        df['codigo'] = codigo.astype(object)
+        df['nome'] = nome.astype(object)
+        
+        # Cada linha recebe o primeiro motivo de rejeição encontrado
+        motivo = pd.Series(None, index=df.index, dtype=object)
+        def rejeitar(mascara, mensagem):
+            motivo[motivo.isna() & mascara.fillna(False).astype(bool)] = mensagem
+        
+        rejeitar(codigo.isna() | (codigo == ''), "Código vazio")
+        rejeitar(nome.isna() | (nome == ''), "Nome vazio")
+        for coluna in ['compra', 'desp_add', 'margem_desejada_pct', 'preco_final']:
+            valores, invalidos = EsquemaProdutos.converter_numeros(df[coluna])
+            # Vazios só sobram nas opcionais no modo de atualização: mantêm o valor cadastrado
+            sem_valor = valores.isna() if coluna == 'compra' else invalidos
+            rejeitar(sem_valor | (valores < 0), f"Valor inválido em '{coluna}'")
+            df[coluna] = valores.astype(float)
+        # Consulta ao conjunto por linha: isin() copiaria o conjunto inteiro a cada bloco
+        existentes = pd.Series([c in codigos_vistos for c in codigo.fillna('')], index=df.index)
+        rejeitar(existentes, "Código já existe")
+        # Só linhas ainda válidas contam como primeira ocorrência do código
+        candidatos = codigo[motivo.isna()]
+        rejeitar(candidatos.duplicated().reindex(codigo.index, fill_value=False), "Código repetido no arquivo")
+        
+        invalidas = motivo.notna().to_numpy()
+        erros = pd.DataFrame({
+            'linha': linhas[invalidas],
+            'codigo': df.loc[invalidas, 'codigo'].fillna('').to_numpy(),
+            'erro': motivo[invalidas].to_numpy()
+        })
+        validos = df[~invalidas].reset_index(drop=True)
+        codigos_vistos.update(validos['codigo'])
+        return validos, erros
+    
+    def importar(
+        self,
+        arquivo,
+        nome_arquivo: str,
+        ao_progredir: Optional[Callable[[int, Optional[float]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Importa o arquivo bloco a bloco
+        
+        A memória usada é limitada ao bloco atual mais o lote à espera de
+        gravação, independente do tamanho do arquivo (no modo de atualização
+        o catálogo atual também é carregado, para a comparação). Lotes já
+        gravados permanecem gravados se um bloco posterior falhar.
+        
+        Args:
+            arquivo: Arquivo aberto (ou UploadedFile do Streamlit)
+            nome_arquivo: Nome do arquivo (.csv ou .xlsx)
+            ao_progredir: Chamado a cada bloco com (linhas lidas, fração lida ou None)
+        
+        Returns:
+            Relatório com linhas, importados, atualizados, inalterados,
+            rejeitados e erros (até MAX_ERROS)
+        """
+        if self.atualizar_existentes:
+            # Só códigos repetidos dentro do arquivo são rejeitados
+            motor = MotorUpsert(self.storage.read_user_products(self.prefix))
+            codigos_vistos = set()
+        else:
+            motor = None
+            codigos_vistos = self.storage.read_user_codes(self.prefix)
+        pendentes: List[pd.DataFrame] = []
+        atualizacoes: List[pd.DataFrame] = []
+        n_pendentes = 0
+        relatorio = {'linhas': 0, 'importados': 0, 'atualizados': 0, 'inalterados': 0, 'rejeitados': 0, 'erros': []}
+        
+        def gravar():
+            nonlocal pendentes, atualizacoes, n_pendentes
+            if atualizacoes:
+                lote_atualizar = pd.concat(atualizacoes, ignore_index=True)
+                lote_inserir = pd.concat(pendentes, ignore_index=True) if pendentes else pd.DataFrame()
+                self.storage.upsert_user_products(self.prefix, lote_atualizar, lote_inserir)
+                relatorio['atualizados'] += len(lote_atualizar)
+                relatorio['importados'] += len(lote_inserir)
+            elif pendentes:
+                lote = pd.concat(pendentes, ignore_index=True)
+                relatorio['importados'] += self.storage.append_user_products(self.prefix, lote)
+            pendentes, atualizacoes, n_pendentes = [], [], 0
+        
+        for bloco, fracao in self.ler_blocos(arquivo, nome_arquivo, self.tamanho_bloco):
+            # Linha 1 é o cabeçalho
+            validos, erros = self.validar_bloco(bloco, relatorio['linhas'] + 2, codigos_vistos)
+            relatorio['linhas'] += len(bloco)
+            relatorio['rejeitados'] += len(erros)
+            espaco = self.MAX_ERROS - len(relatorio['erros'])
+            if espaco > 0 and not erros.empty:
+                relatorio['erros'].extend(erros.head(espaco).to_dict('records'))
+            
+            if motor is not None and not validos.empty:
+                # Colunas ausentes do arquivo e células vazias não sobrescrevem o
+                # que já está cadastrado; os padrões valem só para os novos
+                classificados = motor.classificar(validos, colunas=list(bloco.columns), manter_vazios=True)
+                relatorio['inalterados'] += len(classificados['inalterados'])
+                if not classificados['atualizar'].empty:
+                    atualizacoes.append(self.calc.recalcular_produtos(
+                        classificados['atualizar'], self.markup_mult, self.markup_divisor
+                    ))
+                    n_pendentes += len(classificados['atualizar'])
+                validos = classificados['inserir'].fillna(
+                    {coluna: padrao for coluna, padrao in self.PADROES.items() if coluna in classificados['inserir'].columns}
+                )
+            if not validos.empty:
+                pendentes.append(self.calc.recalcular_produtos(validos, self.markup_mult, self.markup_divisor))
+                n_pendentes += len(validos)
+            if n_pendentes >= self.lote_gravacao:
+                gravar()
+            if ao_progredir:
+                ao_progredir(relatorio['linhas'], fracao)
+        
+        gravar()
+        return relatorio
@@ -0,0 +1,184 @@
+"""
+Módulo de Métricas
+Mede o tempo das chamadas do caminho crítico (armazenamento, cálculos,
+gráficos, autenticação e páginas) e grava os registros para análise
+
+Desligado por padrão: sem METRICAS_ATIVAS=1 os decoradores devolvem as
+funções originais, sem nenhum custo por chamada.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List
+
+class Metricas:
+    """Instrumentação por decoradores, agrupada por execução (rerun do Streamlit, requisição, etc.)"""
+    
+    ATIVO = os.getenv('METRICAS_ATIVAS', '0').lower() in ('1', 'true', 'sim')
+    # 'jsonl' acrescenta um registro por chamada; 'prometheus' reescreve o
+    # arquivo com os totais acumulados do processo (coletor textfile)
+    FORMATO = os.getenv('METRICAS_FORMATO', 'jsonl')
+    ARQUIVO = os.getenv('METRICAS_ARQUIVO', 'data/metricas.prom' if FORMATO == 'prometheus' else 'data/metricas.jsonl')
+    
+    _local = threading.local()
+    _lock = threading.Lock()
+    # Totais do processo para o formato Prometheus: nome -> [chamadas, segundos, erros]
+    _totais: Dict[str, List[float]] = {}
+    
+    @classmethod
+    def medir(cls, nome: str) -> Callable:
+        """
+        Decorador que registra a duração de cada chamada da função
+        
+        A chamada mais externa abre uma execução; ao terminar, os registros dela
+        são gravados no arquivo.
+        
+        Args:
+            nome: Identificador no formato 'camada.operacao' (ex.: 'sheets.read_user_data')
+        """
+        def decorar(funcao):
+            if not cls.ATIVO:
+                return funcao
+            
+            @functools.wraps(funcao)
+            def medida(*args, **kwargs):
+                local = cls._local
+                if not getattr(local, 'filhos', None):
+                    local.filhos = []
+                    local.registros = []
+                    local.execucao = uuid.uuid4().hex[:12]
+                local.filhos.append(0.0)
+                inicio = time.perf_counter()
+                erro = None
+                try:
+                    return funcao(*args, **kwargs)
+                except Exception as e:
+                    erro = type(e).__name__
+                    raise
+                finally:
+                    ms = (time.perf_counter() - inicio) * 1000
+                    filhos_ms = local.filhos.pop()
+                    local.registros.append({
+                        'execucao': local.execucao,
+                        'ts': round(time.time(), 3),
+                        'nome': nome,
+                        'nivel': len(local.filhos),
+                        'ms': round(ms, 3),
+                        'proprio_ms': round(ms - filhos_ms, 3),
+                        'erro': erro
+                    })
+                    if local.filhos:
+                        local.filhos[-1] += ms
+                    else:
+                        registros, local.registros = local.registros, []
+                        cls._gravar(registros)
+            return medida
+        return decorar
+    
+    @classmethod
+    def instrumentar(cls, camada: str, privados: Iterable[str] = ()) -> Callable:
+        """
+        Decorador de classe que mede todos os métodos públicos
+        
+        Args:
+            camada: Prefixo dos nomes (ex.: 'sheets' gera 'sheets.read_user_data')
+            privados: Métodos com '_' que também devem ser medidos
+        """
+        def decorar(classe):
+            if not cls.ATIVO:
+                return classe
+            incluir = set(privados)
+            for nome, atributo in list(vars(classe).items()):
+                if nome.startswith('_') and nome not in incluir:
+                    continue
+                rotulo = f'{camada}.{nome}'
+                if isinstance(atributo, staticmethod):
+                    setattr(classe, nome, staticmethod(cls.medir(rotulo)(atributo.__func__)))
+                elif isinstance(atributo, classmethod):
+                    setattr(classe, nome, classmethod(cls.medir(rotulo)(atributo.__func__)))
+                elif callable(atributo) and not isinstance(atributo, type):
+                    setattr(classe, nome, cls.medir(rotulo)(atributo))
+            return classe
+        return decorar
+    
+    @classmethod
+    def registros_atuais(cls) -> List[Dict[str, Any]]:
+        """Registros já concluídos da execução em andamento nesta thread"""
+        return list(getattr(cls._local, 'registros', None) or [])
+    
+    @staticmethod
+    def resumir(registros: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Agrega os registros por nome
+        
+        Returns:
+            Lista ordenada pelo tempo próprio (sem o das chamadas internas),
+            com chamadas, tempo total, tempo próprio e maior chamada em ms
+        """
+        resumo: Dict[str, Dict[str, Any]] = {}
+        for registro in registros:
+            item = resumo.setdefault(registro['nome'], {
+                'nome': registro['nome'], 'chamadas': 0, 'total_ms': 0.0, 'proprio_ms': 0.0, 'max_ms': 0.0
+            })
+            item['chamadas'] += 1
+            item['total_ms'] += registro['ms']
+            item['proprio_ms'] += registro['proprio_ms']
+            item['max_ms'] = max(item['max_ms'], registro['ms'])
+        for item in resumo.values():
+            for chave in ('total_ms', 'proprio_ms', 'max_ms'):
+                item[chave] = round(item[chave], 1)
+        return sorted(resumo.values(), key=lambda item: item['proprio_ms'], reverse=True)
+    
+    @staticmethod
+    def por_camada(registros: List[Dict[str, Any]]) -> Dict[str, float]:
+        """Tempo próprio (ms) somado por camada ('sheets', 'calculos', 'graficos', ...)"""
+        camadas: Dict[str, float] = {}
+        for registro in registros:
+            camada = registro['nome'].split('.', 1)[0]
+            camadas[camada] = camadas.get(camada, 0.0) + registro['proprio_ms']
+        return {camada: round(ms, 1) for camada, ms in sorted(camadas.items(), key=lambda c: -c[1])}
+    
+    @classmethod
+    def _gravar(cls, registros: List[Dict[str, Any]]):
+        """Grava os registros de uma execução; falhas de gravação não afetam a aplicação"""
+        try:
+            pasta = os.path.dirname(cls.ARQUIVO)
+            if pasta:
+                os.makedirs(pasta, exist_ok=True)
+            with cls._lock:
+                if cls.FORMATO == 'prometheus':
+                    cls._gravar_prometheus(registros)
+                else:
+                    with open(cls.ARQUIVO, 'a', encoding='utf-8') as f:
+                        f.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in registros))
+        except OSError:
+            pass
+    
+    @classmethod
+    def _gravar_prometheus(cls, registros: List[Dict[str, Any]]):
+        for registro in registros:
+            total = cls._totais.setdefault(registro['nome'], [0, 0.0, 0])
+            total[0] += 1
+            total[1] += registro['ms'] / 1000
+            total[2] += 1 if registro['erro'] else 0
+        linhas = [
+            '# HELP precificacao_chamada_segundos Duração das chamadas instrumentadas',
+            '# TYPE precificacao_chamada_segundos summary'
+        ]
+        for nome, (chamadas, segundos, _) in sorted(cls._totais.items()):
+            linhas.append(f'precificacao_chamada_segundos_sum{{nome="{nome}"}} {segundos:.6f}')
+            linhas.append(f'precificacao_chamada_segundos_count{{nome="{nome}"}} {chamadas}')
+        linhas += [
+            '# HELP precificacao_chamada_erros_total Chamadas instrumentadas que terminaram em exceção',
+            '# TYPE precificacao_chamada_erros_total counter'
+        ]
+        for nome, (_, _, erros) in sorted(cls._totais.items()):
+            linhas.append(f'precificacao_chamada_erros_total{{nome="{nome}"}} {erros}')
+        # Escrita atômica: o coletor nunca lê um arquivo pela metade
+        temporario = f'{cls.ARQUIVO}.{os.getpid()}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(linhas) + '\n')
+        os.replace(temporario, cls.ARQUIVO)
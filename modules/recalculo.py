@@ -0,0 +1,163 @@
+"""
+Módulo de Recálculo em Lote
+Aplica uma alteração de custos a todos os usuários (tenants) e recalcula
+os catálogos em paralelo, isolando falhas por usuário
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+from modules.calculos import CalculadoraMarkup
+from modules.storage import StorageBackend
+from modules.write_behind import WriteBehindStorage
+
+class RecalculoEmLote:
+    """Job administrativo de recálculo de todos os tenants da aba 'users'"""
+    
+    # Threads simultâneas; cada tenant faz uma leitura e até duas escritas na API
+    MAX_WORKERS = 4
+    
+    def __init__(self, storage: StorageBackend, max_workers: int = MAX_WORKERS):
+        """
+        Inicializa o job
+        
+        Args:
+            storage: Backend de armazenamento (compartilhado entre as threads)
+            max_workers: Número máximo de tenants processados ao mesmo tempo
+        """
+        self.storage = storage
+        self.max_workers = max(1, int(max_workers))
+        self.calc = CalculadoraMarkup()
+    
+    def listar_tenants(self, apenas_ativos: bool = False) -> List[str]:
+        """
+        Lista os prefixos (sheet_tab_prefix) distintos da aba de usuários
+        
+        Args:
+            apenas_ativos: Se True, ignora usuários desativados
+        
+        Returns:
+            Prefixos na ordem de cadastro, sem repetições
+        """
+        users_df = self.storage.read_users()
+        if users_df.empty or 'sheet_tab_prefix' not in users_df.columns:
+            return []
+        if apenas_ativos and 'active' in users_df.columns:
+            users_df = users_df[users_df['active'].map(
+                lambda v: str(v).strip().upper() in ('TRUE', 'VERDADEIRO', 'SIM', '1', '1.0')
+            )]
+        prefixos = users_df['sheet_tab_prefix'].dropna().astype(str).str.strip()
+        return [p for p in dict.fromkeys(prefixos) if p]
+    
+    def validar_alteracao(self, alteracao: Dict[str, Any]) -> Dict[str, float]:
+        """
+        Valida a alteração de configuração contra os campos conhecidos
+        
+        Args:
+            alteracao: Campos de configuração e novos valores
+        
+        Returns:
+            Alteração com valores convertidos para float
+        
+        Raises:
+            ValueError: Campo desconhecido, valor não numérico ou alteração vazia
+        """
+        campos = self.storage._get_default_config()
+        desconhecidos = sorted(set(alteracao) - set(campos))
+        if desconhecidos:
+            raise ValueError(f"Campos de configuração desconhecidos: {', '.join(desconhecidos)}")
+        if not alteracao:
+            raise ValueError("Nenhum campo para alterar")
+        try:
+            return {campo: float(valor) for campo, valor in alteracao.items()}
+        except (TypeError, ValueError):
+            raise ValueError("Os valores da alteração devem ser numéricos")
+    
+    def recalcular_tenant(self, prefix: str, alteracao: Dict[str, float]) -> Dict[str, Any]:
+        """
+        Aplica a alteração na config de um tenant e recalcula seu catálogo
+        
+        Args:
+            prefix: Prefixo do tenant
+            alteracao: Campos de configuração a sobrescrever
+        
+        Returns:
+            Resultado com prefix, status ('ok' ou 'erro'), produtos, erro e duracao_s
+        """
+        inicio = time.perf_counter()
+        resultado = {'prefix': prefix, 'status': 'ok', 'produtos': 0, 'erro': None}
+        try:
+            config, produtos_df = self.storage.read_user_data(prefix)
+            nova_config = {**config, **alteracao}
+            markup = self.calc.calcular_markup_usuario(nova_config)
+            if markup['erro_markup']:
+                # Config inválida para este tenant: nada é gravado
+                raise ValueError(markup['erro_markup'])
+            
+            self.storage.write_user_config(prefix, nova_config)
+            if not produtos_df.empty:
+                produtos_atualizados = self.calc.recalcular_produtos(
+                    produtos_df, markup['markup_mult'], markup['markup_divisor']
+                )
+                self.storage.write_user_products(prefix, produtos_atualizados)
+                resultado['produtos'] = len(produtos_atualizados)
+        except Exception as e:
+            resultado.update({'status': 'erro', 'erro': str(e)})
+        resultado['duracao_s'] = time.perf_counter() - inicio
+        return resultado
+    
+    def executar(
+        self,
+        alteracao: Dict[str, Any],
+        tenants: Optional[List[str]] = None,
+        ao_progredir: Optional[Callable[[Dict[str, Any], int, int], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Executa o recálculo de todos os tenants num pool de threads limitado
+        
+        Uma falha num tenant não interrompe os demais. Se o backend tiver fila
+        de gravação (write-behind), ela é esvaziada antes do relatório e os
+        erros de gravação entram no resultado do tenant.
+        
+        Args:
+            alteracao: Campos de configuração e novos valores
+            tenants: Prefixos a processar (padrão: todos da aba 'users')
+            ao_progredir: Chamado na thread atual a cada tenant concluído,
+                com (resultado, concluídos, total)
+        
+        Returns:
+            Relatório com alteracao, total, sucesso, falhas, produtos,
+            duracao_s e a lista de resultados por tenant
+        """
+        inicio = time.perf_counter()
+        alteracao = self.validar_alteracao(alteracao)
+        tenants = list(dict.fromkeys(tenants if tenants is not None else self.listar_tenants()))
+        ordem = {prefix: i for i, prefix in enumerate(tenants)}
+        
+        resultados = []
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='recalculo') as executor:
+            futuros = [executor.submit(self.recalcular_tenant, prefix, alteracao) for prefix in tenants]
+            for futuro in as_completed(futuros):
+                resultado = futuro.result()
+                resultados.append(resultado)
+                if ao_progredir:
+                    ao_progredir(resultado, len(resultados), len(tenants))
+        
+        if isinstance(self.storage, WriteBehindStorage):
+            self.storage.flush()
+            for resultado in resultados:
+                status = self.storage.status_gravacao(resultado['prefix'])
+                if resultado['status'] == 'ok' and status['erro']:
+                    resultado.update({'status': 'erro', 'erro': f"Falha ao gravar: {status['erro']}"})
+        
+        resultados.sort(key=lambda r: ordem[r['prefix']])
+        falhas = [r for r in resultados if r['status'] != 'ok']
+        return {
+            'alteracao': alteracao,
+            'total': len(resultados),
+            'sucesso': len(resultados) - len(falhas),
+            'falhas': len(falhas),
+            'produtos': sum(r['produtos'] for r in resultados if r['status'] == 'ok'),
+            'duracao_s': time.perf_counter() - inicio,
+            'resultados': resultados
+        }
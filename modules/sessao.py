@@ -0,0 +1,228 @@
+"""
+Módulo de Dados da Sessão
+Mantém em memória, por sessão do Streamlit, a config e o catálogo do usuário,
+para que reruns e troca de módulo não voltem ao armazenamento
+"""
+import threading
+import time
+import pandas as pd
+from modules.esquema import EsquemaProdutos
+from modules.storage import StorageBackend
+from modules.upsert import MotorUpsert
+from typing import Any, Dict, List, MutableMapping, Optional, Set, Tuple
+
+class DadosSessao(StorageBackend):
+    """
+    Camada de dados da sessão na frente do backend compartilhado
+    
+    Config e produtos de cada usuário são lidos uma vez e servidos da memória
+    até passarem de 'max_idade' segundos (ou até recarregar()). Alterações
+    são aplicadas primeiro na cópia local e em seguida repassadas ao backend;
+    se o backend falhar, a cópia local é descartada e recarregada na próxima
+    leitura.
+    
+    Cada escrita no backend avança a geração do usuário, compartilhada por
+    todas as sessões do processo: as outras sessões descartam a cópia na
+    próxima leitura em vez de servir (e regravar) dados antigos. Escritas
+    feitas direto no backend devem chamar notificar_escrita().
+    """
+    
+    # Chave do st.session_state onde os dados ficam
+    CHAVE_ESTADO = '_dados_sessao'
+    # Segundos até os dados da sessão serem relidos do backend
+    MAX_IDADE = 300.0
+    
+    # (id do backend, prefixo) -> número de escritas feitas no processo
+    _geracoes: Dict[Tuple[int, str], int] = {}
+    _lock_geracoes = threading.Lock()
+    
+    def __init__(self, backend: StorageBackend, estado: MutableMapping, max_idade: float = MAX_IDADE):
+        """
+        Inicializa a camada
+        
+        Args:
+            backend: Armazenamento compartilhado entre as sessões
+            estado: Onde guardar os dados entre reruns (st.session_state)
+            max_idade: Idade máxima dos dados em memória, em segundos
+        """
+        self.backend = backend
+        self.max_idade = max_idade
+        if self.CHAVE_ESTADO not in estado:
+            estado[self.CHAVE_ESTADO] = {}
+        self._dados: Dict[str, Dict[str, Any]] = estado[self.CHAVE_ESTADO]
+    
+    @classmethod
+    def notificar_escrita(cls, backend: StorageBackend, prefixos: List[str]):
+        """
+        Invalida a cópia em memória de todas as sessões após escritas feitas
+        direto no backend (ex.: recálculo em lote)
+        
+        Args:
+            backend: Backend compartilhado em que as escritas foram feitas
+            prefixos: Usuários alterados
+        """
+        with cls._lock_geracoes:
+            for prefix in prefixos:
+                chave = (id(backend), prefix)
+                cls._geracoes[chave] = cls._geracoes.get(chave, 0) + 1
+    
+    def _geracao(self, prefix: str) -> int:
+        return self._geracoes.get((id(self.backend), prefix), 0)
+    
+    def _entrada(self, prefix: str) -> Dict[str, Any]:
+        """Dados do usuário em memória, lidos do backend se ausentes, velhos ou alterados por outra sessão"""
+        entrada = self._dados.get(prefix)
+        if (entrada is None or entrada.get('geracao') != self._geracao(prefix)
+                or time.monotonic() - entrada['carregado_em'] > self.max_idade):
+            geracao = self._geracao(prefix)
+            config, produtos = self.backend.read_user_data(prefix)
+            entrada = {
+                'config': dict(config),
+                'produtos': produtos.reset_index(drop=True),
+                'carregado_em': time.monotonic(),
+                'geracao': geracao
+            }
+            self._dados[prefix] = entrada
+        return entrada
+    
+    def _atualizar_produtos(self, prefix: str, produtos: pd.DataFrame, anexados: int = 0):
+        """
+        Troca o catálogo em memória
+        
+        Args:
+            prefix: Prefixo do usuário
+            produtos: Novo catálogo
+            anexados: Quantas linhas do fim são novas; com 0 (catálogo
+                alterado de outra forma) o índice de códigos é refeito na
+                próxima consulta
+        """
+        entrada = self._entrada(prefix)
+        entrada['produtos'] = EsquemaProdutos.aplicar(produtos.reset_index(drop=True))
+        codigos = entrada.get('codigos')
+        if anexados and codigos is not None and 'codigo' in entrada['produtos'].columns:
+            codigos.update(entrada['produtos']['codigo'].iloc[-anexados:].astype(str))
+        else:
+            entrada['codigos'] = None
+    
+    def _codigos(self, prefix: str) -> Set[str]:
+        """Índice dos códigos do catálogo em memória, montado na primeira consulta"""
+        entrada = self._entrada(prefix)
+        if entrada.get('codigos') is None:
+            produtos = entrada['produtos']
+            entrada['codigos'] = set(produtos['codigo'].astype(str)) if 'codigo' in produtos.columns else set()
+        return entrada['codigos']
+    
+    def _repassar(self, prefix: str, escrita, *args):
+        """Executa a escrita no backend; em caso de erro, descarta a cópia local"""
+        try:
+            resultado = escrita(prefix, *args)
+        except Exception:
+            self.recarregar(prefix)
+            raise
+        # Avança a geração; a cópia local só continua válida se nenhuma outra
+        # sessão escreveu desde a leitura dela
+        chave = (id(self.backend), prefix)
+        with self._lock_geracoes:
+            geracao = self._geracoes.get(chave, 0)
+            self._geracoes[chave] = geracao + 1
+            entrada = self._dados.get(prefix)
+            if entrada is not None and entrada.get('geracao') == geracao:
+                entrada['geracao'] = geracao + 1
+        return resultado
+    
+    def recarregar(self, prefix: Optional[str] = None):
+        """Descarta os dados em memória de um usuário (ou de todos)"""
+        if prefix is None:
+            self._dados.clear()
+        else:
+            self._dados.pop(prefix, None)
+    
+    def idade(self, prefix: str) -> Optional[float]:
+        """Segundos desde a última leitura do backend, ou None se não carregado"""
+        entrada = self._dados.get(prefix)
+        return time.monotonic() - entrada['carregado_em'] if entrada else None
+    
+    def read_users(self) -> pd.DataFrame:
+        return self.backend.read_users()
+    
+    def read_user_config(self, prefix: str) -> Dict[str, Any]:
+        return dict(self._entrada(prefix)['config'])
+    
+    def write_user_config(self, prefix: str, config: Dict[str, Any]):
+        self._entrada(prefix)['config'] = dict(config)
+        self._repassar(prefix, self.backend.write_user_config, config)
+    
+    def read_user_products(self, prefix: str) -> pd.DataFrame:
+        return self._entrada(prefix)['produtos'].copy()
+    
+    def read_user_data(self, prefix: str) -> Tuple[Dict[str, Any], pd.DataFrame]:
+        entrada = self._entrada(prefix)
+        return dict(entrada['config']), entrada['produtos'].copy()
+    
+    def write_user_products(self, prefix: str, products_df: pd.DataFrame):
+        self._atualizar_produtos(prefix, products_df)
+        self._repassar(prefix, self.backend.write_user_products, products_df)
+    
+    def initialize_user_sheets(self, prefix: str):
+        self.backend.initialize_user_sheets(prefix)
+        self.recarregar(prefix)
+    
+    def product_code_exists(self, prefix: str, codigo: Any) -> bool:
+        return str(codigo) in self._codigos(prefix)
+    
+    def append_user_product(self, prefix: str, produto: Dict[str, Any]) -> bool:
+        if self.product_code_exists(prefix, produto.get('codigo', '')):
+            return False
+        atual = self._entrada(prefix)['produtos']
+        self._atualizar_produtos(prefix, pd.concat([atual, pd.DataFrame([produto])], ignore_index=True), anexados=1)
+        if not self._repassar(prefix, self.backend.append_user_product, produto):
+            # Cadastrado por outra sessão: a cópia local está desatualizada
+            self.recarregar(prefix)
+            return False
+        return True
+    
+    def append_user_products(self, prefix: str, products_df: pd.DataFrame) -> int:
+        if products_df.empty:
+            return 0
+        atual = self._entrada(prefix)['produtos']
+        self._atualizar_produtos(
+            prefix, products_df if atual.empty else pd.concat([atual, products_df], ignore_index=True),
+            anexados=len(products_df)
+        )
+        return self._repassar(prefix, self.backend.append_user_products, products_df)
+    
+    def upsert_user_products(self, prefix: str, atualizar: pd.DataFrame, inserir: pd.DataFrame):
+        if atualizar.empty and inserir.empty:
+            return
+        atual = self._entrada(prefix)['produtos']
+        self._atualizar_produtos(prefix, MotorUpsert.aplicar(atual, atualizar, inserir))
+        self._repassar(prefix, self.backend.upsert_user_products, atualizar, inserir)
+    
+    def read_user_product(self, prefix: str, codigo: Any) -> Optional[Dict[str, Any]]:
+        produtos = self._entrada(prefix)['produtos']
+        if 'codigo' not in produtos.columns:
+            return None
+        encontrados = produtos[produtos['codigo'] == str(codigo)]
+        return encontrados.iloc[0].to_dict() if not encontrados.empty else None
+    
+    def read_user_codes(self, prefix: str) -> Set[str]:
+        return set(self._codigos(prefix))
+    
+    def read_user_products_by_category(self, prefix: str, categoria: str) -> pd.DataFrame:
+        produtos = self._entrada(prefix)['produtos']
+        if 'categoria' not in produtos.columns:
+            # Sem a coluna nenhum produto pertence à categoria
+            return produtos.iloc[0:0].copy()
+        return produtos[produtos['categoria'] == categoria].reset_index(drop=True)
+    
+    def read_user_products_page(self, prefix: str, offset: int, limit: int) -> pd.DataFrame:
+        return self._entrada(prefix)['produtos'].iloc[offset:offset + limit].reset_index(drop=True)
+    
+    def count_user_products(self, prefix: str) -> int:
+        return len(self._entrada(prefix)['produtos'])
+    
+    def list_user_categories(self, prefix: str) -> List[str]:
+        produtos = self._entrada(prefix)['produtos']
+        if 'categoria' not in produtos.columns:
+            return []
+        return sorted(produtos['categoria'].dropna().astype(str).unique().tolist())
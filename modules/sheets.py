@@ -2,13 +2,26 @@
 Módulo de Comunicação com Google Sheets API
 Gerencia leitura e escrita de dados na planilha
 """
+import json
+import threading
 import gspread
+import numpy as np
+import requests
+from google.auth.exceptions import TransportError
+from google.auth.transport.requests import AuthorizedSession
 from google.oauth2.service_account import Credentials
 import pandas as pd
 import streamlit as st
-from typing import Dict, List, Optional, Any
+from modules.cache import CacheTTL
+from modules.esquema import EsquemaProdutos
+from modules.storage import StorageBackend
+from modules.metricas import Metricas
+from typing import Callable, Dict, List, Optional, Any, Set, Tuple, TypeVar
 
-class SheetsManager:
+T = TypeVar('T')
+
+@Metricas.instrumentar('sheets', privados=['_ler_lote'])
+class SheetsManager(StorageBackend):
     """Gerenciador de operações com Google Sheets"""
     
     SCOPES = [
@@ -16,57 +29,292 @@ class SheetsManager:
         'https://www.googleapis.com/auth/drive'
     ]
     
-    def __init__(self, spreadsheet_id: str, credentials_info: Dict):
+    # Conexões HTTP mantidas abertas no pool da sessão compartilhada
+    POOL_SIZE = 10
+    
+    # Erros após os quais a conexão é refeita e a operação repetida uma vez
+    ERROS_RECONEXAO = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, TransportError)
+    STATUS_RECONEXAO = (401, 500, 502, 503)
+    
+    # Cache de leitura das abas (segundos de validade e número máximo de abas)
+    CACHE_TTL = 60.0
+    CACHE_MAX_ABAS = 64
+    
+    def __init__(
+        self,
+        spreadsheet_id: str,
+        credentials_info: Dict,
+        cache_ttl: float = CACHE_TTL,
+        cache_max_abas: int = CACHE_MAX_ABAS
+    ):
         """
         Inicializa conexão com Google Sheets
         
+        A instância é segura para uso concorrente e pode ser compartilhada
+        entre todas as sessões do processo (ver app.obter_sheets_manager).
+        
         Args:
             spreadsheet_id: ID da planilha do Google Sheets
             credentials_info: Dicionário com credenciais da service account
+            cache_ttl: Validade, em segundos, das abas lidas em cache (0 desativa)
+            cache_max_abas: Número máximo de abas mantidas em cache (LRU)
         """
         self.spreadsheet_id = spreadsheet_id
         self.credentials = Credentials.from_service_account_info(
             credentials_info,
             scopes=self.SCOPES
         )
-        self.client = gspread.authorize(self.credentials)
+        self._lock = threading.RLock()
+        self._geracao = 0
+        self.client = None
         self.spreadsheet = None
+        self._cache = CacheTTL(ttl=cache_ttl, max_itens=cache_max_abas)
+        # Último estado conhecido de cada aba: (sheet_id, DataFrame), base das escritas incrementais
+        self._estado_abas = CacheTTL(ttl=cache_ttl, max_itens=cache_max_abas)
+        # Um lock de escrita por aba: só escritas na mesma aba esperam umas
+        # pelas outras (o lock é mantido durante as chamadas à API)
+        self._locks_escrita: Dict[str, threading.RLock] = {}
+        self._lock_locks = threading.Lock()
+        # Índice de códigos por aba de produtos: (cabeçalho, conjunto de códigos)
+        self._indices_codigos = CacheTTL(ttl=cache_ttl, max_itens=cache_max_abas)
+        # Abas da planilha (título -> sheetId) e prefixos já inicializados neste processo
+        self._abas_existentes: Optional[Dict[str, int]] = None
+        self._prefixos_inicializados: set = set()
         self._connect()
     
+    def _criar_cliente(self) -> gspread.Client:
+        """
+        Cria cliente gspread sobre uma sessão HTTP com pool de conexões
+        
+        O token OAuth não é buscado aqui: a AuthorizedSession obtém e renova
+        o token sob demanda, na primeira requisição em que ele estiver expirado.
+        """
+        session = AuthorizedSession(self.credentials)
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.POOL_SIZE,
+            pool_maxsize=self.POOL_SIZE
+        )
+        session.mount('https://', adapter)
+        return gspread.Client(self.credentials, session=session)
+    
     def _connect(self):
         """Estabelece conexão com a planilha"""
+        with self._lock:
+            try:
+                self.client = self._criar_cliente()
+                self.spreadsheet = self.client.open_by_key(self.spreadsheet_id)
+                self._geracao += 1
+            except Exception as e:
+                st.error(f"Erro ao conectar com Google Sheets: {e}")
+                raise
+    
+    def _reconnect(self, geracao: int):
+        """Refaz a conexão, a menos que outra thread já a tenha refeito"""
+        with self._lock:
+            if self._geracao == geracao:
+                self._connect()
+    
+    def _deve_reconectar(self, erro: Exception) -> bool:
+        """Indica se o erro é de conexão/autenticação e justifica reconectar"""
+        if isinstance(erro, self.ERROS_RECONEXAO):
+            return True
+        if isinstance(erro, gspread.exceptions.APIError):
+            status = getattr(erro.response, 'status_code', None)
+            return status in self.STATUS_RECONEXAO
+        return False
+    
+    def _executar(self, operacao: Callable[[], T]) -> T:
+        """
+        Executa operação na planilha, reconectando e repetindo uma vez em caso de falha
+        
+        Args:
+            operacao: Função sem argumentos que usa self.spreadsheet
+            
+        Returns:
+            Resultado da operação
+        """
+        geracao = self._geracao
         try:
-            self.spreadsheet = self.client.open_by_key(self.spreadsheet_id)
+            return operacao()
         except Exception as e:
-            st.error(f"Erro ao conectar com Google Sheets: {e}")
-            raise
+            if not self._deve_reconectar(e):
+                raise
+        self._reconnect(geracao)
+        return operacao()
     
     def _get_or_create_worksheet(self, title: str, rows: int = 1000, cols: int = 20) -> gspread.Worksheet:
         """Obtém worksheet ou cria se não existir"""
         try:
             return self.spreadsheet.worksheet(title)
         except gspread.WorksheetNotFound:
-            return self.spreadsheet.add_worksheet(title=title, rows=rows, cols=cols)
+            worksheet = self.spreadsheet.add_worksheet(title=title, rows=rows, cols=cols)
+            with self._lock:
+                if self._abas_existentes is not None:
+                    self._abas_existentes[title] = worksheet.id
+            return worksheet
+    
+    def _listar_abas(self, atualizar: bool = False) -> Dict[str, int]:
+        """Retorna título -> sheetId das abas, buscando a lista uma vez por processo"""
+        with self._lock:
+            if atualizar or self._abas_existentes is None:
+                metadata = self._executar(lambda: self.spreadsheet.fetch_sheet_metadata(
+                    params={'fields': 'sheets.properties(title,sheetId)'}
+                ))
+                self._abas_existentes = {
+                    aba['properties']['title']: aba['properties']['sheetId']
+                    for aba in metadata.get('sheets', [])
+                }
+            return dict(self._abas_existentes)
+    
+    def _linhas_iniciais(self, titulos: List[str]) -> Dict[str, List[List[Any]]]:
+        """
+        Lê cabeçalho e primeira linha de dados de várias abas em uma única chamada de metadados
+        
+        Args:
+            titulos: Abas existentes a consultar
+            
+        Returns:
+            Dicionário título -> até duas linhas, cada uma só com as células preenchidas
+        """
+        if not titulos:
+            return {}
+        metadata = self._executar(lambda: self.spreadsheet.fetch_sheet_metadata(params={
+            'includeGridData': 'true',
+            'ranges': [f"'{titulo}'!1:2" for titulo in titulos],
+            'fields': 'sheets(properties.title,data.rowData.values.effectiveValue)'
+        }))
+        linhas = {}
+        for aba in metadata.get('sheets', []):
+            row_data = []
+            for bloco in aba.get('data', []):
+                row_data.extend(bloco.get('rowData', []))
+            linhas[aba['properties']['title']] = [
+                [next(iter(c['effectiveValue'].values())) for c in row.get('values', []) if c.get('effectiveValue')]
+                for row in row_data
+            ]
+        return linhas
     
     def read_worksheet_to_df(self, worksheet_name: str) -> pd.DataFrame:
         """
         Lê worksheet e retorna como DataFrame
         
+        A leitura passa pelo cache por aba; somente em miss (ou após o TTL)
+        a aba é baixada. Cada chamada recebe uma cópia independente.
+        
         Args:
             worksheet_name: Nome da aba
             
         Returns:
             DataFrame com dados da aba
         """
-        try:
+        df = self._cache.get(worksheet_name)
+        if df is not None:
+            return df.copy()
+        def ler():
             worksheet = self.spreadsheet.worksheet(worksheet_name)
-            data = worksheet.get_all_records()
-            return pd.DataFrame(data)
+            if self._sem_formatacao(worksheet_name):
+                registros = worksheet.get_all_records(
+                    value_render_option=gspread.utils.ValueRenderOption.unformatted,
+                    numericise_ignore=['all']
+                )
+            else:
+                registros = worksheet.get_all_records()
+            return worksheet.id, registros
+        
+        try:
+            sheet_id, data = self._executar(ler)
+            df = self._tipar(worksheet_name, pd.DataFrame(data))
+            self._estado_abas.set(worksheet_name, (sheet_id, df))
         except gspread.WorksheetNotFound:
-            return pd.DataFrame()
+            df = pd.DataFrame()
         except Exception as e:
             st.error(f"Erro ao ler aba '{worksheet_name}': {e}")
             return pd.DataFrame()
+        self._cache.set(worksheet_name, df)
+        return df.copy()
+    
+    @staticmethod
+    def _sem_formatacao(worksheet_name: str) -> bool:
+        """
+        Abas lidas com UNFORMATTED_VALUE: números chegam como números, sem
+        depender da formatação ou da localidade da planilha ('R$ 1.200,00'
+        formatado vem como 1200). O que o usuário digitou como texto continua
+        texto (códigos como '00123' não viram 123) e é convertido pelo esquema.
+        """
+        return worksheet_name.endswith(('products', 'config'))
+    
+    @staticmethod
+    def _tipar(worksheet_name: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Aplica o esquema às abas de produtos, antes de ir para o cache"""
+        return EsquemaProdutos.aplicar(df) if worksheet_name.endswith('products') else df
+    
+    @staticmethod
+    def _valores_para_df(valores: List[List[Any]], numericise: bool = True) -> pd.DataFrame:
+        """Converte o retorno de values_batch_get no mesmo DataFrame de get_all_records"""
+        if not valores or valores == [[]]:
+            return pd.DataFrame()
+        largura = max(len(linha) for linha in valores)
+        linhas = [linha + [''] * (largura - len(linha)) for linha in valores]
+        if numericise:
+            linhas[1:] = [gspread.utils.numericise_all(linha) for linha in linhas[1:]]
+        return pd.DataFrame(gspread.utils.to_records(linhas[0], linhas[1:]))
+    
+    def _ler_lote(self, worksheet_names: List[str], atualizar_abas: bool = False) -> Dict[str, pd.DataFrame]:
+        abas = self._listar_abas(atualizar_abas)
+        existentes = [nome for nome in worksheet_names if nome in abas]
+        lidas = {nome: pd.DataFrame() for nome in worksheet_names}
+        if not existentes:
+            return lidas
+        # Uma única requisição: sem formatação só se todas as abas admitirem
+        sem_formatacao = all(self._sem_formatacao(nome) for nome in existentes)
+        params = {'valueRenderOption': 'UNFORMATTED_VALUE'} if sem_formatacao else None
+        resposta = self._executar(
+            lambda: self.spreadsheet.values_batch_get([f"'{nome}'" for nome in existentes], params=params)
+        )
+        for nome, bloco in zip(existentes, resposta.get('valueRanges', [])):
+            df = self._tipar(nome, self._valores_para_df(bloco.get('values', []), numericise=not sem_formatacao))
+            self._estado_abas.set(nome, (abas[nome], df))
+            lidas[nome] = df
+        return lidas
+    
+    def read_worksheets_to_dfs(self, worksheet_names: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        Lê várias abas com uma única chamada values_batch_get
+        
+        Abas já em cache não são baixadas de novo; abas inexistentes voltam
+        como DataFrame vazio, como em read_worksheet_to_df.
+        
+        Args:
+            worksheet_names: Nomes das abas
+            
+        Returns:
+            Dicionário nome da aba -> DataFrame
+        """
+        resultado = {}
+        faltantes = []
+        for nome in worksheet_names:
+            df = self._cache.get(nome)
+            if df is not None:
+                resultado[nome] = df.copy()
+            else:
+                faltantes.append(nome)
+        if not faltantes:
+            return resultado
+        
+        try:
+            try:
+                lidas = self._ler_lote(faltantes)
+            except gspread.exceptions.APIError:
+                # Lista de abas desatualizada (aba removida por fora); buscar de novo
+                lidas = self._ler_lote(faltantes, atualizar_abas=True)
+        except Exception as e:
+            st.error(f"Erro ao ler abas {', '.join(faltantes)}: {e}")
+            return {**resultado, **{nome: pd.DataFrame() for nome in faltantes}}
+        
+        for nome, df in lidas.items():
+            self._cache.set(nome, df)
+            resultado[nome] = df.copy()
+        return resultado
     
     def write_df_to_worksheet(self, df: pd.DataFrame, worksheet_name: str, clear_first: bool = True):
         """
@@ -77,21 +325,272 @@ class SheetsManager:
             worksheet_name: Nome da aba
             clear_first: Se True, limpa aba antes de escrever
         """
-        try:
+        data = self._linhas_brutas(df)
+        
+        def escrever():
             worksheet = self._get_or_create_worksheet(worksheet_name)
             
             if clear_first:
                 worksheet.clear()
             
-            # Converter DataFrame para lista de listas
-            data = [df.columns.tolist()] + df.values.tolist()
-            
             # Escrever dados em batch
             worksheet.update('A1', data)
+            return worksheet.id
+        
+        with self._lock_escrita(worksheet_name):
+            self._estado_abas.invalidate(worksheet_name)
+            try:
+                sheet_id = self._executar(escrever)
+                if clear_first:
+                    self._estado_abas.set(worksheet_name, (sheet_id, df.reset_index(drop=True)))
+            except Exception as e:
+                st.error(f"Erro ao escrever na aba '{worksheet_name}': {e}")
+                raise
+            finally:
+                self._invalidar_leitura(worksheet_name)
+    
+    def _lock_escrita(self, worksheet_name: str) -> threading.RLock:
+        """Lock de escrita da aba, criado no primeiro uso"""
+        with self._lock_locks:
+            lock = self._locks_escrita.get(worksheet_name)
+            if lock is None:
+                lock = self._locks_escrita[worksheet_name] = threading.RLock()
+            return lock
+    
+    @staticmethod
+    def _linhas_brutas(df: pd.DataFrame) -> List[List[Any]]:
+        """
+        Cabeçalho e linhas do DataFrame prontos para escrita RAW
+        
+        NaN, NA e infinitos viram '' (como em _valor_bruto). O payload é
+        validado aqui, antes de a aba ser limpa, para uma falha de
+        serialização não deixá-la vazia.
+        """
+        valores = df.replace([np.inf, -np.inf], np.nan).astype(object)
+        valores = valores.where(valores.notna(), '')
+        data = [[str(c) for c in df.columns]] + valores.values.tolist()
+        try:
+            json.dumps(data, allow_nan=False)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Dados não serializáveis para a planilha: {e}") from e
+        return data
+    
+    @staticmethod
+    def _valor_celula(valor: Any) -> Dict:
+        """Converte um valor Python/NumPy em CellData (equivalente à escrita RAW)"""
+        if (isinstance(valor, str) and valor == '') or pd.isna(valor):
+            return {}
+        if isinstance(valor, np.generic):
+            valor = valor.item()
+        if isinstance(valor, bool):
+            return {'userEnteredValue': {'boolValue': valor}}
+        if isinstance(valor, float) and not np.isfinite(valor):
+            return {}
+        if isinstance(valor, (int, float)):
+            return {'userEnteredValue': {'numberValue': valor}}
+        return {'userEnteredValue': {'stringValue': str(valor)}}
+    
+    @staticmethod
+    def _valor_bruto(valor: Any) -> Any:
+        """Converte um valor Python/NumPy em valor serializável para escrita RAW"""
+        if (isinstance(valor, str) and valor == '') or pd.isna(valor):
+            return ''
+        if isinstance(valor, np.generic):
+            valor = valor.item()
+        if isinstance(valor, float) and not np.isfinite(valor):
+            return ''
+        return valor
+    
+    @classmethod
+    def _linhas_celulas(cls, df: pd.DataFrame) -> List[Dict]:
+        """Converte linhas do DataFrame em RowData para batch_update"""
+        return [
+            {'values': [cls._valor_celula(v) for v in linha]}
+            for linha in df.to_numpy(dtype=object)
+        ]
+    
+    @staticmethod
+    def _agrupar_consecutivos(posicoes: List[int]) -> List[Tuple[int, int]]:
+        """Agrupa posições ordenadas em intervalos contíguos [inicio, fim)"""
+        intervalos = []
+        for pos in posicoes:
+            if intervalos and intervalos[-1][1] == pos:
+                intervalos[-1] = (intervalos[-1][0], pos + 1)
+            else:
+                intervalos.append((pos, pos + 1))
+        return intervalos
+    
+    @staticmethod
+    def _diff_por_chave(antigo: pd.DataFrame, novo: pd.DataFrame, chave: str) -> Optional[Dict]:
+        """
+        Compara dois DataFrames de mesmas colunas pela coluna chave
+        
+        Returns:
+            Dicionário com posições alteradas/removidas (no antigo), linhas
+            novas e o estado resultante da aba, ou None se houver chaves duplicadas
+        """
+        chaves_antigas = antigo[chave].astype(str).to_numpy()
+        chaves_novas = novo[chave].astype(str).to_numpy()
+        if pd.Series(chaves_antigas).duplicated().any() or pd.Series(chaves_novas).duplicated().any():
+            return None
+        
+        mantida = np.isin(chaves_antigas, chaves_novas)
+        existente = np.isin(chaves_novas, chaves_antigas)
+        
+        # Alinhar as linhas novas à ordem em que estão na planilha
+        novo_por_chave = novo.set_axis(chaves_novas)
+        chaves_mantidas = chaves_antigas[mantida]
+        valores_antigos = antigo[mantida].replace('', np.nan).to_numpy(dtype=object)
+        valores_novos = novo_por_chave.loc[chaves_mantidas].replace('', np.nan).to_numpy(dtype=object)
+        iguais = (valores_antigos == valores_novos) | (pd.isna(valores_antigos) & pd.isna(valores_novos))
+        alterada = ~iguais.all(axis=1)
+        
+        posicoes_mantidas = np.flatnonzero(mantida)
+        linhas_novas = novo[~existente]
+        resultado = pd.concat(
+            [novo_por_chave.loc[chaves_mantidas], linhas_novas.set_axis(chaves_novas[~existente])]
+        ).reset_index(drop=True)
+        return {
+            'alteradas': posicoes_mantidas[alterada].tolist(),
+            'linhas_alteradas': novo_por_chave.loc[chaves_mantidas[alterada]],
+            'removidas': np.flatnonzero(~mantida).tolist(),
+            'novas': linhas_novas,
+            'resultado': resultado
+        }
+    
+    def _ordem_confere(self, worksheet_name: str, antigo: pd.DataFrame, chave: str) -> bool:
+        """
+        Confere se a coluna chave da planilha ainda está na ordem do estado em memória
+        
+        Linhas inseridas, removidas ou ordenadas à mão deslocam as posições que
+        as atualizações e remoções incrementais usam; uma leitura só da
+        coluna detecta isso.
+        
+        Args:
+            worksheet_name: Nome da aba
+            antigo: Último estado conhecido da aba
+            chave: Coluna que identifica cada linha
             
-        except Exception as e:
-            st.error(f"Erro ao escrever na aba '{worksheet_name}': {e}")
-            raise
+        Returns:
+            True se cabeçalho e chaves coincidem linha a linha
+        """
+        coluna = gspread.utils.rowcol_to_a1(1, antigo.columns.get_loc(chave) + 1).rstrip('0123456789')
+        try:
+            resposta = self._executar(lambda: self.spreadsheet.values_get(
+                f"'{worksheet_name}'!{coluna}:{coluna}",
+                params={'valueRenderOption': 'UNFORMATTED_VALUE', 'majorDimension': 'COLUMNS'}
+            ))
+        except Exception:
+            return False
+        valores = (resposta.get('values') or [[]])[0]
+        
+        def sem_vazios_no_fim(chaves: List[str]) -> List[str]:
+            while chaves and chaves[-1] == '':
+                chaves.pop()
+            return chaves
+        
+        na_planilha = sem_vazios_no_fim([str(v) for v in valores])
+        em_memoria = sem_vazios_no_fim([chave] + antigo[chave].astype(str).tolist())
+        return na_planilha == em_memoria
+    
+    def write_df_incremental(self, df: pd.DataFrame, worksheet_name: str, chave: str = 'codigo') -> bool:
+        """
+        Escreve DataFrame enviando apenas a diferença para o último estado conhecido da aba
+        
+        Linhas alteradas, removidas e novas (identificadas pela coluna chave)
+        vão em um único batch_update. Sem estado conhecido, com cabeçalho
+        diferente, chaves duplicadas ou com a coluna chave da planilha fora
+        da ordem conhecida (linhas mexidas à mão), faz a reescrita completa.
+        
+        Args:
+            df: DataFrame para escrever
+            worksheet_name: Nome da aba
+            chave: Coluna que identifica cada linha
+            
+        Returns:
+            True se a escrita foi incremental, False se foi completa
+        """
+        with self._lock_escrita(worksheet_name):
+            estado = self._estado_abas.get(worksheet_name)
+            diff = None
+            if estado is not None and chave in df.columns:
+                sheet_id, antigo = estado
+                if list(antigo.columns) == list(df.columns):
+                    diff = self._diff_por_chave(antigo, df, chave)
+                # Atualizações e remoções são por posição: conferir antes que
+                # as linhas da planilha ainda são as do estado em memória
+                if (diff is not None and (diff['alteradas'] or diff['removidas'])
+                        and not self._ordem_confere(worksheet_name, antigo, chave)):
+                    diff = None
+            
+            if diff is None:
+                self.write_df_to_worksheet(df, worksheet_name, clear_first=True)
+                return False
+            
+            requests_batch = []
+            # Atualizações usam os índices originais, por isso vêm antes das remoções
+            linhas_alteradas = self._linhas_celulas(diff['linhas_alteradas'])
+            deslocamento = 0
+            for inicio, fim in self._agrupar_consecutivos(diff['alteradas']):
+                requests_batch.append({'updateCells': {
+                    'range': {'sheetId': sheet_id, 'startRowIndex': inicio + 1, 'endRowIndex': fim + 1},
+                    'rows': linhas_alteradas[deslocamento:deslocamento + fim - inicio],
+                    'fields': 'userEnteredValue'
+                }})
+                deslocamento += fim - inicio
+            # Remoções de baixo para cima para não deslocar os índices pendentes
+            for inicio, fim in reversed(self._agrupar_consecutivos(diff['removidas'])):
+                requests_batch.append({'deleteDimension': {
+                    'range': {'sheetId': sheet_id, 'dimension': 'ROWS', 'startIndex': inicio + 1, 'endIndex': fim + 1}
+                }})
+            if not diff['novas'].empty:
+                requests_batch.append({'appendCells': {
+                    'sheetId': sheet_id,
+                    'rows': self._linhas_celulas(diff['novas']),
+                    'fields': 'userEnteredValue'
+                }})
+            if not requests_batch:
+                return True
+            
+            self._estado_abas.invalidate(worksheet_name)
+            geracao = self._geracao
+            try:
+                # Sem repetição automática: reaplicar remoções não é idempotente
+                self.spreadsheet.batch_update({'requests': requests_batch})
+            except Exception as e:
+                if not self._deve_reconectar(e):
+                    self._invalidar_leitura(worksheet_name)
+                    st.error(f"Erro ao escrever na aba '{worksheet_name}': {e}")
+                    raise
+                self._reconnect(geracao)
+                self.write_df_to_worksheet(df, worksheet_name, clear_first=True)
+                return False
+            self._estado_abas.set(worksheet_name, (sheet_id, diff['resultado']))
+            self._invalidar_leitura(worksheet_name)
+            return True
+    
+    def _descartar_estado(self, worksheet_name: str):
+        """Esquece tudo o que se sabe da aba (usado quando ela sumiu ou foi esvaziada por fora)"""
+        self._estado_abas.invalidate(worksheet_name)
+        self._invalidar_leitura(worksheet_name)
+    
+    def _invalidar_leitura(self, worksheet_name: Optional[str]):
+        """Descarta a aba em cache e o índice de códigos derivado dela"""
+        self._cache.invalidate(worksheet_name)
+        self._indices_codigos.invalidate(worksheet_name)
+    
+    def cache_stats(self) -> Dict[str, int]:
+        """Retorna contadores do cache de abas (hits, misses, evictions, expirations, size)"""
+        return self._cache.stats()
+    
+    def invalidate_cache(self, worksheet_name: Optional[str] = None):
+        """
+        Descarta abas em cache, forçando nova leitura
+        
+        Args:
+            worksheet_name: Nome da aba; se None, descarta todas
+        """
+        self._invalidar_leitura(worksheet_name)
     
     def read_users(self) -> pd.DataFrame:
         """Lê aba de usuários"""
@@ -109,11 +608,23 @@ class SheetsManager:
         """
         config_name = f"{prefix}config"
         df = self.read_worksheet_to_df(config_name)
-        
+        return self._config_de_df(df)
+    
+    def _config_de_df(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """Primeira linha da aba de config, ou a configuração padrão se vazia"""
         if df.empty:
             return self._get_default_config()
         
-        return df.iloc[0].to_dict() if not df.empty else self._get_default_config()
+        config = df.iloc[0].to_dict()
+        # Valores digitados como texto ('3,5', 'R$ 1.200,00') viram números
+        numeros, _ = EsquemaProdutos.converter_numeros(pd.Series(config, dtype=object))
+        padrao = self._get_default_config()
+        for chave, numero in numeros.items():
+            if not pd.isna(numero):
+                config[chave] = float(numero)
+            elif chave in padrao and config[chave] in ('', None):
+                config[chave] = padrao[chave]
+        return config
     
     def write_user_config(self, prefix: str, config: Dict[str, Any]):
         """
@@ -140,60 +651,184 @@ class SheetsManager:
         products_name = f"{prefix}products"
         return self.read_worksheet_to_df(products_name)
     
+    def read_user_data(self, prefix: str) -> Tuple[Dict[str, Any], pd.DataFrame]:
+        """
+        Lê config e produtos do usuário numa única requisição
+        
+        Args:
+            prefix: Prefixo da aba do usuário
+            
+        Returns:
+            Tupla (configuração, DataFrame de produtos)
+        """
+        config_name = f"{prefix}config"
+        products_name = f"{prefix}products"
+        dfs = self.read_worksheets_to_dfs([config_name, products_name])
+        return self._config_de_df(dfs[config_name]), dfs[products_name]
+    
     def write_user_products(self, prefix: str, products_df: pd.DataFrame):
         """
         Escreve produtos do usuário
         
+        Envia apenas as linhas alteradas, novas e removidas (por código)
+        quando o estado atual da aba é conhecido.
+        
         Args:
             prefix: Prefixo da aba do usuário
             products_df: DataFrame com produtos
         """
         products_name = f"{prefix}products"
-        self.write_df_to_worksheet(products_df, products_name, clear_first=True)
+        self.write_df_incremental(products_df, products_name, chave='codigo')
     
-    def _get_default_config(self) -> Dict[str, float]:
-        """Retorna configuração padrão"""
-        return {
-            'cust_var_impostos_pct': 0.0,
-            'cust_var_royalties_pct': 0.0,
-            'cust_var_gestao_pct': 0.0,
-            'cust_var_taxa_cartao_pct': 0.0,
-            'cust_var_repasse_condominio_pct': 0.0,
-            'cust_var_investidor_pct': 0.0,
-            'cust_fix_monitoramento': 0.0,
-            'cust_fix_combustivel': 0.0,
-            'cust_fix_totem': 0.0,
-            'cust_fix_contabilidade': 0.0,
-            'cust_fix_internet': 0.0,
-            'cust_fix_telefone': 0.0,
-            'cust_fix_seguro': 0.0,
-            'cust_fix_folha': 0.0,
-            'cust_fix_aluguel': 0.0,
-            'cust_fix_outros': 0.0,
-            'faturamento_base': 0.0
-        }
+    def _indice_codigos(self, products_name: str) -> Tuple[List[str], set]:
+        """Retorna (cabeçalho, códigos) da aba, montando o índice a partir da leitura em cache"""
+        indice = self._indices_codigos.get(products_name)
+        if indice is None:
+            df = self.read_worksheet_to_df(products_name)
+            codigos = set(df['codigo'].astype(str)) if 'codigo' in df.columns else set()
+            indice = (df.columns.tolist(), codigos)
+            self._indices_codigos.set(products_name, indice)
+        return indice
+    
+    def product_code_exists(self, prefix: str, codigo: Any) -> bool:
+        """
+        Verifica se o código já está cadastrado, sem varrer o DataFrame
+        
+        Args:
+            prefix: Prefixo da aba do usuário
+            codigo: Código do produto
+            
+        Returns:
+            True se o código já existe
+        """
+        _, codigos = self._indice_codigos(f"{prefix}products")
+        return str(codigo) in codigos
+    
+    def append_user_product(self, prefix: str, produto: Dict[str, Any]) -> bool:
+        """
+        Adiciona um produto ao final da aba com uma única chamada de append
+        
+        O payload é uma linha, independente do tamanho do catálogo. Se a aba
+        ainda não tem cabeçalho ou o produto traz colunas novas, recai na
+        escrita do catálogo completo.
+        
+        Args:
+            prefix: Prefixo da aba do usuário
+            produto: Dicionário com o produto já calculado
+            
+        Returns:
+            False se o código já existe (nada é escrito), True caso contrário
+        """
+        products_name = f"{prefix}products"
+        codigo = str(produto.get('codigo', ''))
+        
+        with self._lock_escrita(products_name):
+            _, codigos = self._indice_codigos(products_name)
+            if codigo in codigos:
+                return False
+            self._anexar_produtos(products_name, pd.DataFrame([produto]))
+            return True
+    
+    def append_user_products(self, prefix: str, products_df: pd.DataFrame) -> int:
+        """
+        Adiciona vários produtos com uma única chamada de append
+        
+        Args:
+            prefix: Prefixo da aba do usuário
+            products_df: Produtos já calculados, com códigos validados
+            
+        Returns:
+            Número de produtos adicionados
+        """
+        if products_df.empty:
+            return 0
+        products_name = f"{prefix}products"
+        with self._lock_escrita(products_name):
+            self._anexar_produtos(products_name, products_df)
+        return len(products_df)
+    
+    def _anexar_produtos(self, products_name: str, produtos_df: pd.DataFrame):
+        """
+        Anexa linhas ao final da aba (chamar com o _lock_escrita da aba)
+        
+        O payload tem só as linhas novas, independente do tamanho do catálogo.
+        Se a aba ainda não tem cabeçalho ou os produtos trazem colunas novas,
+        recai na escrita do catálogo completo.
+        """
+        cabecalho, codigos = self._indice_codigos(products_name)
+        if 'codigo' not in cabecalho or not set(produtos_df.columns).issubset(cabecalho):
+            atual = self.read_worksheet_to_df(products_name)
+            produtos_final = pd.concat([atual, produtos_df], ignore_index=True)
+            self.write_df_to_worksheet(produtos_final, products_name, clear_first=True)
+            return
+        
+        linhas = [
+            [self._valor_bruto(v) for v in linha]
+            for linha in produtos_df.reindex(columns=cabecalho).to_numpy(dtype=object)
+        ]
+        self._estado_abas.invalidate(products_name)
+        self._cache.invalidate(products_name)
+        try:
+            self.spreadsheet.values_append(
+                f"'{products_name}'!A1",
+                params={'valueInputOption': 'RAW', 'insertDataOption': 'INSERT_ROWS'},
+                body={'values': linhas}
+            )
+        except Exception as e:
+            self._indices_codigos.invalidate(products_name)
+            st.error(f"Erro ao escrever na aba '{products_name}': {e}")
+            raise
+        codigos.update(produtos_df['codigo'].astype(str))
+    
+    def read_user_codes(self, prefix: str) -> Set[str]:
+        """Retorna os códigos cadastrados a partir do índice em cache"""
+        _, codigos = self._indice_codigos(f"{prefix}products")
+        return set(codigos)
     
     def initialize_user_sheets(self, prefix: str):
         """
         Inicializa abas do usuário com valores padrão
         
+        Lê as duas primeiras linhas das abas do usuário numa única chamada de
+        metadados, que também confirma que elas existem, sem baixar o
+        catálogo; a lista de abas só é buscada se alguma faltar (usuário
+        novo). O prefixo é lembrado pelo resto do processo.
+        
         Args:
             prefix: Prefixo da aba do usuário
         """
-        # Criar aba de config se não existir
+        if prefix in self._prefixos_inicializados:
+            return
+        
         config_name = f"{prefix}config"
-        df_config = self.read_worksheet_to_df(config_name)
-        if df_config.empty:
+        products_name = f"{prefix}products"
+        
+        titulos = [config_name, products_name]
+        with self._lock:
+            conhecidas = None if self._abas_existentes is None else set(self._abas_existentes)
+        if conhecidas is None or conhecidas.issuperset(titulos):
+            try:
+                linhas = self._linhas_iniciais(titulos)
+            except gspread.exceptions.APIError:
+                # Alguma aba não existe (ou foi removida por fora): listar e ler só as existentes
+                existentes = self._listar_abas(atualizar=True)
+                linhas = self._linhas_iniciais([t for t in titulos if t in existentes])
+        else:
+            linhas = self._linhas_iniciais([t for t in titulos if t in conhecidas])
+        
+        # Criar config padrão se a aba não existir ou não tiver linha de dados
+        config_linhas = linhas.get(config_name, [])
+        if len(config_linhas) < 2 or not config_linhas[1]:
+            self._descartar_estado(config_name)
             default_config = self._get_default_config()
             self.write_user_config(prefix, default_config)
         
-        # Criar aba de products se não existir
-        products_name = f"{prefix}products"
-        df_products = self.read_worksheet_to_df(products_name)
-        if df_products.empty:
-            empty_products = pd.DataFrame(columns=[
-                'codigo', 'nome', 'compra', 'desp_add', 'custo_total',
-                'margem_desejada_pct', 'markup_divisor_pct', 'markup_mult',
-                'preco_sugerido', 'preco_final', 'categoria', 'obs'
-            ])
+        # Criar aba de products (só cabeçalho) se não existir ou estiver vazia
+        products_linhas = linhas.get(products_name, [])
+        if not products_linhas or not products_linhas[0]:
+            self._descartar_estado(products_name)
+            empty_products = pd.DataFrame(columns=self.COLUNAS_PRODUTOS)
             self.write_user_products(prefix, empty_products)
+        
+        with self._lock:
+            self._prefixos_inicializados.add(prefix)
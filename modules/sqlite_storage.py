@@ -0,0 +1,339 @@
+"""
+Módulo de Armazenamento Local em SQLite
+Implementa a mesma interface do SheetsManager sobre um banco SQLite indexado
+"""
+import json
+import os
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from modules.esquema import EsquemaProdutos
+from modules.storage import StorageBackend
+from modules.metricas import Metricas
+from typing import Dict, List, Optional, Any, Set
+
+@Metricas.instrumentar('sqlite')
+class SQLiteManager(StorageBackend):
+    """Gerenciador de persistência em banco SQLite local"""
+    
+    # Colunas de produto com coluna própria (e tipo) na tabela; as demais vão em 'extras'
+    COLUNAS_NUMERICAS = [
+        'compra', 'desp_add', 'custo_total', 'margem_desejada_pct',
+        'markup_divisor_pct', 'markup_mult', 'preco_sugerido', 'preco_final',
+        'diferenca_final_vs_sugerido', 'margem_liquida_estimada_pct'
+    ]
+    COLUNAS_TEXTO = ['codigo', 'nome', 'categoria', 'obs']
+    COLUNAS_TABELA = COLUNAS_TEXTO + COLUNAS_NUMERICAS
+    COLUNAS_USUARIOS = ['user_id', 'password_hash', 'display_name', 'role', 'sheet_tab_prefix', 'active']
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            password_hash TEXT,
+            display_name TEXT,
+            role TEXT,
+            sheet_tab_prefix TEXT,
+            active INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS configs (
+            prefix TEXT PRIMARY KEY,
+            dados TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS product_layouts (
+            prefix TEXT PRIMARY KEY,
+            colunas TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS products (
+            prefix TEXT NOT NULL,
+            posicao INTEGER NOT NULL,
+            codigo TEXT,
+            nome TEXT,
+            compra REAL,
+            desp_add REAL,
+            custo_total REAL,
+            margem_desejada_pct REAL,
+            markup_divisor_pct REAL,
+            markup_mult REAL,
+            preco_sugerido REAL,
+            preco_final REAL,
+            diferenca_final_vs_sugerido REAL,
+            margem_liquida_estimada_pct REAL,
+            categoria TEXT,
+            obs TEXT,
+            extras TEXT,
+            PRIMARY KEY (prefix, posicao)
+        );
+        CREATE INDEX IF NOT EXISTS idx_products_codigo ON products (prefix, codigo);
+        CREATE INDEX IF NOT EXISTS idx_products_categoria ON products (prefix, categoria);
+    """
+    
+    def __init__(self, db_path: str):
+        """
+        Abre (ou cria) o banco SQLite
+        
+        A conexão é única e protegida por lock, podendo ser compartilhada
+        entre as sessões do processo.
+        
+        Args:
+            db_path: Caminho do arquivo do banco
+        """
+        self.db_path = db_path
+        diretorio = os.path.dirname(db_path)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+    
+    @staticmethod
+    def _valor_json(valor: Any) -> Any:
+        """Converte valores NumPy/NaN para tipos serializáveis em JSON"""
+        if isinstance(valor, np.generic):
+            valor = valor.item()
+        if isinstance(valor, float) and np.isnan(valor):
+            return None
+        return valor
+    
+    def _layout(self, prefix: str) -> Optional[List[str]]:
+        """Retorna a ordem de colunas do catálogo do usuário"""
+        linha = self.conn.execute(
+            'SELECT colunas FROM product_layouts WHERE prefix = ?', (prefix,)
+        ).fetchone()
+        return json.loads(linha[0]) if linha else None
+    
+    def _salvar_layout(self, prefix: str, colunas: List[str]):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO product_layouts (prefix, colunas) VALUES (?, ?)',
+            (prefix, json.dumps(colunas))
+        )
+    
+    def _linhas_produtos(self, prefix: str, products_df: pd.DataFrame, posicao_inicial: int) -> List[tuple]:
+        """Converte o DataFrame em tuplas na ordem das colunas da tabela"""
+        n = len(products_df)
+        colunas = {}
+        for coluna in self.COLUNAS_TEXTO:
+            if coluna in products_df.columns:
+                serie = products_df[coluna]
+                colunas[coluna] = serie.astype(str).where(serie.notna(), None).tolist()
+            else:
+                colunas[coluna] = [None] * n
+        for coluna in self.COLUNAS_NUMERICAS:
+            if coluna in products_df.columns:
+                serie = pd.to_numeric(products_df[coluna], errors='coerce')
+                colunas[coluna] = serie.astype(object).where(serie.notna(), None).tolist()
+            else:
+                colunas[coluna] = [None] * n
+        extras = [c for c in products_df.columns if c not in self.COLUNAS_TABELA]
+        if extras:
+            registros = products_df[extras].to_dict('records')
+            colunas['extras'] = [
+                json.dumps({k: self._valor_json(v) for k, v in r.items()}) for r in registros
+            ]
+        else:
+            colunas['extras'] = [None] * n
+        posicoes = range(posicao_inicial, posicao_inicial + n)
+        return list(zip(
+            [prefix] * n, posicoes,
+            *[colunas[c] for c in self.COLUNAS_TABELA], colunas['extras']
+        ))
+    
+    def _inserir_produtos(self, linhas: List[tuple]):
+        colunas = ['prefix', 'posicao'] + self.COLUNAS_TABELA + ['extras']
+        self.conn.executemany(
+            f"INSERT INTO products ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})",
+            linhas
+        )
+    
+    def _select_produtos(self, prefix: str, filtro: str = '', params: tuple = (), sufixo: str = '') -> pd.DataFrame:
+        """Executa SELECT no catálogo e devolve DataFrame na ordem de colunas do usuário"""
+        with self._lock:
+            layout = self._layout(prefix)
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(self.COLUNAS_TABELA)}, extras FROM products "
+                f"WHERE prefix = ? {filtro} ORDER BY posicao {sufixo}",
+                self.conn, params=(prefix,) + params
+            )
+        if layout is None:
+            return pd.DataFrame()
+        extras = [c for c in layout if c not in self.COLUNAS_TABELA]
+        if extras and not df.empty:
+            dados_extras = pd.DataFrame(
+                [json.loads(e) if isinstance(e, str) else {} for e in df['extras']], index=df.index
+            )
+            df = pd.concat([df, dados_extras.reindex(columns=extras)], axis=1)
+        return EsquemaProdutos.aplicar(df.reindex(columns=layout))
+    
+    def read_users(self) -> pd.DataFrame:
+        """Lê tabela de usuários"""
+        with self._lock:
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(self.COLUNAS_USUARIOS)} FROM users", self.conn
+            )
+        if df.empty:
+            return pd.DataFrame()
+        df['active'] = df['active'].astype(bool)
+        return df
+    
+    def write_users(self, users_df: pd.DataFrame):
+        """
+        Substitui a tabela de usuários
+        
+        Args:
+            users_df: DataFrame com as colunas da aba 'users'
+        """
+        df = users_df.reindex(columns=self.COLUNAS_USUARIOS)
+        df['active'] = df['active'].map(
+            lambda v: str(v).strip().upper() in ('TRUE', '1', 'SIM', 'YES') if isinstance(v, str) else bool(v)
+        ).astype(int)
+        linhas = [tuple(self._valor_json(v) for v in linha) for linha in df.itertuples(index=False)]
+        with self._lock, self.conn:
+            self.conn.execute('DELETE FROM users')
+            self.conn.executemany(
+                f"INSERT INTO users ({', '.join(self.COLUNAS_USUARIOS)}) VALUES ({', '.join('?' * len(self.COLUNAS_USUARIOS))})",
+                linhas
+            )
+    
+    def read_user_config(self, prefix: str) -> Dict[str, Any]:
+        """Lê configuração do usuário"""
+        with self._lock:
+            linha = self.conn.execute(
+                'SELECT dados FROM configs WHERE prefix = ?', (prefix,)
+            ).fetchone()
+        return json.loads(linha[0]) if linha else self._get_default_config()
+    
+    def write_user_config(self, prefix: str, config: Dict[str, Any]):
+        """Escreve configuração do usuário"""
+        dados = json.dumps({k: self._valor_json(v) for k, v in config.items()})
+        with self._lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO configs (prefix, dados) VALUES (?, ?)', (prefix, dados)
+            )
+    
+    def read_user_products(self, prefix: str) -> pd.DataFrame:
+        """Lê produtos do usuário"""
+        return self._select_produtos(prefix)
+    
+    def write_user_products(self, prefix: str, products_df: pd.DataFrame):
+        """Substitui o catálogo do usuário em uma única transação"""
+        linhas = self._linhas_produtos(prefix, products_df, 0)
+        with self._lock, self.conn:
+            self.conn.execute('DELETE FROM products WHERE prefix = ?', (prefix,))
+            self._inserir_produtos(linhas)
+            self._salvar_layout(prefix, products_df.columns.tolist())
+    
+    def initialize_user_sheets(self, prefix: str):
+        """Cria config padrão e catálogo vazio do usuário, se não existirem"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                'INSERT OR IGNORE INTO configs (prefix, dados) VALUES (?, ?)',
+                (prefix, json.dumps(self._get_default_config()))
+            )
+            self.conn.execute(
+                'INSERT OR IGNORE INTO product_layouts (prefix, colunas) VALUES (?, ?)',
+                (prefix, json.dumps(self.COLUNAS_PRODUTOS))
+            )
+    
+    def product_code_exists(self, prefix: str, codigo: Any) -> bool:
+        """Verifica o código pelo índice (prefix, codigo)"""
+        with self._lock:
+            linha = self.conn.execute(
+                'SELECT 1 FROM products WHERE prefix = ? AND codigo = ? LIMIT 1',
+                (prefix, str(codigo))
+            ).fetchone()
+        return linha is not None
+    
+    def append_user_product(self, prefix: str, produto: Dict[str, Any]) -> bool:
+        """Insere um produto ao final do catálogo; retorna False se o código já existe"""
+        with self._lock, self.conn:
+            if self.product_code_exists(prefix, produto.get('codigo', '')):
+                return False
+            self._anexar_produtos(prefix, pd.DataFrame([produto]))
+        return True
+    
+    def append_user_products(self, prefix: str, products_df: pd.DataFrame) -> int:
+        """Insere vários produtos ao final do catálogo numa única transação"""
+        if products_df.empty:
+            return 0
+        with self._lock, self.conn:
+            self._anexar_produtos(prefix, products_df)
+        return len(products_df)
+    
+    def _anexar_produtos(self, prefix: str, products_df: pd.DataFrame):
+        proxima = self.conn.execute(
+            'SELECT COALESCE(MAX(posicao), -1) + 1 FROM products WHERE prefix = ?', (prefix,)
+        ).fetchone()[0]
+        self._inserir_produtos(self._linhas_produtos(prefix, products_df, proxima))
+        self._estender_layout(prefix, products_df.columns)
+    
+    def _estender_layout(self, prefix: str, colunas):
+        layout = self._layout(prefix) or []
+        novas = [c for c in colunas if c not in layout]
+        if novas:
+            self._salvar_layout(prefix, layout + novas)
+    
+    def upsert_user_products(self, prefix: str, atualizar: pd.DataFrame, inserir: pd.DataFrame):
+        """Regrava só as linhas alteradas, na mesma posição, e anexa as novas numa única transação"""
+        with self._lock, self.conn:
+            if not atualizar.empty:
+                codigos = atualizar['codigo'].astype(str).tolist()
+                posicoes = {}
+                for i in range(0, len(codigos), 500):
+                    lote = codigos[i:i + 500]
+                    posicoes.update(self.conn.execute(
+                        f"SELECT codigo, MIN(posicao) FROM products WHERE prefix = ? "
+                        f"AND codigo IN ({', '.join('?' * len(lote))}) GROUP BY codigo",
+                        (prefix, *lote)
+                    ).fetchall())
+                linhas = [
+                    (linha[0], posicoes[codigo]) + linha[2:]
+                    for linha, codigo in zip(self._linhas_produtos(prefix, atualizar, 0), codigos)
+                    if codigo in posicoes
+                ]
+                self.conn.executemany(
+                    'DELETE FROM products WHERE prefix = ? AND posicao = ?',
+                    [linha[:2] for linha in linhas]
+                )
+                self._inserir_produtos(linhas)
+                self._estender_layout(prefix, atualizar.columns)
+            if not inserir.empty:
+                self._anexar_produtos(prefix, inserir)
+    
+    def read_user_codes(self, prefix: str) -> Set[str]:
+        """Lê só a coluna de códigos, pelo índice (prefix, codigo)"""
+        with self._lock:
+            linhas = self.conn.execute(
+                'SELECT codigo FROM products WHERE prefix = ? AND codigo IS NOT NULL', (prefix,)
+            ).fetchall()
+        return {linha[0] for linha in linhas}
+    
+    def read_user_product(self, prefix: str, codigo: Any) -> Optional[Dict[str, Any]]:
+        """Lê um produto pelo índice (prefix, codigo)"""
+        df = self._select_produtos(prefix, 'AND codigo = ?', (str(codigo),), 'LIMIT 1')
+        return df.iloc[0].to_dict() if not df.empty else None
+    
+    def read_user_products_by_category(self, prefix: str, categoria: str) -> pd.DataFrame:
+        """Lê os produtos de uma categoria pelo índice (prefix, categoria)"""
+        return self._select_produtos(prefix, 'AND categoria = ?', (str(categoria),))
+    
+    def read_user_products_page(self, prefix: str, offset: int, limit: int) -> pd.DataFrame:
+        """Lê uma página do catálogo pela chave primária (prefix, posicao)"""
+        return self._select_produtos(prefix, '', (int(limit), int(offset)), 'LIMIT ? OFFSET ?')
+    
+    def count_user_products(self, prefix: str) -> int:
+        """Conta os produtos do usuário"""
+        with self._lock:
+            return self.conn.execute(
+                'SELECT COUNT(*) FROM products WHERE prefix = ?', (prefix,)
+            ).fetchone()[0]
+    
+    def list_user_categories(self, prefix: str) -> List[str]:
+        """Lista as categorias distintas pelo índice (prefix, categoria)"""
+        with self._lock:
+            linhas = self.conn.execute(
+                'SELECT DISTINCT categoria FROM products WHERE prefix = ? AND categoria IS NOT NULL ORDER BY categoria',
+                (prefix,)
+            ).fetchall()
+        return [linha[0] for linha in linhas]
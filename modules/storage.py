@@ -0,0 +1,172 @@
+"""
+Módulo de Abstração de Armazenamento
+Define a interface comum aos backends de persistência (Google Sheets, SQLite)
+"""
+from abc import ABC, abstractmethod
+import pandas as pd
+from modules.upsert import MotorUpsert
+from typing import Dict, List, Optional, Any, Set, Tuple
+
+class StorageBackend(ABC):
+    """Interface de persistência usada pelos módulos da aplicação"""
+    
+    # Colunas de uma aba/tabela de produtos recém-criada
+    COLUNAS_PRODUTOS = [
+        'codigo', 'nome', 'compra', 'desp_add', 'custo_total',
+        'margem_desejada_pct', 'markup_divisor_pct', 'markup_mult',
+        'preco_sugerido', 'preco_final', 'categoria', 'obs'
+    ]
+    
+    @abstractmethod
+    def read_users(self) -> pd.DataFrame:
+        """Lê cadastro de usuários"""
+    
+    @abstractmethod
+    def read_user_config(self, prefix: str) -> Dict[str, Any]:
+        """Lê configuração de custos do usuário"""
+    
+    @abstractmethod
+    def write_user_config(self, prefix: str, config: Dict[str, Any]):
+        """Escreve configuração de custos do usuário"""
+    
+    @abstractmethod
+    def read_user_products(self, prefix: str) -> pd.DataFrame:
+        """Lê todos os produtos do usuário"""
+    
+    @abstractmethod
+    def write_user_products(self, prefix: str, products_df: pd.DataFrame):
+        """Substitui o catálogo de produtos do usuário"""
+    
+    @abstractmethod
+    def initialize_user_sheets(self, prefix: str):
+        """Cria config e catálogo padrão do usuário, se ainda não existirem"""
+    
+    @abstractmethod
+    def product_code_exists(self, prefix: str, codigo: Any) -> bool:
+        """Verifica se o código já está cadastrado"""
+    
+    @abstractmethod
+    def append_user_product(self, prefix: str, produto: Dict[str, Any]) -> bool:
+        """Adiciona um produto; retorna False se o código já existe"""
+    
+    def append_user_products(self, prefix: str, products_df: pd.DataFrame) -> int:
+        """
+        Adiciona vários produtos ao final do catálogo
+        
+        Os códigos devem ter sido validados antes (sem duplicatas). Backends
+        que sabem anexar sem reescrever o catálogo sobrescrevem este método.
+        
+        Args:
+            prefix: Prefixo do usuário
+            products_df: Produtos já calculados
+        
+        Returns:
+            Número de produtos adicionados
+        """
+        if products_df.empty:
+            return 0
+        atual = self.read_user_products(prefix)
+        final = products_df if atual.empty else pd.concat([atual, products_df], ignore_index=True)
+        self.write_user_products(prefix, final)
+        return len(products_df)
+    
+    def upsert_user_products(self, prefix: str, atualizar: pd.DataFrame, inserir: pd.DataFrame):
+        """
+        Substitui produtos pelo código e adiciona os novos ao final
+        
+        A implementação padrão monta o catálogo resultante e o grava com
+        write_user_products (no Google Sheets, a escrita incremental envia
+        só as linhas alteradas e incluídas).
+        
+        Args:
+            prefix: Prefixo do usuário
+            atualizar: Linhas completas que substituem as de mesmo código
+            inserir: Produtos novos, já calculados
+        """
+        if atualizar.empty and inserir.empty:
+            return
+        atual = self.read_user_products(prefix)
+        self.write_user_products(prefix, MotorUpsert.aplicar(atual, atualizar, inserir))
+    
+    def read_user_codes(self, prefix: str) -> Set[str]:
+        """Retorna os códigos já cadastrados, como texto"""
+        df = self.read_user_products(prefix)
+        if df.empty or 'codigo' not in df.columns:
+            return set()
+        return set(df['codigo'].astype(str))
+    
+    def read_user_data(self, prefix: str) -> Tuple[Dict[str, Any], pd.DataFrame]:
+        """
+        Lê config e produtos do usuário de uma vez
+        
+        Backends remotos sobrescrevem para buscar tudo numa única requisição.
+        
+        Args:
+            prefix: Prefixo do usuário
+        
+        Returns:
+            Tupla (configuração, DataFrame de produtos)
+        """
+        return self.read_user_config(prefix), self.read_user_products(prefix)
+    
+    def read_user_product(self, prefix: str, codigo: Any) -> Optional[Dict[str, Any]]:
+        """
+        Lê um único produto pelo código
+        
+        Args:
+            prefix: Prefixo do usuário
+            codigo: Código do produto
+        
+        Returns:
+            Dicionário do produto ou None se não existir
+        """
+        df = self.read_user_products(prefix)
+        if df.empty or 'codigo' not in df.columns:
+            return None
+        encontrados = df[df['codigo'].astype(str) == str(codigo)]
+        return encontrados.iloc[0].to_dict() if not encontrados.empty else None
+    
+    def read_user_products_by_category(self, prefix: str, categoria: str) -> pd.DataFrame:
+        """Lê os produtos de uma categoria"""
+        df = self.read_user_products(prefix)
+        if 'categoria' not in df.columns:
+            return df.iloc[0:0]
+        return df[df['categoria'] == categoria].reset_index(drop=True)
+    
+    def read_user_products_page(self, prefix: str, offset: int, limit: int) -> pd.DataFrame:
+        """Lê uma página do catálogo, na ordem de cadastro"""
+        df = self.read_user_products(prefix)
+        return df.iloc[offset:offset + limit].reset_index(drop=True)
+    
+    def count_user_products(self, prefix: str) -> int:
+        """Conta os produtos do usuário"""
+        return len(self.read_user_products(prefix))
+    
+    def list_user_categories(self, prefix: str) -> List[str]:
+        """Lista as categorias distintas, ordenadas"""
+        df = self.read_user_products(prefix)
+        if df.empty or 'categoria' not in df.columns:
+            return []
+        return sorted(df['categoria'].dropna().astype(str).unique().tolist())
+    
+    def _get_default_config(self) -> Dict[str, float]:
+        """Retorna configuração padrão"""
+        return {
+            'cust_var_impostos_pct': 0.0,
+            'cust_var_royalties_pct': 0.0,
+            'cust_var_gestao_pct': 0.0,
+            'cust_var_taxa_cartao_pct': 0.0,
+            'cust_var_repasse_condominio_pct': 0.0,
+            'cust_var_investidor_pct': 0.0,
+            'cust_fix_monitoramento': 0.0,
+            'cust_fix_combustivel': 0.0,
+            'cust_fix_totem': 0.0,
+            'cust_fix_contabilidade': 0.0,
+            'cust_fix_internet': 0.0,
+            'cust_fix_telefone': 0.0,
+            'cust_fix_seguro': 0.0,
+            'cust_fix_folha': 0.0,
+            'cust_fix_aluguel': 0.0,
+            'cust_fix_outros': 0.0,
+            'faturamento_base': 0.0
+        }
@@ -0,0 +1,121 @@
+"""
+Módulo de Upsert de Produtos
+Classifica linhas recebidas em inclusão, atualização ou sem alteração,
+comparando com o catálogo por código através de um índice hash
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+class MotorUpsert:
+    """Mescla produtos recebidos com o catálogo existente, chaveado por código"""
+    
+    CHAVE = 'codigo'
+    
+    def __init__(self, existentes: pd.DataFrame, chave: str = CHAVE):
+        """
+        Monta o índice hash do catálogo
+        
+        Args:
+            existentes: Catálogo atual do usuário
+            chave: Coluna usada como chave (códigos comparados como texto)
+        """
+        self.chave = chave
+        if existentes.empty or chave not in existentes.columns:
+            existentes = pd.DataFrame(columns=[chave])
+        # Códigos repetidos no catálogo: vale a primeira ocorrência
+        self.existentes = existentes.drop_duplicates(chave).reset_index(drop=True)
+        self._indice = pd.Index(self.existentes[chave].astype(str))
+    
+    @staticmethod
+    def _iguais(antigo: pd.Series, novo: pd.Series) -> np.ndarray:
+        """Compara duas colunas alinhadas; vazios são iguais entre si e números com tolerância"""
+        vazio_antigo = antigo.isna().to_numpy() | (antigo.astype(str) == '').to_numpy()
+        vazio_novo = novo.isna().to_numpy() | (novo.astype(str) == '').to_numpy()
+        num_antigo = pd.to_numeric(antigo, errors='coerce').to_numpy(dtype=float)
+        num_novo = pd.to_numeric(novo, errors='coerce').to_numpy(dtype=float)
+        numericos = ~np.isnan(num_antigo) & ~np.isnan(num_novo)
+        iguais_num = numericos & np.isclose(num_antigo, num_novo, rtol=0, atol=1e-9)
+        iguais_txt = ~numericos & (antigo.astype(str).to_numpy() == novo.astype(str).to_numpy())
+        return (vazio_antigo & vazio_novo) | (~vazio_antigo & ~vazio_novo & (iguais_num | iguais_txt))
+    
+    def classificar(self, entrada: pd.DataFrame, colunas: Optional[List[str]] = None,
+                    manter_vazios: bool = False) -> Dict[str, pd.DataFrame]:
+        """
+        Classifica as linhas recebidas numa única junção vetorizada
+        
+        Args:
+            entrada: Produtos recebidos (códigos únicos)
+            colunas: Colunas da entrada que podem alterar o catálogo
+                (padrão: todas, exceto a chave)
+            manter_vazios: Se True, células vazias recebidas não alteram o
+                valor cadastrado (em vez de apagá-lo)
+        
+        Returns:
+            Dicionário com 'inserir' (linhas novas, como recebidas),
+            'atualizar' (linhas do catálogo com os valores recebidos
+            aplicados) e 'inalterados' (linhas recebidas sem diferença)
+        """
+        if colunas is None:
+            colunas = [c for c in entrada.columns if c != self.chave]
+        colunas = [c for c in colunas if c in entrada.columns and c != self.chave]
+        
+        posicoes = self._indice.get_indexer(entrada[self.chave].astype(str))
+        encontrados = posicoes >= 0
+        inserir = entrada[~encontrados].reset_index(drop=True)
+        
+        recebidos = entrada[encontrados].reset_index(drop=True)
+        base = self.existentes.iloc[posicoes[encontrados]].reset_index(drop=True)
+        mudou = np.zeros(len(recebidos), dtype=bool)
+        vazios = {}
+        for coluna in colunas:
+            if coluna in base.columns:
+                diferente = ~self._iguais(base[coluna], recebidos[coluna])
+            else:
+                # Coluna nova no catálogo: muda se vier preenchida
+                diferente = ~self._iguais(pd.Series(np.nan, index=recebidos.index), recebidos[coluna])
+            if manter_vazios:
+                vazios[coluna] = recebidos[coluna].isna().to_numpy() | (recebidos[coluna].astype(str) == '').to_numpy()
+                diferente &= ~vazios[coluna]
+            mudou |= diferente
+        
+        atualizar = base[mudou].copy()
+        for coluna in colunas:
+            valores = recebidos.loc[mudou, coluna]
+            if manter_vazios and coluna in atualizar.columns:
+                valores = valores.astype(object).mask(vazios[coluna][mudou], atualizar[coluna].astype(object)).infer_objects()
+            atualizar[coluna] = valores.to_numpy()
+        return {
+            'inserir': inserir,
+            'atualizar': atualizar.reset_index(drop=True),
+            'inalterados': recebidos[~mudou].reset_index(drop=True)
+        }
+    
+    @staticmethod
+    def aplicar(existentes: pd.DataFrame, atualizar: pd.DataFrame, inserir: pd.DataFrame, chave: str = CHAVE) -> pd.DataFrame:
+        """
+        Monta o catálogo resultante: atualizações no lugar, inclusões no fim
+        
+        Args:
+            existentes: Catálogo atual
+            atualizar: Linhas completas que substituem as de mesmo código
+            inserir: Linhas novas
+        
+        Returns:
+            Novo catálogo, na ordem original
+        """
+        resultado = existentes.reset_index(drop=True)
+        if not atualizar.empty:
+            codigos = resultado[chave].astype(str)
+            primeiras = np.flatnonzero(~codigos.duplicated().to_numpy())
+            indices = pd.Index(codigos.iloc[primeiras]).get_indexer(atualizar[chave].astype(str))
+            validas = indices >= 0
+            posicoes = primeiras[indices[validas]]
+            substitutas = atualizar[validas].set_axis(posicoes)
+            # Cada linha atualizada volta para a posição da original
+            resultado = pd.concat([resultado.drop(index=posicoes), substitutas]).sort_index(kind='stable')
+            resultado = resultado.reset_index(drop=True)
+        if not inserir.empty:
+            resultado = inserir.copy() if resultado.empty else pd.concat([resultado, inserir], ignore_index=True)
+        return resultado
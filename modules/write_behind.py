@@ -0,0 +1,321 @@
+"""
+Módulo de Gravação Assíncrona (Write-Behind)
+Enfileira, agrupa e grava em segundo plano as escritas de um backend,
+respeitando a cota de escrita da API com token bucket e backoff exponencial
+"""
+import atexit
+import random
+import sqlite3
+import threading
+import time
+import pandas as pd
+from datetime import datetime
+from modules.esquema import EsquemaProdutos
+from modules.storage import StorageBackend
+from modules.upsert import MotorUpsert
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+class TokenBucket:
+    """Limitador de taxa: até 'capacidade' operações em rajada, repostas a 'taxa' por segundo"""
+    
+    def __init__(self, taxa: float, capacidade: int):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self._tokens = float(capacidade)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Bloqueia até haver um token disponível e o consome"""
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+                self._ultimo = agora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                espera = (1 - self._tokens) / self.taxa
+            time.sleep(espera)
+
+class WriteBehindStorage(StorageBackend):
+    """
+    Camada write-behind na frente de um StorageBackend
+    
+    Escritas de config e produtos entram numa fila por (tipo, prefixo); uma
+    nova escrita da mesma aba substitui a pendente. Uma thread grava a fila
+    a cada 'intervalo' segundos. Leituras enxergam os dados pendentes.
+    
+    Só falhas temporárias (cota, erro do servidor, rede) são repetidas, até
+    'max_tentativas' vezes; as demais descartam a escrita e ficam no status.
+    """
+    
+    def __init__(
+        self,
+        backend: StorageBackend,
+        intervalo: float = 2.0,
+        escritas_por_minuto: int = 50,
+        rajada: int = 10,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        max_tentativas: int = 8
+    ):
+        """
+        Inicia a fila e a thread de gravação
+        
+        Args:
+            backend: Backend que efetivamente persiste os dados
+            intervalo: Segundos entre gravações da fila
+            escritas_por_minuto: Taxa sustentada de escritas na API
+            rajada: Escritas permitidas em rajada
+            backoff_base: Espera inicial após falha, em segundos
+            backoff_max: Espera máxima entre tentativas, em segundos
+            max_tentativas: Tentativas de uma escrita antes de desistir dela
+        """
+        self.backend = backend
+        self.intervalo = intervalo
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_tentativas = max_tentativas
+        self._bucket = TokenBucket(escritas_por_minuto / 60, rajada)
+        self._pendentes: Dict[Tuple[str, str], Any] = {}
+        self._versoes: Dict[Tuple[str, str], int] = {}
+        self._status: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._lock_gravacao = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name='write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+    
+    def __getattr__(self, nome: str):
+        # Métodos específicos do backend (cache_stats, invalidate_cache...) seguem direto
+        if nome == 'backend':
+            raise AttributeError(nome)
+        return getattr(self.backend, nome)
+    
+    def _enfileirar(self, chave: Tuple[str, str], valor: Any):
+        with self._lock:
+            self._pendentes[chave] = valor
+            self._versoes[chave] = self._versoes.get(chave, 0) + 1
+            status = self._status.setdefault(chave, {'tentativas': 0})
+            status.update({'estado': 'pendente', 'proxima_tentativa': 0.0})
+    
+    def _pendente(self, tipo: str, prefix: str) -> Optional[Any]:
+        with self._lock:
+            return self._pendentes.get((tipo, prefix))
+    
+    @staticmethod
+    def _temporaria(erro: Exception) -> bool:
+        """Indica se vale repetir a escrita: cota (429), erro do servidor (5xx) ou rede"""
+        resposta = getattr(erro, 'response', None)
+        status = getattr(resposta, 'status_code', None)
+        if status is not None:
+            return status == 429 or status >= 500
+        # OSError cobre as falhas de conexão e timeout (inclusive as de requests)
+        return isinstance(erro, (OSError, sqlite3.OperationalError))
+    
+    def _gravar(self, chave: Tuple[str, str], valor: Any):
+        tipo, prefix = chave
+        self._bucket.acquire()
+        if tipo == 'config':
+            self.backend.write_user_config(prefix, valor)
+        else:
+            self.backend.write_user_products(prefix, valor)
+    
+    def _gravar_pendentes(self, forcar: bool = False):
+        """Grava as escritas pendentes cujo backoff já expirou (ou todas, se forcar)"""
+        with self._lock_gravacao:
+            agora = time.monotonic()
+            with self._lock:
+                prontas = [
+                    (chave, valor, self._versoes[chave])
+                    for chave, valor in self._pendentes.items()
+                    if forcar or self._status[chave]['proxima_tentativa'] <= agora
+                ]
+            for chave, valor, versao in prontas:
+                with self._lock:
+                    self._status[chave]['estado'] = 'gravando'
+                try:
+                    self._gravar(chave, valor)
+                except Exception as e:
+                    with self._lock:
+                        status = self._status[chave]
+                        status['tentativas'] += 1
+                        if self._temporaria(e) and status['tentativas'] < self.max_tentativas:
+                            # Backoff exponencial com jitter completo
+                            teto = min(self.backoff_max, self.backoff_base * 2 ** status['tentativas'])
+                            status['proxima_tentativa'] = time.monotonic() + random.uniform(0, teto)
+                            status['estado'] = 'erro'
+                            status['erro'] = str(e)
+                        else:
+                            # Repetir não resolve: desiste desta versão para não
+                            # prender as próximas escritas da aba
+                            status.update({'tentativas': 0, 'erro': None, 'falha': str(e)})
+                            if self._versoes.get(chave) == versao:
+                                del self._pendentes[chave]
+                                status['estado'] = 'falhou'
+                            else:
+                                status.update({'estado': 'pendente', 'proxima_tentativa': 0.0})
+                    continue
+                with self._lock:
+                    status = self._status[chave]
+                    status.update({'tentativas': 0, 'erro': None, 'falha': None, 'gravado_em': datetime.now()})
+                    if self._versoes.get(chave) == versao:
+                        del self._pendentes[chave]
+                        status['estado'] = 'gravado'
+                    else:
+                        # Chegou escrita mais nova durante a gravação; continua pendente
+                        status['estado'] = 'pendente'
+    
+    def _loop(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self._gravar_pendentes()
+            except Exception:
+                # Falhas por aba já ficam no status; a thread não pode morrer
+                pass
+    
+    def flush(self):
+        """Grava imediatamente todas as escritas pendentes, no thread atual"""
+        self._gravar_pendentes(forcar=True)
+    
+    def status_gravacao(self, prefix: str) -> Dict[str, Any]:
+        """
+        Resumo da fila de gravação de um usuário
+        
+        Returns:
+            Dicionário com pendentes, gravando, erro, segundos até a próxima
+            tentativa, falha (escrita descartada) e horário da última
+            gravação concluída
+        """
+        with self._lock:
+            chaves = [c for c in self._status if c[1] == prefix]
+            pendentes = [c for c in chaves if c in self._pendentes]
+            erros = [self._status[c] for c in pendentes if self._status[c]['estado'] == 'erro']
+            gravados = [self._status[c]['gravado_em'] for c in chaves if self._status[c].get('gravado_em')]
+            falhas = [self._status[c]['falha'] for c in chaves if self._status[c].get('falha')]
+            return {
+                'pendentes': len(pendentes),
+                'gravando': any(self._status[c]['estado'] == 'gravando' for c in pendentes),
+                'erro': erros[0].get('erro') if erros else None,
+                'proxima_tentativa_em': max(0.0, min(
+                    (e['proxima_tentativa'] for e in erros), default=0.0
+                ) - time.monotonic()),
+                'falha': falhas[0] if falhas else None,
+                'ultima_gravacao': max(gravados) if gravados else None
+            }
+    
+    def read_users(self) -> pd.DataFrame:
+        return self.backend.read_users()
+    
+    def read_user_config(self, prefix: str) -> Dict[str, Any]:
+        config = self._pendente('config', prefix)
+        return dict(config) if config is not None else self.backend.read_user_config(prefix)
+    
+    def write_user_config(self, prefix: str, config: Dict[str, Any]):
+        self._enfileirar(('config', prefix), dict(config))
+    
+    def read_user_products(self, prefix: str) -> pd.DataFrame:
+        produtos = self._pendente('products', prefix)
+        if produtos is None:
+            return self.backend.read_user_products(prefix)
+        # Catálogo pendente pode ter sido montado com linhas ainda sem tipo
+        return EsquemaProdutos.aplicar(produtos.copy())
+    
+    def write_user_products(self, prefix: str, products_df: pd.DataFrame):
+        self._enfileirar(('products', prefix), products_df.copy())
+    
+    def read_user_data(self, prefix: str) -> Tuple[Dict[str, Any], pd.DataFrame]:
+        config = self._pendente('config', prefix)
+        produtos = self._pendente('products', prefix)
+        if config is None and produtos is None:
+            return self.backend.read_user_data(prefix)
+        return self.read_user_config(prefix), self.read_user_products(prefix)
+    
+    def initialize_user_sheets(self, prefix: str):
+        self.backend.initialize_user_sheets(prefix)
+    
+    def product_code_exists(self, prefix: str, codigo: Any) -> bool:
+        produtos = self._pendente('products', prefix)
+        if produtos is None:
+            return self.backend.product_code_exists(prefix, codigo)
+        return 'codigo' in produtos.columns and str(codigo) in set(produtos['codigo'].astype(str))
+    
+    # Alterações de produtos sempre entram na fila, aplicadas ao catálogo
+    # pendente ou ao do backend: uma escrita direta poderia ser desfeita por
+    # uma reescrita completa enfileirada logo depois. A leitura do backend é
+    # feita sem o lock, para não bloquear as demais sessões nem o flusher
+    
+    def _alterar_produtos(self, prefix: str, alterar):
+        """
+        Enfileira o catálogo alterado
+        
+        Args:
+            prefix: Prefixo do usuário
+            alterar: Recebe o catálogo atual e devolve (novo catálogo ou None
+                para não gravar, valor de retorno)
+        """
+        chave = ('products', prefix)
+        base = self.backend.read_user_products(prefix) if self._pendente(*chave) is None else None
+        with self._lock:
+            atual = self._pendentes.get(chave)
+            if atual is None:
+                # Gravado entre a consulta e o lock: o backend já tem a versão pendente
+                atual = base if base is not None else self.backend.read_user_products(prefix)
+            novo, resultado = alterar(atual)
+            if novo is not None:
+                self._enfileirar(chave, novo)
+            return resultado
+    
+    def append_user_product(self, prefix: str, produto: Dict[str, Any]) -> bool:
+        codigo = str(produto.get('codigo', ''))
+        
+        def anexar(atual):
+            if 'codigo' in atual.columns and codigo in set(atual['codigo'].astype(str)):
+                return None, False
+            return pd.concat([atual, pd.DataFrame([produto])], ignore_index=True), True
+        return self._alterar_produtos(prefix, anexar)
+    
+    def append_user_products(self, prefix: str, products_df: pd.DataFrame) -> int:
+        if products_df.empty:
+            return 0
+        return self._alterar_produtos(prefix, lambda atual: (
+            products_df.copy() if atual.empty else pd.concat([atual, products_df], ignore_index=True),
+            len(products_df)
+        ))
+    
+    def upsert_user_products(self, prefix: str, atualizar: pd.DataFrame, inserir: pd.DataFrame):
+        if atualizar.empty and inserir.empty:
+            return
+        self._alterar_produtos(prefix, lambda atual: (MotorUpsert.aplicar(atual, atualizar, inserir), None))
+    
+    def read_user_codes(self, prefix: str) -> Set[str]:
+        if self._pendente('products', prefix) is not None:
+            return super().read_user_codes(prefix)
+        return self.backend.read_user_codes(prefix)
+    
+    def read_user_product(self, prefix: str, codigo: Any) -> Optional[Dict[str, Any]]:
+        if self._pendente('products', prefix) is not None:
+            return super().read_user_product(prefix, codigo)
+        return self.backend.read_user_product(prefix, codigo)
+    
+    def read_user_products_by_category(self, prefix: str, categoria: str) -> pd.DataFrame:
+        if self._pendente('products', prefix) is not None:
+            return super().read_user_products_by_category(prefix, categoria)
+        return self.backend.read_user_products_by_category(prefix, categoria)
+    
+    def read_user_products_page(self, prefix: str, offset: int, limit: int) -> pd.DataFrame:
+        if self._pendente('products', prefix) is not None:
+            return super().read_user_products_page(prefix, offset, limit)
+        return self.backend.read_user_products_page(prefix, offset, limit)
+    
+    def count_user_products(self, prefix: str) -> int:
+        if self._pendente('products', prefix) is not None:
+            return super().count_user_products(prefix)
+        return self.backend.count_user_products(prefix)
+    
+    def list_user_categories(self, prefix: str) -> List[str]:
+        if self._pendente('products', prefix) is not None:
+            return super().list_user_categories(prefix)
+        return self.backend.list_user_categories(prefix)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Script para cadastrar usuários no banco SQLite (STORAGE_BACKEND=sqlite)
+Uso:
+    python utils/cadastrar_usuarios_sqlite.py --user-id admin --nome "Administrador" --role admin --prefix admin_
+    python utils/cadastrar_usuarios_sqlite.py --importar usuarios.csv
+    python utils/cadastrar_usuarios_sqlite.py --listar --sqlite-path data/precificacao.db
+
+--importar substitui a tabela de usuários pelo CSV exportado da aba 'users'
+do Google Sheets (colunas user_id, password_hash, display_name, role,
+sheet_tab_prefix, active). Sem --importar, cria ou atualiza um usuário e
+pede a senha no terminal (hash bcrypt de hash_password.py).
+"""
+import argparse
+import getpass
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from hash_password import gerar_hash
+from modules.sqlite_storage import SQLiteManager
+
+def importar_csv(caminho):
+    """Lê o CSV da aba 'users' e valida as colunas obrigatórias"""
+    users_df = pd.read_csv(caminho, dtype=str, keep_default_na=False)
+    faltando = [c for c in SQLiteManager.COLUNAS_USUARIOS if c not in users_df.columns]
+    if faltando:
+        raise ValueError(f"Colunas ausentes no CSV: {', '.join(faltando)}")
+    sem_hash = users_df.loc[~users_df['password_hash'].str.startswith('$2'), 'user_id']
+    if not sem_hash.empty:
+        raise ValueError(f"password_hash não é um hash bcrypt para: {', '.join(sem_hash)}")
+    if users_df['user_id'].duplicated().any():
+        raise ValueError("user_id repetido no CSV")
+    return users_df
+
+def cadastrar_usuario(backend, args):
+    """Cria ou atualiza um usuário, mantendo os demais cadastrados"""
+    senha = getpass.getpass("Senha: ")
+    if not senha or senha != getpass.getpass("Confirme a senha: "):
+        raise ValueError("Senhas vazias ou não conferem")
+    usuario = {
+        'user_id': args.user_id,
+        'password_hash': gerar_hash(senha),
+        'display_name': args.nome or args.user_id,
+        'role': args.role,
+        'sheet_tab_prefix': args.prefix or f"{args.user_id}_",
+        'active': True
+    }
+    users_df = backend.read_users()
+    if not users_df.empty:
+        users_df = users_df[users_df['user_id'].astype(str) != args.user_id]
+    return pd.concat([users_df, pd.DataFrame([usuario])], ignore_index=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Cadastro de usuários no backend SQLite")
+    parser.add_argument('--sqlite-path', default=os.getenv('SQLITE_PATH', 'data/precificacao.db'))
+    parser.add_argument('--importar', metavar='CSV', help="CSV da aba 'users' (substitui todos os usuários)")
+    parser.add_argument('--listar', action='store_true', help="Listar os usuários cadastrados")
+    parser.add_argument('--user-id', help="ID de login do usuário a criar ou atualizar")
+    parser.add_argument('--nome', help="Nome exibido (padrão: o user_id)")
+    parser.add_argument('--role', choices=['admin', 'user'], default='user')
+    parser.add_argument('--prefix', help="Prefixo dos dados do usuário (padrão: '<user_id>_')")
+    args = parser.parse_args()
+    
+    backend = SQLiteManager(args.sqlite_path)
+    
+    if args.listar:
+        users_df = backend.read_users()
+        colunas = [c for c in SQLiteManager.COLUNAS_USUARIOS if c != 'password_hash']
+        print(users_df[colunas].to_string(index=False) if not users_df.empty else "Nenhum usuário cadastrado")
+        return
+    
+    if not args.importar and not args.user_id:
+        parser.error("informe --user-id, --importar ou --listar")
+    
+    try:
+        users_df = importar_csv(args.importar) if args.importar else cadastrar_usuario(backend, args)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"❌ {e}")
+    
+    backend.write_users(users_df)
+    print(f"✅ {len(users_df)} usuário(s) gravado(s) em {args.sqlite_path}")
+
+if __name__ == "__main__":
+    main()
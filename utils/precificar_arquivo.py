@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Script para precificar arquivos de produtos muito grandes em lote
+Lê o arquivo em blocos, precifica cada bloco num pool de processos e grava
+o resultado (CSV) à medida que os blocos ficam prontos, com memória constante
+Uso:
+    python utils/precificar_arquivo.py fornecedor.csv --config config.json --saida precificado.csv
+    python utils/precificar_arquivo.py catalogo.parquet --tenant loja1_ --backend sqlite > precificado.csv
+    cat fornecedor.csv | python utils/precificar_arquivo.py - --config config.json --workers 8
+    python utils/precificar_arquivo.py catalogo.csv --config config.json --por-margem --saida precificado.csv
+
+O arquivo precisa da coluna 'compra'; 'desp_add' e 'preco_final' são opcionais.
+Com --por-margem o preço final de cada linha é o que atinge 'margem_desejada_pct'.
+Parquet requer o pacote pyarrow.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from modules.calculos import CalculadoraMarkup
+from modules.esquema import EsquemaProdutos
+
+COLUNAS_NUMERICAS = ['compra', 'desp_add', 'preco_final', 'margem_desejada_pct']
+
+def precificar_bloco(bloco, markup, sep, cabecalho, por_margem=False):
+    """
+    Precifica um bloco e o serializa em CSV (executa no processo do pool)
+    
+    Args:
+        bloco: DataFrame, ou texto CSV sem cabeçalho (lido aqui, fora do processo principal)
+        markup: Resultado de calcular_markup_usuario
+        sep: Separador do CSV de entrada e de saída
+        cabecalho: Linha de cabeçalho do CSV de entrada (só para blocos em texto)
+        por_margem: Preço final pela margem desejada de cada linha
+    
+    Returns:
+        Tupla (CSV sem cabeçalho, colunas, linhas, linhas com 'compra' inválida,
+        linhas com margem inviável)
+    """
+    if isinstance(bloco, str):
+        # Números como texto: o esquema decide entre '1.200' (milhar) e '15,50' (decimal)
+        bloco = pd.read_csv(
+            io.StringIO(cabecalho + bloco), sep=sep,
+            dtype={'codigo': str, **{coluna: str for coluna in COLUNAS_NUMERICAS}}
+        )
+    if 'compra' not in bloco.columns:
+        raise ValueError("Coluna obrigatória ausente: compra")
+    compra_original = bloco['compra'].reset_index(drop=True)
+    for coluna in COLUNAS_NUMERICAS:
+        if coluna in bloco.columns:
+            bloco[coluna] = EsquemaProdutos.converter_numeros(bloco[coluna])[0]
+    compra_invalida = bloco['compra'].isna().to_numpy()
+    invalidos = int(compra_invalida.sum())
+    for coluna in ['desp_add', 'preco_final']:
+        if coluna in bloco.columns:
+            bloco[coluna] = bloco[coluna].fillna(0.0)
+    
+    if por_margem:
+        precificado = CalculadoraMarkup.precificar_por_margem(bloco, markup)
+        inviaveis = len(precificado.attrs['margem_inviavel'])
+    else:
+        precificado = CalculadoraMarkup.recalcular_produtos(bloco, markup['markup_mult'], markup['markup_divisor'])
+        inviaveis = 0
+    if invalidos:
+        # Mantém na saída o valor de entrada que não pôde ser lido
+        precificado = precificado.reset_index(drop=True)
+        precificado['compra'] = precificado['compra'].astype(object).where(~compra_invalida, compra_original)
+    texto = precificado.to_csv(sep=sep, index=False, header=False)
+    return texto, list(precificado.columns), len(precificado), invalidos, inviaveis
+
+def blocos_csv(arquivo, tamanho_bloco):
+    """
+    Divide o CSV em blocos de linhas sem interpretá-las
+    
+    Returns:
+        Tupla (cabeçalho, iterador de blocos em texto)
+    """
+    cabecalho = arquivo.readline()
+    
+    def gerar():
+        linhas = []
+        pendente = ''
+        for linha in arquivo:
+            # Aspas em número ímpar: campo entre aspas com quebra de linha, continua na próxima
+            pendente += linha
+            if pendente.count('"') % 2:
+                continue
+            linhas.append(pendente)
+            pendente = ''
+            if len(linhas) >= tamanho_bloco:
+                yield ''.join(linhas)
+                linhas = []
+        if pendente:
+            linhas.append(pendente)
+        if linhas:
+            yield ''.join(linhas)
+    return cabecalho, gerar()
+
+def blocos_parquet(caminho, tamanho_bloco):
+    """Lê o Parquet por lotes de linhas (row groups não são carregados inteiros)"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("❌ Leitura de Parquet requer o pacote pyarrow (pip install pyarrow)")
+    arquivo = pq.ParquetFile(caminho)
+    for lote in arquivo.iter_batches(batch_size=tamanho_bloco):
+        bloco = lote.to_pandas()
+        if 'codigo' in bloco.columns:
+            bloco['codigo'] = bloco['codigo'].astype(str)
+        yield bloco
+
+def carregar_markup(args):
+    """Calcula o markup a partir do JSON de config ou da config do usuário"""
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    elif args.backend == 'sqlite':
+        from modules.sqlite_storage import SQLiteManager
+        config = SQLiteManager(args.sqlite_path).read_user_config(args.tenant)
+    else:
+        from modules.sheets import SheetsManager
+        spreadsheet_id = os.getenv('SPREADSHEET_ID', '')
+        if not spreadsheet_id or not os.path.exists(args.credenciais):
+            raise SystemExit(f"❌ Configure SPREADSHEET_ID e o arquivo {args.credenciais}")
+        with open(args.credenciais, 'r') as f:
+            credentials_info = json.load(f)
+        config = SheetsManager(spreadsheet_id, credentials_info).read_user_config(args.tenant)
+    
+    markup = CalculadoraMarkup.calcular_markup_usuario(config)
+    if markup['erro_markup']:
+        raise SystemExit(f"❌ {markup['erro_markup']}")
+    return markup
+
+def executar(blocos, processar, saida, sep, workers, ao_progredir=None):
+    """
+    Processa os blocos no pool e grava os resultados na ordem do arquivo
+    
+    No máximo 2 blocos por processo ficam em andamento, então a memória não
+    cresce com o tamanho do arquivo.
+    
+    Args:
+        blocos: Iterador de blocos
+        processar: Função aplicada a cada bloco (precificar_bloco com argumentos fixos)
+        saida: Arquivo de texto de saída
+        sep: Separador do cabeçalho de saída
+        workers: Processos do pool (1 processa no próprio processo)
+        ao_progredir: Chamado após cada bloco gravado com (linhas, inválidas, inviáveis)
+    
+    Returns:
+        Tupla (linhas, linhas com 'compra' inválida, linhas com margem inviável)
+    """
+    totais = [0, 0, 0]
+    cabecalho_gravado = False
+    
+    def gravar(resultado):
+        nonlocal cabecalho_gravado
+        texto, colunas, linhas, invalidos, inviaveis = resultado
+        if not cabecalho_gravado:
+            saida.write(sep.join(colunas) + '\n')
+            cabecalho_gravado = True
+        saida.write(texto)
+        totais[0] += linhas
+        totais[1] += invalidos
+        totais[2] += inviaveis
+        if ao_progredir:
+            ao_progredir(*totais)
+    
+    if workers <= 1:
+        for bloco in blocos:
+            gravar(processar(bloco))
+        return tuple(totais)
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        em_andamento = deque()
+        for bloco in blocos:
+            em_andamento.append(pool.submit(processar, bloco))
+            if len(em_andamento) >= 2 * workers:
+                gravar(em_andamento.popleft().result())
+        while em_andamento:
+            gravar(em_andamento.popleft().result())
+    return tuple(totais)
+
+def main():
+    parser = argparse.ArgumentParser(description="Precificação em lote de arquivos CSV/Parquet")
+    parser.add_argument('entrada', help="Arquivo .csv ou .parquet ('-' lê CSV da entrada padrão)")
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument('--config', help="JSON com a configuração de custos")
+    origem.add_argument('--tenant', help="Prefixo do usuário cuja configuração será usada")
+    parser.add_argument('--saida', default='-', help="Arquivo CSV de saída (padrão: saída padrão)")
+    parser.add_argument('--sep', default=',', help="Separador do CSV")
+    parser.add_argument('--por-margem', action='store_true',
+                        help="Preço final pela margem desejada de cada linha (coluna margem_desejada_pct)")
+    parser.add_argument('--bloco', type=int, default=100_000, help="Linhas por bloco")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processos em paralelo")
+    parser.add_argument('--backend', choices=['sheets', 'sqlite'], default=os.getenv('STORAGE_BACKEND', 'sheets'))
+    parser.add_argument('--sqlite-path', default=os.getenv('SQLITE_PATH', 'data/precificacao.db'))
+    parser.add_argument('--credenciais', default='service_account.json', help="JSON da service account")
+    args = parser.parse_args()
+    
+    markup = carregar_markup(args)
+    
+    entrada = None
+    cabecalho = ''
+    if args.entrada.lower().endswith('.parquet'):
+        blocos = blocos_parquet(args.entrada, args.bloco)
+    else:
+        entrada = sys.stdin if args.entrada == '-' else open(args.entrada, 'r', encoding='utf-8', newline='')
+        cabecalho, blocos = blocos_csv(entrada, args.bloco)
+        if 'compra' not in [c.strip().strip('"') for c in cabecalho.split(args.sep)]:
+            raise SystemExit(f"❌ Coluna obrigatória ausente no cabeçalho: compra (separador '{args.sep}')")
+    processar = partial(
+        precificar_bloco, markup=markup, sep=args.sep, cabecalho=cabecalho, por_margem=args.por_margem
+    )
+    saida = sys.stdout if args.saida == '-' else open(args.saida, 'w', encoding='utf-8', newline='')
+    
+    def exibir_progresso(linhas, invalidos, inviaveis):
+        print(f"\r{linhas:,} linhas precificadas", end='', file=sys.stderr, flush=True)
+    
+    inicio = time.perf_counter()
+    try:
+        linhas, invalidos, inviaveis = executar(blocos, processar, saida, args.sep, args.workers, exibir_progresso)
+    except ValueError as e:
+        raise SystemExit(f"\n❌ {e}")
+    except BrokenPipeError:
+        # Saída fechada antes do fim (ex.: '| head'): encerra sem rastreamento
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        raise SystemExit(1)
+    finally:
+        if entrada not in (None, sys.stdin):
+            entrada.close()
+        if saida is not sys.stdout:
+            saida.close()
+    
+    duracao = time.perf_counter() - inicio
+    print(f"\n✅ {linhas:,} linhas em {duracao:.1f}s ({linhas / max(duracao, 1e-9):,.0f} linhas/s, "
+          f"{args.workers} processo(s), markup {markup['markup_mult']:.4f})", file=sys.stderr)
+    if invalidos:
+        print(f"⚠️ {invalidos:,} linha(s) com 'compra' inválida ficaram sem preço", file=sys.stderr)
+    if inviaveis:
+        print(f"⚠️ {inviaveis:,} linha(s) com margem desejada + despesas >= 100% mantiveram o preço final",
+              file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
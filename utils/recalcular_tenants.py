@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Script para aplicar uma alteração de custos a todos os usuários e recalcular os catálogos
+Uso:
+    python utils/recalcular_tenants.py --set cust_var_taxa_cartao_pct=3.5 --set cust_var_royalties_pct=6
+    python utils/recalcular_tenants.py --set cust_var_impostos_pct=9 --tenants loja1_ loja2_ --relatorio relatorio.json
+    python utils/recalcular_tenants.py --backend sqlite --sqlite-path data/precificacao.db --set cust_fix_internet=150
+
+Credenciais do Google Sheets: service_account.json e variável SPREADSHEET_ID
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.recalculo import RecalculoEmLote
+
+def ler_alteracao(pares):
+    """Converte argumentos 'campo=valor' em dicionário"""
+    alteracao = {}
+    for par in pares:
+        campo, separador, valor = par.partition('=')
+        if not separador:
+            raise ValueError(f"Use o formato campo=valor: '{par}'")
+        alteracao[campo.strip()] = valor.strip().replace(',', '.')
+    return alteracao
+
+def abrir_backend(args):
+    """Abre o backend escolhido, sem fila write-behind (as escritas são síncronas)"""
+    if args.backend == 'sqlite':
+        from modules.sqlite_storage import SQLiteManager
+        return SQLiteManager(args.sqlite_path)
+    
+    from modules.sheets import SheetsManager
+    spreadsheet_id = os.getenv('SPREADSHEET_ID', '')
+    if not spreadsheet_id or not os.path.exists(args.credenciais):
+        raise SystemExit(f"❌ Configure SPREADSHEET_ID e o arquivo {args.credenciais}")
+    with open(args.credenciais, 'r') as f:
+        credentials_info = json.load(f)
+    return SheetsManager(spreadsheet_id, credentials_info)
+
+def exibir_progresso(resultado, concluidos, total):
+    """Imprime uma linha por tenant concluído"""
+    if resultado['status'] == 'ok':
+        detalhe = f"{resultado['produtos']} produtos"
+    else:
+        detalhe = f"❌ {resultado['erro']}"
+    print(f"[{concluidos}/{total}] {resultado['prefix']:<20} {resultado['duracao_s']:6.2f}s  {detalhe}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Recálculo em lote de todos os usuários")
+    parser.add_argument('--set', dest='alteracoes', action='append', default=[], metavar='CAMPO=VALOR',
+                        help="Campo de configuração a alterar (pode repetir)")
+    parser.add_argument('--tenants', nargs='+', help="Prefixos a processar (padrão: todos da aba 'users')")
+    parser.add_argument('--apenas-ativos', action='store_true', help="Ignorar usuários desativados")
+    parser.add_argument('--workers', type=int, default=RecalculoEmLote.MAX_WORKERS,
+                        help="Usuários processados ao mesmo tempo")
+    parser.add_argument('--backend', choices=['sheets', 'sqlite'], default=os.getenv('STORAGE_BACKEND', 'sheets'))
+    parser.add_argument('--sqlite-path', default=os.getenv('SQLITE_PATH', 'data/precificacao.db'))
+    parser.add_argument('--credenciais', default='service_account.json', help="JSON da service account")
+    parser.add_argument('--relatorio', help="Arquivo JSON para gravar o relatório final")
+    args = parser.parse_args()
+    
+    try:
+        alteracao = ler_alteracao(args.alteracoes)
+        job = RecalculoEmLote(abrir_backend(args), max_workers=args.workers)
+        alteracao = job.validar_alteracao(alteracao)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    
+    tenants = args.tenants or job.listar_tenants(apenas_ativos=args.apenas_ativos)
+    print("=" * 60)
+    print(f"🔄 Recalculando {len(tenants)} usuário(s) com {args.workers} thread(s)")
+    for campo, valor in alteracao.items():
+        print(f"   {campo} = {valor}")
+    print("=" * 60)
+    
+    relatorio = job.executar(alteracao, tenants, ao_progredir=exibir_progresso)
+    
+    print("=" * 60)
+    print(f"✅ {relatorio['sucesso']} de {relatorio['total']} usuário(s) recalculados "
+          f"({relatorio['produtos']} produtos) em {relatorio['duracao_s']:.1f}s")
+    for resultado in relatorio['resultados']:
+        if resultado['status'] != 'ok':
+            print(f"❌ {resultado['prefix']}: {resultado['erro']}")
+    
+    if args.relatorio:
+        with open(args.relatorio, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"\nRelatório gravado em {args.relatorio}")
+    
+    if relatorio['falhas']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Script para servir a API de preços (integração com PDV e ERP)
+Uso:
+    API_TOKENS="token_pdv:loja1_,token_erp:*" python utils/servidor_api.py --port 8080
+    python utils/servidor_api.py --backend sqlite --sqlite-path data/precificacao.db --sem-autenticacao
+
+Endpoints:
+    GET    /health
+    GET    /v1/tenants/{prefix}/precos?codigo=A1&codigo=B2
+    POST   /v1/tenants/{prefix}/precos      {"codigos": ["A1", "B2"]}
+    POST   /v1/tenants/{prefix}/cotacoes    {"itens": [{"compra": 10.5, "desp_add": 1}]}
+    GET    /v1/tenants/{prefix}/kpis
+    DELETE /v1/tenants/{prefix}/cache
+
+Autenticação: cabeçalho 'Authorization: Bearer <token>'; em API_TOKENS cada
+token é associado a um prefixo ('*' libera todos os usuários)
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.api_precos import ServicoPrecos, criar_app
+
+def ler_tokens(valor):
+    """Converte 'token:prefixo,token2:*' em dicionário"""
+    tokens = {}
+    for par in filter(None, (p.strip() for p in valor.split(','))):
+        token, separador, prefix = par.partition(':')
+        if not separador or not token or not prefix:
+            raise ValueError(f"Use o formato token:prefixo em API_TOKENS: '{par}'")
+        tokens[token] = prefix
+    return tokens
+
+def abrir_backend(args):
+    """Abre o backend escolhido (a API só lê, sem fila write-behind)"""
+    if args.backend == 'sqlite':
+        from modules.sqlite_storage import SQLiteManager
+        return SQLiteManager(args.sqlite_path)
+    
+    from modules.sheets import SheetsManager
+    spreadsheet_id = os.getenv('SPREADSHEET_ID', '')
+    if not spreadsheet_id or not os.path.exists(args.credenciais):
+        raise SystemExit(f"❌ Configure SPREADSHEET_ID e o arquivo {args.credenciais}")
+    with open(args.credenciais, 'r') as f:
+        credentials_info = json.load(f)
+    return SheetsManager(spreadsheet_id, credentials_info)
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP de preços")
+    parser.add_argument('--host', default=os.getenv('API_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('API_PORT', '8080')))
+    parser.add_argument('--backend', choices=['sheets', 'sqlite'], default=os.getenv('STORAGE_BACKEND', 'sheets'))
+    parser.add_argument('--sqlite-path', default=os.getenv('SQLITE_PATH', 'data/precificacao.db'))
+    parser.add_argument('--credenciais', default='service_account.json', help="JSON da service account")
+    parser.add_argument('--cache-ttl', type=float, default=float(os.getenv('API_CACHE_TTL', ServicoPrecos.CACHE_TTL)),
+                        help="Segundos que o catálogo de cada usuário fica em memória")
+    parser.add_argument('--sem-autenticacao', action='store_true',
+                        help="Aceitar requisições sem token (apenas para uso local)")
+    args = parser.parse_args()
+    
+    if args.sem_autenticacao:
+        tokens = None
+    else:
+        try:
+            tokens = ler_tokens(os.getenv('API_TOKENS', ''))
+        except ValueError as e:
+            raise SystemExit(f"❌ {e}")
+        if not tokens:
+            raise SystemExit("❌ Configure API_TOKENS ou use --sem-autenticacao")
+    
+    import uvicorn
+    
+    servico = ServicoPrecos(abrir_backend(args), cache_ttl=args.cache_ttl)
+    print(f"🚀 API de preços em http://{args.host}:{args.port} (backend {args.backend})")
+    uvicorn.run(criar_app(servico, tokens), host=args.host, port=args.port, log_level='warning')
+
+if __name__ == "__main__":
+    main()